@@ -0,0 +1,216 @@
+"""
+Storage backends behind the query endpoints.
+
+PARKING_BACKEND picks the backend:
+
+  pandas       (default) the in-memory snapshot and its derived indexes;
+  sqlite       an indexed SQLite file next to the CSV (sqlite_backend.py);
+  partitioned  day partitions with per-partition metadata (partitions.py).
+
+Each backend's current() returns a view fixed to one dataset version.
+/occupancy and /live always use the DatasetManager.
+"""
+import os
+
+import numpy as np
+
+import metrics
+from concurrency import run_blocking
+from dataset import dataset, distinct_values
+from dwell import DwellRollup, dwell_rollup
+from bitmap_index import BitmapIndex
+from export_stream import RowSelection, count_rows, select_rows
+from live_counters import MINUTE, live_counters
+from pagination import newest_first, paginate
+from plate_index import event_plate_index, session_plate_index
+from rollup import Rollup, rollup
+from search_index import event_search_index, session_search_index
+from sessions import MATCH_TOLERANCE, SessionTable
+from time_index import event_time_index, session_time_index
+
+BACKEND = os.environ.get("PARKING_BACKEND", "pandas")
+
+
+def session_filter(category=None, color=None, gate=None):
+    """Build a row predicate for the /data column filters, or None if there are none."""
+    if not (category or color or gate):
+        return None
+
+    def matches(frame):
+        mask = np.ones(len(frame), dtype=bool)
+        if category:
+            mask &= frame['category'].isin(category.split(',')).to_numpy()
+        if color:
+            mask &= frame['color'].isin(color.split(',')).to_numpy()
+        if gate:
+            gates = gate.split(',')
+            mask &= (frame['entry_gate'].isin(gates) | frame['exit_gate'].isin(gates)).to_numpy()
+        return mask
+
+    return matches
+
+
+class PandasView:
+    """Queries over one in-memory Snapshot."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.state = snapshot.state
+        self.offset = snapshot.offset
+        self.load_seconds = snapshot.load_seconds
+        self.loaded_at = snapshot.loaded_at
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def sessions_page(self, page, page_size, cursor=None, include_total=True, search=None,
+                      start_date=None, end_date=None, license_prefix=None,
+                      category=None, color=None, gate=None):
+        snapshot = self.snapshot
+        # Entry/exit sessions are prebuilt per snapshot, sorted by entry time.
+        sessions = snapshot.derived('sessions', SessionTable.from_snapshot)
+        table = sessions.table
+        order = newest_first(snapshot, 'sessions', table['entry_timestamp'], table['insertion_id'])
+
+        # Date range: a contiguous block of the table found by binary search.
+        bounds = None
+        try:
+            if start_date or end_date:
+                bounds = session_time_index(snapshot, sessions).bounds(start_date, end_date)
+        except Exception as e:
+            raise ValueError(f"Invalid date format: {e}") from e
+
+        candidates = session_search_index(snapshot, sessions).search(search) if search else None
+        if license_prefix:
+            # Plate prefixes are one contiguous range of the plate index
+            plates = session_plate_index(snapshot, sessions).prefix(license_prefix)
+            candidates = plates if candidates is None else np.intersect1d(candidates, plates, assume_unique=True)
+        predicate = session_filter(category, color, gate)
+        count_key = ('count:sessions', search, start_date, end_date, license_prefix, category, color, gate)
+
+        # Newest first, straight from the presorted order
+        with metrics.timed('filter'):
+            rows, total, next_cursor = paginate(
+                snapshot, order, table, page, page_size, cursor, include_total,
+                bounds, candidates, predicate, count_key
+            )
+        return table.iloc[rows], total, next_cursor
+
+    def events_page(self, page, page_size, cursor=None, include_total=True, search=None):
+        snapshot = self.snapshot
+        df = snapshot.events
+
+        # Events are presorted by time, so newest-first pages need no sort
+        order = newest_first(snapshot, 'events', df['datetime_utc'], df['insertion_id'])
+        candidates = event_search_index(snapshot).search(search) if search else None
+
+        with metrics.timed('filter'):
+            rows, total, next_cursor = paginate(
+                snapshot, order, df, page, page_size, cursor, include_total,
+                candidates=candidates, count_key=('count:events', search)
+            )
+        return df.iloc[rows], total, next_cursor
+
+    def range_cells(self, start=None, end=None, end_inclusive=True):
+        return rollup(self.snapshot).range_cells(self.snapshot, start, end, end_inclusive)
+
+    def empty_cells(self):
+        return rollup(self.snapshot).empty()
+
+    def time_span(self):
+        index = event_time_index(self.snapshot)
+        return index.first(), index.last()
+
+    def minute_counts(self, start=None, end=None):
+        index = event_time_index(self.snapshot)
+        lo, hi = index.bounds(start, end)
+        return np.unique(index.values[lo:hi] // MINUTE * MINUTE, return_counts=True)
+
+    def dwell_cells(self, start=None, end=None):
+        return dwell_rollup(self.snapshot).range_cells(self.snapshot, start, end)
+
+    def export_selection(self, **filters):
+        # Filters only select row positions; no copy of the frame is made
+        return RowSelection(self.snapshot.events, select_rows(self.snapshot, **filters))
+
+    def export_count(self, **filters):
+        # Counted on the filter bitmaps; no rows are materialized
+        return count_rows(self.snapshot, **filters)
+
+    def vehicle(self, plate):
+        # The plate's rows come straight from the plate indexes, oldest first
+        snapshot = self.snapshot
+        history = snapshot.events.iloc[event_plate_index(snapshot).lookup(plate)]
+        sessions = snapshot.derived('sessions', SessionTable.from_snapshot)
+        visits = sessions.table.iloc[session_plate_index(snapshot, sessions).lookup(plate)]
+        return history, visits
+
+    def distinct(self, column):
+        return distinct_values(self.snapshot.events[column])
+
+    def today(self):
+        return live_counters(self.snapshot).today()
+
+    def recent_entries(self):
+        return live_counters(self.snapshot).recent_entries()
+
+    def recent_exits(self):
+        return live_counters(self.snapshot).recent_exits()
+
+    def summary(self):
+        return live_counters(self.snapshot).summary()
+
+
+def _view(snapshot):
+    return snapshot.derived('view', PandasView)
+
+
+class PandasBackend:
+    """The DatasetManager's in-memory snapshots."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        # Keep the entry/exit pairing materialized and update it as rows are appended;
+        # it is published with the snapshot so starting workers do not rebuild it
+        manager.maintain('sessions', SessionTable.from_snapshot, SessionTable.advance,
+                         publish=(SessionTable.to_table, SessionTable.from_table))
+        manager.maintain('rollup', Rollup.from_snapshot, Rollup.advance,
+                         publish=(Rollup.to_table, Rollup.from_table))
+        manager.maintain('bitmaps', BitmapIndex.from_snapshot, BitmapIndex.advance)
+        # Duration histograms follow the session pairing, so they come after it
+        manager.maintain('dwell', DwellRollup.from_snapshot, DwellRollup.advance,
+                         publish=(DwellRollup.to_table, DwellRollup.from_table))
+
+    def current(self):
+        return _view(self.manager.current())
+
+    def latest(self):
+        snapshot = self.manager.latest()
+        return _view(snapshot) if snapshot is not None else None
+
+
+def _replaying(store):
+    """store, with the DatasetManager replaying only the recent events it holds."""
+    dataset.replay_recent(lambda window: store.current().recent(window), MATCH_TOLERANCE)
+    return store
+
+
+def make_backend(name):
+    if name == 'pandas':
+        return PandasBackend(dataset)
+    if name == 'sqlite':
+        from sqlite_backend import SQLiteBackend
+        return _replaying(SQLiteBackend(dataset.path))
+    if name == 'partitioned':
+        from partitions import PartitionedBackend
+        return _replaying(PartitionedBackend(dataset.path))
+    raise ValueError(f"Unknown PARKING_BACKEND: {name!r} (expected 'pandas', 'sqlite' or 'partitioned')")
+
+
+backend = make_backend(BACKEND)
+
+
+async def current_view():
+    """backend.current(), which may have to ingest appended rows, off the event loop."""
+    return await run_blocking(backend.current)
@@ -0,0 +1,243 @@
+"""
+Synthetic parking_export.csv generator.
+
+Writes files in the parking_export.csv schema whose value distributions
+follow the production export: mostly pedestrians and cars on the
+`ganajan_car_in` gate, a majority of unreadable '-' plates, a skewed plate
+population (a few regulars, many one-off visitors), a diurnal arrival
+profile and the mix of timestamp formats the cameras produce
+("...41.52+00", "...28+00", "...41.520000+00:00").
+
+Every visit is an `_in` event; with probability --exit-rate it is followed
+by an `_out` event for the same plate after a log-normal dwell time, and
+--orphan-rate adds exits without an entry. Rows are written in arrival
+order with the small out-of-order jitter seen in real exports, and
+insertion ids increase through the file.
+
+The file is produced in blocks of BLOCK_VISITS visits, so memory use does
+not depend on the row count (10^4 .. 10^8 rows). The same --seed always
+produces the same file.
+
+    python -m bench.generate 1000000 bench/data/events_1e6.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['insertion_id', 'license_plate', 'category', 'color', 'timestamp', 'gate', 'zone', 'description']
+
+BLOCK_VISITS = 500_000
+SITE = 'ganajan'
+UNREADABLE = '-'
+
+# Shares observed in the production export
+CATEGORIES = {
+    'pedestrian': 0.7022, 'car': 0.2254, 'motorcycle': 0.0494, 'light': 0.0084, 'van': 0.0073,
+    'bus': 0.0033, 'bicycle': 0.0029, 'tractor': 0.0007, 'heavy': 0.0002, 'bike': 0.0001,
+    'suv': 0.0001, 'truck': 0.0001,
+}
+COLORS = {
+    'undefined': 0.7525, 'white': 0.1607, 'black': 0.0396, 'silver': 0.033, 'red': 0.0084,
+    'blue': 0.0035, 'yellow': 0.0019, 'green': 0.0002, 'orange': 0.0002,
+}
+ZONES = {50: 0.95, 45: 0.01, 55: 0.01, 60: 0.01, 70: 0.01, 80: 0.01}
+DESCRIPTIONS = {45: 'ZONE 1 - Table', 50: 'ZONE 2 - Table', 55: 'ZONE 3 - Table',
+                60: 'ZONE 4 - Table', 70: 'ZONE 5 - Table', 80: 'ZONE 6 - Table'}
+# Categories with their own gate pair; everything else uses the car gates
+OWN_GATES = {'bike', 'bus', 'suv', 'truck', 'van'}
+OWN_GATE_SHARE = 0.01
+# Arrivals per UTC hour of day in the production export
+HOURLY = np.array([422, 379, 764, 1201, 1669, 1926, 1937, 2005, 2022, 1840, 1971, 1961,
+                   2226, 1088, 1030, 902, 425, 411, 158, 82, 146, 182, 223, 389], dtype=float)
+STATES = ['MH', 'KA', 'DL', 'GJ', 'TN', 'UP', 'RJ', 'AP', 'TS', 'KL', 'WB', 'HR']
+
+HOUR_NS = 3_600_000_000_000
+DAY_NS = 24 * HOUR_NS
+
+
+def _choice(rng, weights, size):
+    keys = list(weights)
+    p = np.array([weights[k] for k in keys], dtype=float)
+    return np.array(keys, dtype=object)[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+
+def plate_pool(rng, size):
+    """Distinct-looking plates: state registrations (MH40CX7965) and short numeric ones (E37555)."""
+    letters = np.array(list('ABCDEFGHJKLMNPRSTUVWXYZ'))
+    states = np.array(STATES)[rng.integers(len(STATES), size=size)]
+    district = rng.integers(1, 60, size=size)
+    series = np.char.add(letters[rng.integers(len(letters), size=size)],
+                         letters[rng.integers(len(letters), size=size)])
+    number = rng.integers(1, 10_000, size=size)
+    short = rng.random(size) < 0.15
+    return np.where(
+        short,
+        np.char.add(letters[rng.integers(len(letters), size=size)],
+                    np.char.zfill(rng.integers(0, 100_000, size=size).astype(str), 5)),
+        np.char.add(np.char.add(np.char.add(states, np.char.zfill(district.astype(str), 2)), series),
+                    np.char.zfill(number.astype(str), 4)),
+    ).astype(object)
+
+
+def arrival_times(rng, start_ns, end_ns, size):
+    """size sorted arrival times in [start_ns, end_ns) following the HOURLY profile."""
+    weights = HOURLY / HOURLY.max()
+    times = np.empty(0, dtype=np.int64)
+    while len(times) < size:
+        # Thinning: draw uniformly, keep in proportion to the hour's weight
+        draw = rng.integers(start_ns, max(end_ns, start_ns + 1), size=int((size - len(times)) * 2.2) + 16)
+        keep = rng.random(len(draw)) < weights[(draw // HOUR_NS) % 24]
+        times = np.concatenate([times, draw[keep]])
+    times = np.sort(times[:size])
+    # Cameras report at 10 ms resolution, a few at 1 ms
+    coarse = rng.random(size) < 0.99
+    return np.where(coarse, times // 10_000_000 * 10_000_000, times // 1_000_000 * 1_000_000)
+
+
+def format_timestamps(ns, is_exit):
+    """Entry format '2025-01-24 04:17:41.52+00' (trailing zeros trimmed), exits '...41.520000+00:00'."""
+    text = np.datetime_as_string(ns.astype('datetime64[ns]'), unit='us')
+    text = np.char.replace(text, 'T', ' ')
+    trimmed = np.char.rstrip(np.char.rstrip(text, '0'), '.')
+    return np.where(is_exit, np.char.add(text, '+00:00'), np.char.add(trimmed, '+00')).astype(object)
+
+
+class Generator:
+    """Produces the file block by block, carrying exits that fall after the block."""
+
+    def __init__(self, rows, seed=0, start='2025-01-01', days=None, unreadable_rate=0.6,
+                 exit_rate=0.5, orphan_rate=0.01, bad_timestamp_rate=0.0001, first_id=4_000_000):
+        self.rows = rows
+        self.rng = np.random.default_rng(seed)
+        # A little more than needed; the last block is cut at exactly rows
+        visits = int(rows / (1 + exit_rate + orphan_rate) * 1.02) + 10
+        # The production rate of ~1800 events a day, up to a year of history
+        days = days or min(365, max(1, int(np.ceil(rows / 1800))))
+        self.start_ns = pd.Timestamp(start, tz='UTC').value
+        self.end_ns = self.start_ns + days * DAY_NS
+        self.visits = visits
+        self.unreadable_rate = unreadable_rate
+        self.exit_rate = exit_rate
+        self.orphan_rate = orphan_rate
+        self.bad_timestamp_rate = bad_timestamp_rate
+        self.next_id = first_id
+        # A few regulars and a long tail of one-off visitors
+        self.plates = plate_pool(self.rng, max(100, visits // 4))
+        self.pending = pd.DataFrame()
+
+    def _visits(self, start_ns, end_ns, size):
+        rng = self.rng
+        entry = arrival_times(rng, start_ns, end_ns, size)
+        category = _choice(rng, CATEGORIES, size)
+        own_gate = np.isin(category, list(OWN_GATES)) & (rng.random(size) < OWN_GATE_SHARE)
+        gate_kind = np.where(own_gate, category, 'car')
+        zone = _choice(rng, ZONES, size)
+        plate = self.plates[np.minimum((len(self.plates) * rng.random(size) ** 3).astype(np.int64),
+                                       len(self.plates) - 1)]
+        plate = np.where(rng.random(size) < self.unreadable_rate, UNREADABLE, plate)
+        visit = pd.DataFrame({
+            'license_plate': plate,
+            'category': category,
+            'color': _choice(rng, COLORS, size),
+            'gate_kind': gate_kind,
+            'zone': zone,
+        })
+
+        entries = visit.assign(ts=entry, is_exit=False)
+        # Dwell times: log-normal around an hour, capped at the pairing window
+        has_exit = rng.random(size) < self.exit_rate
+        dwell = np.minimum(rng.lognormal(np.log(3600), 0.8, size), 6 * 86_400) * 1e9
+        exits = visit[has_exit].assign(ts=(entry[has_exit] + dwell[has_exit].astype(np.int64)) // 10_000_000
+                                       * 10_000_000, is_exit=True)
+        orphans = visit.sample(frac=min(1.0, self.orphan_rate), random_state=rng.integers(2**32))
+        orphans = orphans.assign(ts=arrival_times(rng, start_ns, end_ns, len(orphans)), is_exit=True)
+        return pd.concat([entries, exits, orphans], ignore_index=True)
+
+    def blocks(self):
+        """Yield frames of rows in file order until self.rows rows were produced."""
+        written = 0
+        blocks = max(1, int(np.ceil(self.visits / BLOCK_VISITS)))
+        span = (self.end_ns - self.start_ns) / blocks
+        for b in range(blocks + 1):
+            if b < blocks:
+                lo, hi = int(self.start_ns + b * span), int(self.start_ns + (b + 1) * span)
+                size = min(BLOCK_VISITS, self.visits - b * BLOCK_VISITS)
+                events = pd.concat([self.pending, self._visits(lo, hi, size)], ignore_index=True)
+                due = events['ts'].to_numpy() < hi
+                self.pending, events = events[~due], events[due]
+            else:
+                events, self.pending = self.pending, pd.DataFrame()
+            if events.empty:
+                continue
+            # Arrival order, with rows a few seconds late now and then
+            jitter = np.where(self.rng.random(len(events)) < 0.05,
+                              self.rng.integers(0, 5_000_000_000, len(events)), 0)
+            events = events.iloc[np.argsort(events['ts'].to_numpy() + jitter, kind='stable')]
+            frame = self._rows(events)
+            frame = frame.iloc[:self.rows - written]
+            written += len(frame)
+            yield frame
+            if written >= self.rows:
+                return
+
+    def _rows(self, events):
+        n = len(events)
+        is_exit = events['is_exit'].to_numpy()
+        timestamp = format_timestamps(events['ts'].to_numpy(), is_exit)
+        bad = self.rng.random(n) < self.bad_timestamp_rate
+        timestamp[bad] = 'unknown'
+        zone = events['zone'].to_numpy()
+        ids = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        return pd.DataFrame({
+            'insertion_id': ids,
+            'license_plate': events['license_plate'].to_numpy(),
+            'category': events['category'].to_numpy(),
+            'color': events['color'].to_numpy(),
+            'timestamp': timestamp,
+            'gate': np.char.add(np.char.add(f'{SITE}_', events['gate_kind'].to_numpy().astype(str)),
+                                np.where(is_exit, '_out', '_in')),
+            'zone': zone,
+            'description': [DESCRIPTIONS[z] for z in zone],
+        }, columns=COLUMNS)
+
+
+def generate(rows, path, **options):
+    """Write a synthetic export of exactly rows rows to path; return the row count."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    written = 0
+    with open(tmp, 'w', newline='') as f:
+        f.write(','.join(COLUMNS) + '\n')
+        for frame in Generator(rows, **options).blocks():
+            frame.to_csv(f, header=False, index=False)
+            written += len(frame)
+    os.replace(tmp, path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic parking_export.csv.")
+    parser.add_argument('rows', type=float, help="number of rows, e.g. 1e6")
+    parser.add_argument('path', help="output CSV path")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', default='2025-01-01', help="first day (UTC)")
+    parser.add_argument('--days', type=int, default=None, help="days covered (default: ~1800 rows a day)")
+    parser.add_argument('--unreadable-rate', type=float, default=0.6, help="share of '-' plates")
+    parser.add_argument('--exit-rate', type=float, default=0.5, help="share of entries with an exit")
+    parser.add_argument('--orphan-rate', type=float, default=0.01, help="exits without an entry, per entry")
+    parser.add_argument('--bad-timestamp-rate', type=float, default=0.0001, help="unparseable timestamps")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = generate(int(args.rows), args.path, seed=args.seed, start=args.start, days=args.days,
+                       unreadable_rate=args.unreadable_rate, exit_rate=args.exit_rate,
+                       orphan_rate=args.orphan_rate, bad_timestamp_rate=args.bad_timestamp_rate)
+    print(f"{args.path}: {written} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
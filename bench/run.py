@@ -0,0 +1,312 @@
+"""
+Benchmark harness: every endpoint, driven in-process through the ASGI app.
+
+For each dataset size the harness generates (or reuses) a synthetic export
+with bench.generate, then starts a fresh worker process with PARKING_CSV
+pointing at it, so module-level state, the snapshot and the peak memory
+figure belong to that size alone. The worker:
+
+  * times the cold start (first request, including the CSV load);
+  * runs every scenario sequentially (--iterations requests after
+    --warmup ones) for latency percentiles;
+  * runs every scenario with --concurrency requests in flight for
+    throughput;
+  * records the per-stage totals from the /metrics histograms and the
+    process's peak resident memory.
+
+Results are printed as a table and written as JSON. Saved baselines
+(bench/baselines/<name>.json) can be compared against; a scenario whose
+p50 got slower than --tolerance times its baseline is reported as a
+regression and makes the run exit with status 1.
+
+    python -m bench.run --sizes 1e4 1e5 1e6
+    python -m bench.run --sizes 1e4 1e5 --save-baseline local
+    python -m bench.run --sizes 1e4 1e5 --compare local
+    python -m bench.run --sizes 1e6 --backend sqlite
+
+--backend sets PARKING_BACKEND for the worker (see backends.py); the
+SQLite file and partitions are removed first, so the cold start includes
+the ingest.
+
+Scenarios repeat the same URL, so the response cache (http_cache.py) is
+turned off in the worker unless --response-cache is given; otherwise
+every iteration after the first would only measure a cache hit.
+
+/live is not included: it is an endless SSE stream, not a request.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+
+# Exports are capped to a date range at large sizes: an XLSX sheet holds
+# at most 1,048,576 rows, and a full CSV export measures disk, not us
+FULL_EXPORT_ROWS = 1_000_000
+
+
+def scenarios(context):
+    """(name, url) pairs covering every endpoint, with parameters taken from the dataset."""
+    day, plate, prefix = context['last_day'], context['plate'], context['prefix']
+    week = context['last_week']
+    export_range = '' if context['rows'] <= FULL_EXPORT_ROWS else f'&start_date={day}&end_date={day}'
+    return [
+        ('data', '/data'),
+        ('data_page_50', '/data?page=50'),
+        ('data_search', '/data?search=white'),
+        ('data_prefix', f'/data?license_prefix={prefix}'),
+        ('data_filters', '/data?category=car,motorcycle&color=white'),
+        ('data_range', f'/data?start_date={week}&end_date={day}'),
+        ('dashboard_data', '/dashboard/data'),
+        ('dashboard_search', '/dashboard/data?search=mh'),
+        ('category_stats', '/stats/category-stats'),
+        ('category_stats_range', f'/stats/category-stats?start_date={week}&end_date={day}'),
+        ('enhanced_stats', '/stats/enhanced-stats'),
+        ('enhanced_stats_week', '/stats/enhanced-stats?time_range=week'),
+        ('enhanced_stats_trend', '/stats/enhanced-stats?points=300&downsample=lttb'),
+        ('dwell_time', '/stats/dwell-time'),
+        ('dwell_time_range', f'/stats/dwell-time?time_range=custom&start_date={week}&end_date={day}'),
+        ('today', '/stats/today'),
+        ('recent_entries', '/stats/recent-entries'),
+        ('recent_exits', '/stats/recent-exits'),
+        ('summary', '/stats/summary'),
+        ('occupancy', '/occupancy'),
+        ('vehicle', f'/vehicles/{plate}'),
+        ('filters_categories', '/filters/categories'),
+        ('filters_colors', '/filters/colors'),
+        ('filters_gates', '/filters/gates'),
+        ('filters_zones', '/filters/zones'),
+        ('export_count', f'/export/count?categories=car&start_date={week}'),
+        ('export_csv', f'/export?file_format=csv{export_range}'),
+        ('export_csv_gzip', f'/export?file_format=csv&gzip=true{export_range}'),
+        ('export_xlsx', f'/export?file_format=xlsx&start_date={day}&end_date={day}'),
+        ('metrics', '/metrics'),
+    ]
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+async def _request(client, url):
+    started = time.perf_counter()
+    response = await client.get(url)
+    await response.aread()
+    if response.status_code >= 400:
+        raise RuntimeError(f"{url}: HTTP {response.status_code} {response.text[:200]}")
+    return time.perf_counter() - started
+
+
+async def _measure(client, url, warmup, iterations, concurrency):
+    for _ in range(warmup):
+        await _request(client, url)
+    latencies = [await _request(client, url) for _ in range(iterations)]
+
+    # Throughput: concurrency workers issuing requests back to back
+    remaining = iterations
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await _request(client, url)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return dict(percentiles(latencies), throughput_rps=iterations / elapsed, iterations=iterations)
+
+
+def _context(path):
+    """Scenario parameters read from the dataset, outside the measured worker."""
+    import pandas as pd
+
+    events = pd.read_csv(path, usecols=['license_plate', 'timestamp'])
+    stamps = pd.to_datetime(events['timestamp'], utc=True, errors='coerce', format='ISO8601')
+    last = stamps.max()
+    plates = events['license_plate'].astype(object)
+    readable = plates[plates.str.contains(r'[A-Za-z0-9]', na=False)]
+    plate = readable.value_counts().index[0]
+    return {
+        'rows': len(events),
+        'last_day': last.strftime('%Y-%m-%d'),
+        'last_week': (last - pd.Timedelta(days=7)).strftime('%Y-%m-%d'),
+        'plate': plate,
+        'prefix': plate[:2],
+    }
+
+
+def _stage_totals():
+    import metrics
+
+    totals = {}
+    for (_, stage), values in metrics.stage_seconds._series.items():
+        entry = totals.setdefault(stage, {'count': 0, 'seconds': 0.0})
+        entry['count'] += sum(values[:-1])
+        entry['seconds'] += values[-1]
+    return totals
+
+
+async def run_worker(args):
+    """Benchmark the app against PARKING_CSV in this process; return the results."""
+    import httpx
+
+    started = time.perf_counter()
+    import endpoint1
+    transport = httpx.ASGITransport(app=endpoint1.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        cold_start = await _request(client, '/stats/summary')
+        import_and_load = time.perf_counter() - started
+        context = json.loads(args.context)
+
+        results = {}
+        for name, url in scenarios(context):
+            if args.only and name not in args.only:
+                continue
+            heavy = name.startswith('export')
+            iterations = max(3, args.iterations // 10) if heavy else args.iterations
+            results[name] = dict(await _measure(client, url, args.warmup, iterations,
+                                                args.concurrency), url=url)
+            print(f"  {name:<22} p50 {results[name]['p50_ms']:9.2f} ms", file=sys.stderr)
+
+    return {
+        'rows': context['rows'],
+        'cold_start_s': cold_start,
+        'import_and_load_s': import_and_load,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stages': _stage_totals(),
+        'scenarios': results,
+    }
+
+
+def dataset_path(rows, seed):
+    return os.path.join(DATA_DIR, f'events_{rows}_s{seed}.csv')
+
+
+def run_size(rows, args):
+    """Generate the dataset if needed and benchmark it in a fresh worker process."""
+    from bench.generate import generate
+
+    path = dataset_path(rows, args.seed)
+    if not os.path.exists(path):
+        print(f"generating {rows} rows -> {path}", file=sys.stderr)
+        generate(rows, path, seed=args.seed)
+    # Cold starts parse the CSV, not a snapshot or database left by an earlier run
+    shutil.rmtree(path + '.snapshot', ignore_errors=True)
+    shutil.rmtree(path + '.partitions', ignore_errors=True)
+    for suffix in ('.sqlite', '.sqlite-wal', '.sqlite-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    command = [sys.executable, '-m', 'bench.run', '--worker',
+               '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+               '--concurrency', str(args.concurrency), '--context', json.dumps(_context(path))]
+    if args.only:
+        command += ['--only', *args.only]
+    env = dict(os.environ, PARKING_CSV=path, PARKING_BACKEND=args.backend,
+               PYTHONPATH=os.path.dirname(BENCH_DIR))
+    if not args.response_cache:
+        env['PARKING_RESPONSE_CACHE'] = '0'
+    print(f"benchmarking {rows} rows ({args.backend})", file=sys.stderr)
+    output = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE,
+                            cwd=os.path.dirname(BENCH_DIR)).stdout
+    return json.loads(output)
+
+
+def report(results):
+    for size, result in results.items():
+        print(f"\n{size} rows: cold start {result['cold_start_s']:.2f}s, "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB")
+        print(f"  {'scenario':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+        for name, s in result['scenarios'].items():
+            print(f"  {name:<22}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+                  f"{s['throughput_rps']:>10.1f}")
+        stages = ', '.join(f"{stage} {v['seconds']:.2f}s/{v['count']}"
+                           for stage, v in sorted(result['stages'].items()))
+        print(f"  stages: {stages}")
+
+
+def compare(results, baseline, tolerance):
+    """Print p50 ratios against the baseline; return the regressions."""
+    regressions = []
+    print(f"\nagainst baseline (tolerance {tolerance:.2f}x):")
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None:
+            print(f"  {size} rows: no baseline")
+            continue
+        for name, s in result['scenarios'].items():
+            before = base['scenarios'].get(name)
+            if before is None:
+                continue
+            ratio = s['p50_ms'] / max(before['p50_ms'], 1e-6)
+            flag = ''
+            # Sub-millisecond timings are noise-dominated
+            if ratio > tolerance and s['p50_ms'] - before['p50_ms'] > 1.0:
+                flag = '  REGRESSION'
+                regressions.append((size, name, ratio))
+            print(f"  {size:>10} {name:<22}{before['p50_ms']:>10.2f} -> {s['p50_ms']:>10.2f} ms"
+                  f"  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every endpoint per dataset size.")
+    parser.add_argument('--sizes', nargs='+', type=float, default=[1e4, 1e5],
+                        help="dataset sizes in rows (10^4 .. 10^8)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--only', nargs='+', help="scenario names to run")
+    parser.add_argument('--backend', choices=['pandas', 'sqlite', 'partitioned'], default='pandas',
+                        help="storage backend served by the worker")
+    parser.add_argument('--response-cache', action='store_true',
+                        help="keep the response cache on, measuring repeat requests as cache hits")
+    parser.add_argument('--output', help="write the results JSON here")
+    parser.add_argument('--save-baseline', metavar='NAME', help="save the results as bench/baselines/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="compare with bench/baselines/NAME.json")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="p50 slowdown reported as a regression")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--context', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        json.dump(asyncio.run(run_worker(args)), sys.stdout)
+        return
+
+    results = {str(int(size)): run_size(int(size), args) for size in args.sizes}
+    report(results)
+
+    for path in filter(None, [args.output, args.save_baseline and
+                              os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nresults written to {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Blocked bitmap index over the export filter columns, for /export/count.
+
+Each block of BLOCK_ROWS rows keeps a bitmap or a sorted offset list per
+value (as in Roaring bitmaps); blocks are shared between snapshots.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Rows per bitmap block (a multiple of 8)
+BLOCK_ROWS = 1 << 16
+
+# Set bits per byte value; np.bitwise_count needs numpy 2
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Filter name -> (events column, key of a cell value)
+FILTERS = {
+    'category': ('category', str),
+    'color': ('color', str),
+    'gate': ('gate', str),
+    'zone': ('zone', str),
+    'license_prefix': ('license_plate', lambda plate: str(plate)[:2]),
+}
+
+
+class FilterValues:
+    """Grow-only mapping of filter keys to value ids."""
+
+    def __init__(self):
+        self.ids = {}
+        self._lock = threading.Lock()
+
+    def add(self, keys):
+        """Ids of keys, assigning new ids to unseen ones."""
+        with self._lock:
+            return np.array([self.ids.setdefault(key, len(self.ids)) for key in keys], dtype=np.int64)
+
+    def lookup(self, keys):
+        """Ids of the known keys among keys."""
+        return [self.ids[key] for key in keys if key in self.ids]
+
+
+_values = {name: FilterValues() for name in FILTERS}
+
+
+def _row_ids(series, values, key):
+    """Value id of every row of series (-1 where missing)."""
+    codes, uniques = pd.factorize(series)
+    ids = values.add([key(v) for v in np.asarray(uniques, dtype=object)])
+    return np.where(codes >= 0, ids[codes] if len(ids) else -1, -1)
+
+
+# A container is the set of a block's rows holding one value (or matching
+# a filter): packed bits (uint8, little bit order) or sorted offsets (uint16)
+
+
+def _is_bits(container):
+    return container.dtype == np.uint8
+
+
+def _containers(row_ids):
+    """{value id: container} of the values present in one block's rows."""
+    order = np.argsort(row_ids, kind='stable').astype(np.uint16)
+    ids, starts, counts = np.unique(row_ids[order], return_index=True, return_counts=True)
+    containers = {}
+    for value, start, count in zip(ids.tolist(), starts.tolist(), counts.tolist()):
+        if value < 0:
+            continue
+        offsets = order[start:start + count]
+        if count * 16 >= len(row_ids):
+            bits = np.zeros(len(row_ids), dtype=bool)
+            bits[offsets] = True
+            containers[value] = np.packbits(bits, bitorder='little')
+        else:
+            containers[value] = offsets
+    return containers
+
+
+def _union(containers, nbytes):
+    """Rows in any of the containers of one column (which never share a row)."""
+    if not any(_is_bits(c) for c in containers):
+        return np.sort(np.concatenate(containers))
+    bits = np.zeros(nbytes, dtype=np.uint8)
+    for c in containers:
+        if _is_bits(c):
+            bits |= c
+        else:
+            np.bitwise_or.at(bits, c >> 3, np.left_shift(1, c & 7).astype(np.uint8))
+    return bits
+
+
+def _has(bits, offsets):
+    return (bits[offsets >> 3] >> (offsets & 7).astype(np.uint8)) & 1 == 1
+
+
+def _intersect(a, b):
+    if _is_bits(a) and _is_bits(b):
+        return a & b
+    if _is_bits(a):
+        return b[_has(a, b)]
+    if _is_bits(b):
+        return a[_has(b, a)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def _count(container, start, stop, full):
+    if not _is_bits(container):
+        return int(np.searchsorted(container, stop) - np.searchsorted(container, start))
+    if full:
+        return int(POPCOUNT[container].sum(dtype=np.int64))
+    return int(np.unpackbits(container, bitorder='little')[start:stop].sum())
+
+
+def _offsets(container, start, stop):
+    if _is_bits(container):
+        return np.flatnonzero(np.unpackbits(container, bitorder='little')[start:stop]) + start
+    return container[np.searchsorted(container, start):np.searchsorted(container, stop)].astype(np.int64)
+
+
+class BitmapIndex:
+    """Per-value row bitmaps of the filter columns for one snapshot."""
+
+    def __init__(self, size, blocks):
+        self.size = size
+        self.blocks = blocks  # [{filter name: {value id: container}}, ...] one per BLOCK_ROWS rows
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(0, []).rebuild_from(snapshot.events, 0)
+
+    def advance(self, snapshot):
+        """DatasetManager.maintain() hook: rebuild the blocks the appended rows changed."""
+        appended = snapshot.appended
+        if appended.empty:
+            return self
+        # insert_sorted() leaves every row older than the appended ones in place
+        stamps = snapshot.events['datetime_utc']
+        first = appended['datetime_utc'].min()
+        if pd.isna(first):
+            pos = int(stamps.notna().sum())
+        else:
+            pos = int(stamps.searchsorted(first, side='left'))
+        return self.rebuild_from(snapshot.events, min(pos, self.size))
+
+    def rebuild_from(self, events, pos):
+        """New index for events, reusing the blocks that lie entirely before row pos."""
+        keep = pos // BLOCK_ROWS
+        blocks = self.blocks[:keep]
+        for start in range(keep * BLOCK_ROWS, len(events), BLOCK_ROWS):
+            rows = events.iloc[start:start + BLOCK_ROWS]
+            block = {}
+            for name, (column, key) in FILTERS.items():
+                values = _values[name]
+                block[name] = _containers(_row_ids(rows[column], values, key))
+            blocks.append(block)
+        return BitmapIndex(len(events), blocks)
+
+    def _selected(self, b, selections):
+        """Container of block b's rows matching every selection, or None if none can."""
+        block = self.blocks[b]
+        nbytes = -(-min(BLOCK_ROWS, self.size - b * BLOCK_ROWS) // 8)
+        selected = None
+        for name, ids in selections:
+            containers = [block[name][i] for i in ids if i in block[name]]
+            if not containers:
+                return None
+            rows = _union(containers, nbytes)
+            selected = rows if selected is None else _intersect(selected, rows)
+        return selected
+
+    def _blocks(self, lo, hi, selections):
+        """(first row, local start, local stop, container) of the blocks overlapping [lo, hi)."""
+        for b in range(lo // BLOCK_ROWS, -(-hi // BLOCK_ROWS)):
+            base = b * BLOCK_ROWS
+            rows = self._selected(b, selections)
+            if rows is not None:
+                yield base, max(lo - base, 0), min(hi - base, BLOCK_ROWS), rows
+
+    def count(self, lo, hi, selections):
+        """Number of rows in [lo, hi) matching all selections ([(filter name, value ids), ...])."""
+        if not selections:
+            return hi - lo
+        return sum(_count(rows, start, stop, start == 0 and stop == BLOCK_ROWS)
+                   for _, start, stop, rows in self._blocks(lo, hi, selections))
+
+    def rows(self, lo, hi, selections):
+        """Sorted positions of the rows in [lo, hi) matching all selections."""
+        if not selections:
+            return np.arange(lo, hi)
+        parts = [base + _offsets(rows, start, stop)
+                 for base, start, stop, rows in self._blocks(lo, hi, selections)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def selections(**filters):
+    """
+    [(filter name, value ids)] for comma-separated filter parameters.
+
+    Parameters left empty are not filters; values never seen select nothing.
+    """
+    return [(name, _values[name].lookup(value.split(',')))
+            for name, value in filters.items() if value]
+
+
+def bitmap_index(snapshot):
+    return snapshot.derived('bitmaps', BitmapIndex.from_snapshot)
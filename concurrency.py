@@ -0,0 +1,50 @@
+"""
+Bounded thread pool for handler work and SingleFlight request coalescing.
+"""
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dataset import dataset
+
+POOL_SIZE = int(os.environ.get("PARKING_POOL_SIZE", min(32, (os.cpu_count() or 1) + 4)))
+
+pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="parking")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    # Copy the context so the request's metrics labels reach the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(pool, partial(context.run, func, *args, **kwargs))
+
+
+async def current_snapshot():
+    """dataset.current(), which may have to re-read the CSV, off the event loop."""
+    return await run_blocking(dataset.current)
+
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent identical requests."""
+
+    def __init__(self):
+        self._flights = {}
+
+    async def run(self, key, func, *args, **kwargs):
+        """Return func(*args, **kwargs) run in the pool, or the result already being computed for key."""
+        future = self._flights.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_blocking(func, *args, **kwargs))
+            self._flights[key] = future
+            future.add_done_callback(lambda f: self._flights.pop(key, None))
+        # shield: a cancelled waiter (client gone) must not cancel the others
+        return await asyncio.shield(future)
+
+    def __len__(self):
+        return len(self._flights)
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,557 @@
+"""
+Versioned in-memory snapshots of parking_export.csv.
+
+The DatasetManager keeps one parsed Snapshot, sorted by (datetime_utc,
+insertion_id), and swaps in a new one when the file changes, parsing only
+the whole lines appended past its cursor. With persist=True it also loads
+and publishes columnar snapshots (see snapshot_store.py); under the sqlite
+and partitioned backends it holds only a recent window (replay_recent()).
+"""
+import base64
+import io
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+import snapshot_store
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = os.environ.get("PARKING_CSV", "parking_export.csv")
+
+
+@dataclass(frozen=True)
+class FileState:
+    """Identity of the CSV file at the time it was read."""
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def of(cls, path):
+        return cls.from_stat(os.stat(path))
+
+    @classmethod
+    def from_stat(cls, st, size=None):
+        # size overrides st_size with the number of bytes actually read, so a
+        # write racing with the read shows up as a change on the next check
+        return cls(inode=st.st_ino, size=st.st_size if size is None else size,
+                   mtime_ns=st.st_mtime_ns)
+
+
+# Minimum seconds between two snapshot versions written while the CSV grows
+PUBLISH_SECONDS = float(os.environ.get("PARKING_PUBLISH_SECONDS", "5"))
+
+# Bytes kept from just before the ingest offset, used to check that the
+# already-processed part of the file has not been rewritten
+MARKER_SIZE = 4096
+
+# Seconds without a modification after which an unterminated last line is
+# read as a whole row
+SETTLE_SECONDS = float(os.environ.get("PARKING_SETTLE_SECONDS", "1"))
+
+
+@dataclass(frozen=True)
+class IngestCursor:
+    """How far into the CSV a snapshot has read."""
+    offset: int
+    marker: bytes
+    ends_with_newline: bool
+    columns: tuple
+
+    @classmethod
+    def after(cls, data, offset, columns):
+        """Build the cursor for a buffer that was parsed up to its end, at offset in the file."""
+        return cls(
+            offset=offset,
+            marker=bytes(data[max(0, len(data) - MARKER_SIZE):]),
+            ends_with_newline=data.endswith(b'\n'),
+            columns=tuple(columns),
+        )
+
+
+def settled(state, now=None):
+    """True if the file had not been modified for SETTLE_SECONDS when state was taken (or now)."""
+    now = time.time() if now is None else now
+    return now - state.mtime_ns / 1e9 >= SETTLE_SECONDS
+
+
+def whole_lines(data, complete):
+    """Length of the prefix of data holding whole rows: up to the last newline, or all of it when complete."""
+    return len(data) if complete else data.rfind(b'\n') + 1
+
+
+def caught_up(state, offset, current):
+    """
+    True if a read that saw the file as state and parsed it up to offset
+    has nothing left to read, now that the file is as current.
+
+    Bytes past offset are a held-back unterminated line; they become
+    readable once the file has settled.
+    """
+    return state == current and not (offset < state.size and settled(state))
+
+
+def grew_past(path, old_state, state, offset, marker, ends_with_newline):
+    """
+    True if the file at path only grew past offset since old_state.
+
+    The marker (the bytes just before offset) must be unchanged, and a last
+    row read without a newline must be followed by one; otherwise that row
+    was still being written.
+    """
+    if state.inode != old_state.inode or state.size <= offset:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(offset - len(marker))
+        if f.read(len(marker)) != marker:
+            return False
+        return ends_with_newline or f.read(1) in (b'\n', b'\r')
+
+
+def csv_blocks(f, offset, size, block_size, complete=False):
+    """
+    Yield the bytes of f from offset up to size in blocks of whole lines.
+
+    Blocks are about block_size bytes, so a file larger than memory can be
+    ingested a block at a time. An unterminated last line is left out
+    unless complete (the file has settled); the caller's offset then stops
+    before it.
+    """
+    f.seek(offset)
+    pending = b''
+    while offset + len(pending) < size:
+        block = f.read(min(block_size, size - offset - len(pending)))
+        if not block:
+            break
+        data = pending + block
+        end = offset + len(data) >= size
+        cut = whole_lines(data, complete and end)
+        part, pending = data[:cut], data[cut:]
+        if part:
+            offset += len(part)
+            yield part
+
+
+# Dictionary-encoded columns
+CATEGORICAL_COLUMNS = ['license_plate', 'category', 'color', 'gate', 'zone', 'description']
+
+
+def parse_events(source, names=None):
+    """
+    Read parking events from a path or buffer and add the datetime_utc column.
+
+    Pass names when the buffer is a headerless tail of the CSV.
+    """
+    if names is None:
+        events = pd.read_csv(source)
+    else:
+        events = pd.read_csv(source, header=None, names=list(names))
+
+    # Timestamps mix ISO variants ("...41.52+00", "...28+00"); inferring one
+    # format from the first row turned the others into NaT. Unparseable
+    # values still become NaT.
+    with timed('timestamp_parse'):
+        events['datetime_utc'] = pd.to_datetime(events['timestamp'], utc=True, errors='coerce', format='ISO8601')
+
+        if not pd.api.types.is_datetime64_any_dtype(events['datetime_utc']):
+            logger.warning("Datetime conversion did not result in datetime type")
+            events['datetime_utc'] = pd.to_datetime(events['timestamp'], errors='coerce').dt.tz_localize('UTC')
+
+    # Keep one resolution so snapshots, tails and stored columns concatenate cleanly
+    events['datetime_utc'] = events['datetime_utc'].dt.as_unit('ns')
+
+    return categorize(events)
+
+
+def categorize(events):
+    """Make the CATEGORICAL_COLUMNS of events categorical, in place; returns events."""
+    for column in CATEGORICAL_COLUMNS:
+        if column in events.columns:
+            events[column] = events[column].astype('category')
+    return events
+
+
+def align_categories(frames):
+    """
+    Give each categorical column the same categories in every frame.
+
+    Categories new to later frames are appended, so the first frame's codes
+    stay valid. Columns that are not categorical everywhere are left alone.
+    """
+    frames = list(frames)
+    if len(frames) < 2:
+        return frames
+    for column in frames[0].columns:
+        if not all(column in f.columns and isinstance(f[column].dtype, pd.CategoricalDtype) for f in frames):
+            continue
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            extra = frame[column].cat.categories.difference(categories, sort=False)
+            if len(extra):
+                categories = categories.append(extra)
+        frames = [f if f[column].cat.categories.equals(categories)
+                  else f.assign(**{column: f[column].cat.set_categories(categories)})
+                  for f in frames]
+    return frames
+
+
+def concat_frames(frames, **kwargs):
+    """pd.concat that keeps categorical columns categorical."""
+    return pd.concat(align_categories(frames), **kwargs)
+
+
+def distinct_values(series):
+    """
+    Sorted distinct non-null values of a column; read from the dictionary when categorical.
+
+    Appends add their new categories at the end of the dictionary, so it is
+    only in value order after a full load.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return sorted(series.cat.categories.tolist())
+    return sorted(series.dropna().unique().tolist())
+
+
+# Row order of the events frame; insertion_id breaks timestamp ties so the
+# order (and keyset cursors over it) is deterministic
+EVENT_ORDER = ['datetime_utc', 'insertion_id']
+
+
+def sort_events(events):
+    """Stable sort by (datetime_utc, insertion_id) with NaT rows last."""
+    with timed('sort'):
+        return events.sort_values(EVENT_ORDER, kind='mergesort', na_position='last').reset_index(drop=True)
+
+
+def insert_sorted(frame, rows, key):
+    """Merge rows into frame (sorted by key), re-sorting only the overlapping suffix."""
+    if rows.empty:
+        return frame
+    first_key = key[0] if isinstance(key, list) else key
+    first = rows[first_key].min()
+    if pd.isna(first):
+        pos = int(frame[first_key].notna().sum())
+    else:
+        pos = frame[first_key].searchsorted(first, side='left')
+    with timed('sort'):
+        suffix = concat_frames([frame.iloc[pos:], rows]).sort_values(key, kind='mergesort', na_position='last')
+        return concat_frames([frame.iloc[:pos], suffix], ignore_index=True)
+
+
+class Snapshot:
+    """
+    One immutable, parsed version of the dataset.
+
+    The events frame is shared by every request holding this snapshot and
+    must be treated as read-only. Values derived from it (indexes, joins)
+    can be memoized per snapshot through derived().
+    """
+
+    def __init__(self, version, events, state, cursor, load_seconds, appended=None):
+        self.version = version
+        self.events = events
+        self.state = state
+        self.cursor = cursor
+        self.load_seconds = load_seconds
+        # Rows added on top of the previous snapshot; None after a full rebuild
+        self.appended = appended
+        self.loaded_at = time.time()
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def offset(self):
+        """Bytes of the CSV parsed into this snapshot (None if it was not read from the CSV)."""
+        return self.cursor.offset if self.cursor is not None else None
+
+    def derived(self, key, build):
+        """Return build(self), computed at most once for this snapshot."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+
+class DatasetManager:
+    """Holds the current Snapshot and reloads it when the CSV changes."""
+
+    def __init__(self, path=DATA_PATH, persist=True):
+        self.path = path
+        self.persist = persist
+        self._persisted_offset = 0
+        self._persist_thread = None
+        self._published_at = 0.0
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._maintained = {}
+        self._directory = snapshot_store.snapshot_dir(path)
+        # Lock file held while this process is the one writing snapshots
+        self._writer = None
+        self._published = None
+        # Set by replay_recent()
+        self._recent = None
+        self._window = None
+
+    def maintain(self, key, build, extend, publish=None):
+        """
+        Keep a derived structure up to date with every new snapshot.
+
+        build(snapshot) creates it from scratch after a full load;
+        extend(previous_value, snapshot) updates it from snapshot.appended.
+        The result is available as snapshot.derived(key, build).
+
+        publish, a (to_frame(value), from_frame(frame, snapshot)) pair, stores
+        the value with the on-disk snapshot so workers starting up load it
+        instead of building it.
+
+        When a worker attaches to a newly published version, snapshot.appended
+        holds the rows beyond its own previous snapshot, so its values are
+        extended (and ones recording its own history, like the live change
+        log, continued) rather than rebuilt.
+        """
+        with self._lock:
+            self._maintained[key] = (build, extend, publish)
+
+    def replay_recent(self, recent, window):
+        """
+        Hold only the events within window of the newest one.
+
+        For a backend that stores the whole history itself: recent(window)
+        returns (events, state, cursor) of that window, read from the
+        backend, and replaces parsing the whole CSV on a full load.
+        Appended rows are still parsed from the CSV, and rows falling out
+        of the window dropped. Such snapshots are not persisted.
+        """
+        with self._lock:
+            self._recent, self._window = recent, window
+            self.persist = False
+
+    def latest(self):
+        """The snapshot loaded last, without checking the file; None before the first load."""
+        return self._snapshot
+
+    def current(self):
+        """Return the latest snapshot, reloading first if the file or the published version changed."""
+        snapshot = self._snapshot
+        if (snapshot is not None and caught_up(snapshot.state, snapshot.cursor.offset, FileState.of(self.path))
+                and not self._published_changed()):
+            return snapshot
+        return self.refresh()
+
+    def _published_changed(self):
+        """True if a snapshot version was published since we loaded ours."""
+        return self.persist and snapshot_store.pointer_state(self._directory) != self._published
+
+    def refresh(self, force=False):
+        """
+        Bring the snapshot up to date with the CSV.
+
+        Appended bytes are parsed incrementally; anything else (truncation,
+        rotation, a rewrite of already-read data, or force=True) triggers a
+        full rebuild.
+        """
+        with self._lock:
+            state = FileState.of(self.path)
+            snapshot = self._snapshot
+            published = self._published_changed()
+            if (snapshot is not None and caught_up(snapshot.state, snapshot.cursor.offset, state)
+                    and not force and not published):
+                # Another request reloaded while we were waiting for the lock
+                return snapshot
+
+            started = time.perf_counter()
+            try:
+                base, stored = snapshot, None
+                if (base is None or published) and self.persist and not force:
+                    # Attach to the published version (shared with the other workers)
+                    stored = self._load_stored(started)
+                    base = stored or base
+                new = None
+                if base is not None and not force:
+                    cursor = base.cursor
+                    if caught_up(base.state, cursor.offset, state):
+                        new = base
+                    elif grew_past(self.path, base.state, state, cursor.offset, cursor.marker,
+                                   cursor.ends_with_newline):
+                        new = self._load_tail(base, started)
+                if new is None:
+                    base, new = None, self._load_full(started)
+                if base is stored and stored is not None and snapshot is not None:
+                    # Continue from our previous snapshot rather than rebuilding
+                    rows = self._rows_between(snapshot, new)
+                    if rows is not None:
+                        base, new.appended = snapshot, rows
+                        if rows.empty:
+                            # The same rows, now shared
+                            new.version = snapshot.version
+                self._update_maintained(base, new)
+            except Exception:
+                logger.exception("Error loading %s", self.path)
+                if snapshot is None:
+                    raise
+                return snapshot
+
+            self._snapshot = new
+            self._maybe_persist(new)
+            return new
+
+    def _update_maintained(self, previous, snapshot):
+        for key, (build, extend, _) in self._maintained.items():
+            if key in snapshot._derived:
+                # Loaded with a published snapshot
+                continue
+            if snapshot.appended is not None and previous is not None and key in previous._derived:
+                value = extend(previous._derived[key], snapshot)
+            else:
+                value = build(snapshot)
+            snapshot._derived[key] = value
+
+    def _rows_between(self, previous, snapshot):
+        """The rows snapshot holds beyond previous, read from the CSV; None unless it continues it."""
+        old, new = previous.cursor, snapshot.cursor
+        if (old is None or new is None or new.columns != old.columns or new.offset < old.offset
+                or snapshot.state.inode != previous.state.inode):
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(old.offset - len(old.marker))
+            data = f.read(new.offset - f.tell())
+        if not data.startswith(old.marker):
+            return None
+        data = data[len(old.marker):]
+        if not old.ends_with_newline and data and not data.startswith((b'\n', b'\r')):
+            return None
+        if not data.strip():
+            return previous.events.iloc[0:0]
+        return parse_events(io.BytesIO(data), names=old.columns)
+
+    def _next_version(self):
+        self._version += 1
+        return self._version
+
+    def _load_stored(self, started):
+        """Load the on-disk columnar snapshot if one was written for this file."""
+        directory = self._directory
+        pointer = snapshot_store.pointer_state(directory)
+        meta = snapshot_store.read_meta(directory)
+        if meta is None:
+            return None
+        events = snapshot_store.load_columns(directory, meta)
+        tables = snapshot_store.load_tables(directory, meta)
+        c = meta['cursor']
+        cursor = IngestCursor(offset=c['offset'], marker=base64.b64decode(c['marker']),
+                              ends_with_newline=c['ends_with_newline'], columns=tuple(c['columns']))
+        state = FileState(**meta['state'])
+        self._persisted_offset = cursor.offset
+        self._published = pointer
+        snapshot = Snapshot(self._next_version(), events, state, cursor, time.perf_counter() - started)
+        for key, (_, _, publish) in self._maintained.items():
+            if publish is not None and key in tables:
+                snapshot._derived[key] = publish[1](tables[key], snapshot)
+        return snapshot
+
+    def tables(self, snapshot):
+        """The frames to publish with snapshot: its maintained values that have a publish hook."""
+        return {key: publish[0](snapshot._derived[key])
+                for key, (_, _, publish) in self._maintained.items()
+                if publish is not None and key in snapshot._derived}
+
+    def _maybe_persist(self, snapshot):
+        if not self.persist:
+            return
+        if self._writer is None:
+            # Only one process writes versions; the others attach to them
+            self._writer = snapshot_store.lock_writer(self._directory)
+            if self._writer is None:
+                return
+        if snapshot.cursor.offset == self._persisted_offset or self._persist_thread is not None:
+            # Published already, or the running publisher picks it up
+            return
+        self._persist_thread = threading.Thread(target=self._persist, daemon=True)
+        self._persist_thread.start()
+
+    def _persist(self):
+        """Publish the latest snapshot, at most once per PUBLISH_SECONDS, until it is the published one."""
+        while True:
+            with self._lock:
+                if self._snapshot.cursor.offset == self._persisted_offset:
+                    self._persist_thread = None
+                    return
+            time.sleep(max(0.0, self._published_at + PUBLISH_SECONDS - time.time()))
+            with self._lock:
+                snapshot = self._snapshot
+                self._persisted_offset = snapshot.cursor.offset
+            self._published_at = time.time()
+            try:
+                snapshot_store.write_snapshot(snapshot.events, snapshot.state, snapshot.cursor,
+                                              self._directory, self.tables(snapshot))
+            except Exception:
+                logger.exception("Error writing snapshot for %s", self.path)
+
+    def _read(self, offset):
+        """(bytes from offset to EOF, FileState of what was read, bytes holding whole rows)."""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+            # Taken after the read, so the mtime covers every byte read
+            st = os.fstat(f.fileno())
+        state = FileState.from_stat(st, offset + len(data))
+        return data, state, whole_lines(data, settled(state))
+
+    def _trim(self, events):
+        """The dated events within the replay window of the newest one."""
+        stamps = events['datetime_utc']
+        dated = int(stamps.notna().sum())
+        if not dated:
+            return events.iloc[0:0]
+        start = int(stamps.iloc[:dated].searchsorted(stamps.iloc[dated - 1] - self._window))
+        if start == 0 and dated == len(events):
+            return events
+        return events.iloc[start:dated].reset_index(drop=True)
+
+    def _load_full(self, started):
+        if self._recent is not None:
+            events, state, cursor = self._recent(self._window)
+            return Snapshot(self._next_version(), events, state, cursor, time.perf_counter() - started)
+        data, state, cut = self._read(0)
+        # A file without any newline is only a header
+        data = data[:cut or len(data)]
+        with timed('csv_load'):
+            events = parse_events(io.BytesIO(data))
+        cursor = IngestCursor.after(data, len(data), events.columns.drop('datetime_utc'))
+        events = sort_events(events)
+        return Snapshot(self._next_version(), events, state, cursor, time.perf_counter() - started)
+
+    def _load_tail(self, snapshot, started):
+        cursor = snapshot.cursor
+        data, state, cut = self._read(cursor.offset)
+        data = data[:cut]
+
+        if not data.strip():
+            tail = snapshot.events.iloc[0:0]
+        else:
+            with timed('csv_load'):
+                tail = parse_events(io.BytesIO(data), names=cursor.columns)
+
+        new_cursor = IngestCursor.after(cursor.marker + data, cursor.offset + len(data), cursor.columns)
+        events = insert_sorted(snapshot.events, tail, EVENT_ORDER)
+        if self._window is not None:
+            events = self._trim(events)
+        return Snapshot(self._next_version(), events, state, new_cursor,
+                        time.perf_counter() - started, appended=tail)
+
+
+dataset = DatasetManager()
@@ -0,0 +1,122 @@
+"""
+Trend series of at most `points` points for /stats/enhanced-stats.
+
+Methods: sum (the finest bucket that fits), minmax and lttb.
+"""
+import numpy as np
+
+from live_counters import MINUTE
+from rollup import HOUR, hourly_counts
+
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+# 1970-01-01 was a Thursday; week buckets are counted from Monday 1970-01-05
+WEEK_ORIGIN = 4 * DAY
+
+# (name, width, origin), finest first
+LEVELS = [('minute', MINUTE, 0), ('hour', HOUR, 0), ('day', DAY, 0), ('week', WEEK, WEEK_ORIGIN)]
+
+METHODS = ('sum', 'minmax', 'lttb')
+
+# Longest hourly series minmax and lttb pick from; longer ranges pick from days
+MAX_SOURCE = 100_000
+
+
+def rebucket(stamps, counts, width, origin=0):
+    """Sum a series into buckets of width ns counted from origin; gaps as 0."""
+    keys = (stamps - origin) // width
+    sums = np.bincount(keys - keys[0], weights=counts, minlength=1).astype(np.int64)
+    return origin + (keys[0] + np.arange(len(sums))) * width, sums
+
+
+def _buckets(first, last, width, origin=0):
+    return (last - origin) // width - (first - origin) // width + 1
+
+
+def level(first, last, points):
+    """(name, width, origin, interval) of the finest bucket needing at most points buckets."""
+    for name, width, origin in LEVELS:
+        if _buckets(first, last, width, origin) <= points:
+            return name, width, origin, 1
+    # Longer than `points` weeks: several weeks per bucket
+    name, width, origin = LEVELS[-1]
+    interval = -(-_buckets(first, last, width, origin) // points)
+    while _buckets(first, last, width * interval, origin) > points:
+        interval += 1
+    return name, width, origin, interval
+
+
+def minmax(stamps, counts, points):
+    """Indices of the lowest and highest value of points // 2 equal groups, in time order."""
+    groups = np.array_split(np.arange(len(counts)), max(1, points // 2))
+    picked = set()
+    for group in groups:
+        if len(group):
+            values = counts[group]
+            picked.update((int(group[np.argmin(values)]), int(group[np.argmax(values)])))
+    return np.array(sorted(picked), dtype=np.int64)
+
+
+def lttb(stamps, counts, points):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps, first and last included."""
+    size = len(counts)
+    if points >= size or points < 3:
+        return np.arange(size)
+    x = stamps.astype(np.float64)
+    y = counts.astype(np.float64)
+    # Inner points split into points - 2 groups; one point is kept per group
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    picked = [0]
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # The next group's average is the triangle's third corner
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else size
+        if nxt_lo >= nxt_hi:
+            nxt_lo, nxt_hi = size - 1, size
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        ax, ay = x[picked[-1]], y[picked[-1]]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        picked.append(lo + int(np.argmax(area)))
+    picked.append(size - 1)
+    return np.array(picked, dtype=np.int64)
+
+
+PICKERS = {'minmax': minmax, 'lttb': lttb}
+
+
+def trend(cells, points, method='sum', minute_counts=None, start=None, end=None):
+    """
+    The range's trend as {"bucket", "interval", "method", "timestamps", "counts"}.
+
+    timestamps are bucket starts in milliseconds since the epoch (UTC), and
+    a bucket is `interval` times `bucket` long. start and end are the
+    requested range (Timestamps); the bucket is chosen from its span, or
+    from the hours present for an open end. minute_counts() returns the
+    (minute ns, count) arrays of the range; it is only called when the
+    range spans at most `points` minutes.
+    """
+    totals = hourly_counts(cells)
+    result = {'bucket': 'hour', 'interval': 1, 'method': method, 'timestamps': [], 'counts': []}
+    if totals.empty:
+        return result
+    stamps, counts = totals.index.asi8, totals.to_numpy(dtype=np.int64)
+
+    first = stamps[0] if start is None else start.value
+    last = stamps[-1] + HOUR - 1 if end is None else end.value
+    name, width, origin, interval = level(first, last, points)
+    if name == 'minute':
+        stamps, counts = rebucket(*minute_counts(), MINUTE)
+    elif name == 'hour' or method == 'sum':
+        stamps, counts = rebucket(stamps, counts, width * interval, origin)
+    else:
+        # Peaks are picked from the hours, or from the days of very long ranges
+        name, interval = 'hour', 1
+        if len(stamps) > MAX_SOURCE:
+            name = 'day'
+            stamps, counts = rebucket(stamps, counts, DAY)
+        keep = PICKERS[method](stamps, counts, points)
+        stamps, counts = stamps[keep], counts[keep]
+
+    result.update(bucket=name, interval=interval,
+                  timestamps=(stamps // 1_000_000).tolist(), counts=counts.tolist())
+    return result
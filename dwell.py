@@ -0,0 +1,179 @@
+"""
+Hourly dwell-time histograms of the closed sessions.
+
+Buckets are log-linear: one per second below 64 s, then 32 per power of
+two up to 2**20 s. Histograms merge and subtract by adding counts.
+"""
+import numpy as np
+
+from dataset import concat_frames
+from rollup import HOUR, split_hours
+from sessions import SessionTable
+from time_index import session_time_index
+
+SUB_BITS = 5
+SUB_BUCKETS = 1 << SUB_BITS
+BUCKETS = 512
+
+DIMENSIONS = ['zone', 'category', 'gate']
+CELL_KEYS = ['hour'] + DIMENSIONS + ['bucket']
+
+QUANTILES = (50, 90, 99)
+
+
+def bucket_of(seconds):
+    """Histogram bucket of each duration in seconds."""
+    values = np.clip(np.floor(seconds), 0, None).astype(np.int64)
+    # frexp()'s exponent is the bit length of a positive integer (0 for 0)
+    shift = np.maximum(np.frexp(values.astype(np.float64))[1] - 1 - SUB_BITS, 0)
+    return np.minimum(SUB_BUCKETS * shift + (values >> shift), BUCKETS - 1)
+
+
+def bucket_bounds(buckets):
+    """(lower, upper) seconds of each bucket; a bucket holds lower <= duration < upper."""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    shift = np.maximum(buckets // SUB_BUCKETS - 1, 0)
+    lower = (buckets - SUB_BUCKETS * shift) << shift
+    return lower, lower + (1 << shift)
+
+
+def aggregate(sessions):
+    """Histogram cells of the closed sessions in a session table, sorted by hour."""
+    closed = sessions[sessions['duration'].to_numpy() >= 0]
+    seconds = closed['duration'].to_numpy()
+    cells = closed[['zone', 'category', 'entry_gate']].rename(columns={'entry_gate': 'gate'}).assign(
+        hour=closed['entry_timestamp'].array.asi8 // HOUR * HOUR,
+        bucket=bucket_of(seconds),
+        count=1,
+        seconds=seconds,
+    )
+    return (cells.groupby(CELL_KEYS, dropna=False, sort=True, observed=True)[['count', 'seconds']].sum()
+            .reset_index())
+
+
+def _merge(cells, delta):
+    """Add delta's (possibly negative) counts into cells, re-aggregating from delta's first hour on."""
+    if delta.empty:
+        return cells
+    pos = cells['hour'].searchsorted(delta['hour'].min(), side='left')
+    suffix = (concat_frames([cells.iloc[pos:], delta])
+              .groupby(CELL_KEYS, dropna=False, sort=True, observed=True)[['count', 'seconds']].sum()
+              .reset_index())
+    suffix = suffix[suffix['count'] != 0]
+    return concat_frames([cells.iloc[:pos], suffix], ignore_index=True)
+
+
+class DwellRollup:
+    """Hourly duration histograms for one dataset snapshot and the SessionTable they count."""
+
+    def __init__(self, cells, sessions):
+        self.cells = cells
+        self.sessions = sessions
+        self.hours = cells['hour'].to_numpy()
+
+    def __len__(self):
+        return len(self.cells)
+
+    @classmethod
+    def build(cls, sessions):
+        return cls(aggregate(sessions.table), sessions)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls.build(snapshot.derived('sessions', SessionTable.from_snapshot))
+
+    @classmethod
+    def from_table(cls, table, snapshot):
+        """DatasetManager publish hook: the cells stored with the snapshot, over its published sessions."""
+        return cls(table, snapshot.derived('sessions', SessionTable.from_snapshot))
+
+    def to_table(self):
+        """DatasetManager publish hook: the frame to store with the snapshot."""
+        return self.cells
+
+    def advance(self, snapshot):
+        """DatasetManager.maintain() hook: swap the sessions the append re-paired."""
+        sessions = snapshot.derived('sessions', SessionTable.from_snapshot)
+        if sessions is self.sessions:
+            return self
+        if sessions.changes is None:
+            return DwellRollup.build(sessions)
+        removed, added = sessions.changes
+        removed = aggregate(removed)
+        removed[['count', 'seconds']] *= -1
+        return DwellRollup(_merge(self.cells, concat_frames([removed, aggregate(added)], ignore_index=True)),
+                           sessions)
+
+    def empty(self):
+        return self.cells.iloc[0:0]
+
+    def _hour_range(self, first=None, stop=None):
+        lo = 0 if first is None else np.searchsorted(self.hours, first, side='left')
+        hi = len(self.hours) if stop is None else np.searchsorted(self.hours, stop, side='left')
+        return self.cells.iloc[lo:max(lo, hi)]
+
+    def range_cells(self, snapshot, start=None, end=None, end_inclusive=True):
+        """Cells covering exactly the closed sessions entered at start <= ts <= end (or < end)."""
+        if start is None and end is None:
+            return self.cells
+
+        table = self.sessions.table
+        index = session_time_index(snapshot, self.sessions)
+        lo, head, tail, hi, first, stop = split_hours(index, start, end, end_inclusive)
+        if head is None:
+            return aggregate(table.iloc[lo:hi])
+        parts = [aggregate(table.iloc[lo:head]), self._hour_range(first, stop),
+                 aggregate(table.iloc[tail:hi])]
+        return concat_frames([part for part in parts if not part.empty] or [self.empty()],
+                             ignore_index=True)
+
+
+def dwell_rollup(snapshot):
+    # The session table first: derived() builds must not call derived() themselves
+    sessions = snapshot.derived('sessions', SessionTable.from_snapshot)
+    return snapshot.derived('dwell', lambda s: DwellRollup.build(sessions))
+
+
+def summary(cells):
+    """
+    Session count, mean, percentiles and histogram of some cells.
+
+    A percentile is the mean duration of the bucket holding that rank, so
+    it is exact when the bucket's sessions all lasted the same and off by
+    at most the bucket's width otherwise. The histogram lists the non-empty
+    buckets only.
+    """
+    buckets = cells['bucket'].to_numpy()
+    counts = np.bincount(buckets, weights=cells['count'].to_numpy(), minlength=BUCKETS).astype(np.int64)
+    seconds = np.bincount(buckets, weights=cells['seconds'].to_numpy(), minlength=BUCKETS)
+    total = int(counts.sum())
+    result = {"completed_sessions": total, "mean_seconds": None}
+    result.update({f"p{q}_seconds": None for q in QUANTILES})
+    filled = np.flatnonzero(counts > 0)
+    lower, upper = bucket_bounds(filled)
+    result["histogram"] = {
+        "lower_seconds": lower.tolist(),
+        "upper_seconds": upper.tolist(),
+        "counts": counts[filled].tolist(),
+    }
+    if not total:
+        return result
+
+    result["mean_seconds"] = float(seconds.sum() / total)
+    cumulative = np.cumsum(counts)
+    for q in QUANTILES:
+        # Nearest rank: the smallest duration with at least q% of the sessions at or below it
+        bucket = int(np.searchsorted(cumulative, max(1, int(np.ceil(q / 100 * total))), side='left'))
+        result[f"p{q}_seconds"] = float(seconds[bucket] / counts[bucket])
+    return result
+
+
+def grouped_summaries(cells, dimension):
+    """summary() per value of one dimension, most sessions first, ties in value order."""
+    groups = {}
+    for value, group in cells.groupby(dimension, observed=True, sort=True):
+        stats = summary(group)
+        if stats["completed_sessions"] > 0:
+            groups[value] = stats
+    ordered = sorted(groups.items(), key=lambda item: item[0])
+    return dict(sorted(ordered, key=lambda item: -item[1]["completed_sessions"]))
@@ -23,8 +23,6 @@ df = pd.read_csv(csv_filename)
 @app.get("/data")
 def get_data():
     """Endpoint to return the CSV data as JSON."""
-    
-    print(df.head())  # Add this line to check the DataFrame content
     return df.to_dict(orient="records")
 
 # Run the server with: uvicorn filename:app --reload
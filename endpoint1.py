@@ -1,15 +1,31 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 from typing import Optional
-from datetime import datetime, timedelta
-import pytz
-from fastapi.responses import StreamingResponse
-import io
-import pandas as pd
-from typing import Optional
-from fastapi import Query
-import numpy as np
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import logging
+import time
+
+from backends import backend, current_view
+from concurrency import current_snapshot, run_blocking, single_flight
+from dataset import dataset
+from downsample import METHODS as DOWNSAMPLE_METHODS, trend as downsampled_trend
+from dwell import DIMENSIONS as DWELL_DIMENSIONS, grouped_summaries, summary as dwell_summary
+from export_stream import csv_chunks, gzipped, xlsx_chunks
+from http_cache import response_cache
+from live import ChangeLog, event_stream
+from live_counters import LiveCounters
+import metrics
+from occupancy import Occupancy, occupancy
+from plate_index import is_unreadable
+from rollup import busiest_hour, dimension_counts, hourly_counts
+from time_index import day_bounds, time_range_bounds, to_utc
+from serialization import FastJSONResponse, records
+
+# The query structures are maintained by the backend (backends.py); the
+# live feed and occupancy always replay the in-memory snapshots
+dataset.maintain('counters', LiveCounters.from_snapshot, LiveCounters.advance)
+dataset.maintain('occupancy', Occupancy.from_snapshot, Occupancy.advance)
+dataset.maintain('changes', ChangeLog.from_snapshot, ChangeLog.advance)
 
 app = FastAPI()
 app.add_middleware(
@@ -20,167 +36,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variable to store the DataFrame
-df = None
+logger = logging.getLogger(__name__)
 
-# def reload_data():
-#     """Reload data from CSV file with proper datetime handling."""
-#     global df
-#     try:
-#         # Load the CSV
-#         df = pd.read_csv("parking_export.csv")
-        
-#         # Convert timestamp to datetime with error handling
-#         try:
-#             # First attempt: Try parsing as ISO format
-#             df['datetime_utc'] = pd.to_datetime(df['timestamp'],format='ISO8601')
-#         except (ValueError, TypeError) as e:
-#             print(f"First parsing attempt failed: {e}")
-#             try:
-#                 # Second attempt: Try with explicit format
-#                 df['datetime_utc'] = pd.to_datetime(df['timestamp'], format="%Y-%m-%d %H:%M:%S.%f%z")
-#             except (ValueError, TypeError) as e:
-#                 print(f"Second parsing attempt failed: {e}")
-#                 # Final attempt: Try with coerce option to handle mixed formats
-#                 df['datetime_utc'] = pd.to_datetime(df['timestamp'], format='mixed', utc=True)
-        
-#         # Verify the conversion worked
-#         if not pd.api.types.is_datetime64_any_dtype(df['datetime_utc']):
-#             print("Warning: datetime conversion did not result in datetime type")
-#             # Force UTC timezone if not present
-#             df['datetime_utc'] = pd.to_datetime(df['timestamp']).dt.tz_localize('UTC')
-        
-#         return df
-#     except Exception as e:
-#         print(f"Error in reload_data: {e}")
-#         raise
+# Event search: see search_index.py
+SEARCH_HELP = "Text in the plate, category, color, gate or zone name, or a UTC date (YYYY-MM-DD)"
 
 
-def reload_data():
-    """Reload data from CSV file with proper datetime handling."""
-    global df
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """Time each request and label the stages it runs with its route."""
+    route = metrics.route_template(app, request.scope)
+    token = metrics.endpoint.set(route)
+    started = time.perf_counter()
+    status = 500
     try:
-        # Load the CSV
-        df = pd.read_csv("parking_export.csv")
-        
-        # Convert timestamp to datetime; let pandas infer the format automatically
-        df['datetime_utc'] = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
-        
-        # Verify the conversion worked
-        if not pd.api.types.is_datetime64_any_dtype(df['datetime_utc']):
-            print("Warning: datetime conversion did not result in datetime type")
-            df['datetime_utc'] = pd.to_datetime(df['timestamp'], errors='coerce').dt.tz_localize('UTC')
-        
-        return df
-    except Exception as e:
-        print(f"Error in reload_data: {e}")
-        raise
-
-
-def safe_serialize(obj):
-    """
-    Custom JSON serializer to handle various data types.
-    """
-    if pd.isna(obj):
-        return None
-    if isinstance(obj, pd.Timestamp):
-        return obj.isoformat()
-    if isinstance(obj, (np.integer, np.floating)):
-        return float(obj)
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    return obj
-
-def merge_entries_exits(df):
-    """
-    Optimized merge of entry and exit records with robust null handling.
-    The fix here is to rename left-side columns (with _entry suffix) to their original names,
-    ensuring that columns like 'category', 'color', 'zone', and 'description' are present.
-    """
-    # Convert timestamp and handle invalid dates
-    df['datetime_utc'] = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
-    df = df.dropna(subset=['datetime_utc'])
-    
-    # Separate entries and exits based on the gate suffix
-    mask_in = df['gate'].str.endswith('_in', na=False)
-    mask_out = df['gate'].str.endswith('_out', na=False)
-    
-    entries = df[mask_in].copy()
-    exits = df[mask_out].copy()
-    
-    # Rename the exit timestamp so it isn't used as the join key on both sides
-    exits = exits.rename(columns={'datetime_utc': 'exit_timestamp'})
-    
-    # Sort for merge_asof
-    entries = entries.sort_values('datetime_utc')
-    exits = exits.sort_values('exit_timestamp')
-    
-    # Handle cases where there are no exit records.
-    if entries.empty:
-        return pd.DataFrame()  # or return an empty DataFrame with expected columns
-    if exits.empty:
-        entries['exit_timestamp'] = pd.NaT
-        entries['exit_gate'] = ''
-        entries['insertion_id_exit'] = -1
-        entries['duration'] = -1
-        result = entries.rename(columns={
-            'datetime_utc': 'entry_timestamp',
-            'gate': 'entry_gate',
-            'insertion_id': 'insertion_id'
-        })
-        result = result[['insertion_id', 'license_plate', 'category', 'color',
-                         'entry_timestamp', 'entry_gate', 'exit_timestamp', 'exit_gate',
-                         'zone', 'description', 'insertion_id_exit', 'duration']]
-        return result
-    
-    # Merge using merge_asof
-    merged = pd.merge_asof(
-        left=entries,
-        right=exits,
-        left_on='datetime_utc',
-        right_on='exit_timestamp',
-        by='license_plate',
-        direction='forward',
-        suffixes=('_entry', '_exit'),
-        tolerance=pd.Timedelta(days=7)  # maximum allowed gap between entry and exit
-    )
-    
-    # Calculate duration in seconds if an exit is found; else set to -1
-    merged['duration'] = merged.apply(
-        lambda x: (x['exit_timestamp'] - x['datetime_utc']).total_seconds() 
-                  if pd.notnull(x['exit_timestamp']) else -1,
-        axis=1
-    )
-    
-    # Rename left-side columns to their desired final names.
-    # This ensures that columns like 'category', 'color', 'zone', and 'description'
-    # appear in the final DataFrame.
-    merged = merged.rename(columns={
-        'datetime_utc': 'entry_timestamp',
-        'gate_entry': 'entry_gate',
-        'insertion_id_entry': 'insertion_id',
-        'category_entry': 'category',
-        'color_entry': 'color',
-        'zone_entry': 'zone',
-        'description_entry': 'description'
-    })
-    
-    # Select and order the desired columns.
-    result_df = merged[['insertion_id', 'license_plate', 'category', 'color',
-                        'entry_timestamp', 'entry_gate', 'exit_timestamp', 'gate_exit',
-                        'zone', 'description', 'insertion_id_exit', 'duration']]
-    result_df = result_df.rename(columns={'gate_exit': 'exit_gate'})
-    
-    # Fill null values as needed
-    result_df['exit_timestamp'] = result_df['exit_timestamp'].fillna(pd.NaT)
-    result_df['exit_gate'] = result_df['exit_gate'].fillna('')
-    result_df['insertion_id_exit'] = result_df['insertion_id_exit'].fillna(-1)
-    result_df['duration'] = result_df['duration'].fillna(-1)
-    
-    return result_df
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.request_seconds.observe(time.perf_counter() - started, route, request.method, str(status))
+        metrics.endpoint.reset(token)
+
+
+def _latest_gauge(latest, read):
+    def gauge():
+        value = latest()
+        return read(value) if value is not None else None
+    return gauge
+
+
+metrics.gauge('parking_dataset_rows', "Events in the current snapshot.",
+              _latest_gauge(backend.latest, len))
+metrics.gauge('parking_snapshot_version', "Version number of the current snapshot.",
+              _latest_gauge(backend.latest, lambda v: v.version))
+metrics.gauge('parking_reload_seconds', "Time taken to build the current snapshot.",
+              _latest_gauge(backend.latest, lambda v: v.load_seconds))
+metrics.gauge('parking_snapshot_age_seconds', "Seconds since the current snapshot was loaded.",
+              _latest_gauge(backend.latest, lambda v: time.time() - v.loaded_at))
+metrics.gauge('parking_events_frame_bytes', "Memory used by the current events frame.",
+              _latest_gauge(dataset.latest, lambda s: s.derived(
+                  'memory', lambda s: int(s.events.memory_usage(deep=True).sum()))))
+metrics.gauge('parking_process_resident_bytes', "Resident memory of this worker process.",
+              metrics.resident_bytes)
+metrics.gauge('parking_computations_in_flight', "Distinct handler computations currently running.",
+              lambda: len(single_flight))
+metrics.gauge('parking_response_cache_entries', "Encoded responses held in the response cache.",
+              lambda: len(response_cache))
+metrics.gauge('parking_response_cache_bytes', "Bytes of encoded responses held in the response cache.",
+              lambda: response_cache.nbytes)
 
 @app.get("/data")
 async def get_data(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
@@ -189,412 +96,398 @@ async def get_data(
     license_prefix: Optional[str] = None,
     category: Optional[str] = None,
     color: Optional[str] = None,
-    gate: Optional[str] = None
+    gate: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = True
 ):
-    # Reload data
-    reload_data()
-    
-    # Merge entries and exits using the optimized function.
-    merged_df = merge_entries_exits(df)
-    
-    # Apply filters
-    if search:
-        string_cols = merged_df.select_dtypes(include=['object']).columns
-        filter_cond = merged_df[string_cols].apply(
-            lambda col: col.astype(str).str.contains(search, case=False, na=False)
-        ).any(axis=1)
-        merged_df = merged_df[filter_cond]
+    # Current version of the data, brought up to date off the event loop;
+    # the CSV is only re-read when it has changed
+    view = await current_view()
     
-    # Date range filtering with robust parsing.
-    try:
-        if start_date or end_date:
-            merged_df['parsed_entry_timestamp'] = pd.to_datetime(
-                merged_df['entry_timestamp'], utc=True, errors='coerce'
+    def compute():
+        # Entry/exit sessions, newest first, filtered and paged by the backend
+        try:
+            paginated, total, next_cursor = view.sessions_page(
+                page, page_size, cursor, include_total, search, start_date, end_date,
+                license_prefix, category, color, gate
             )
-            if start_date:
-                start = pd.to_datetime(start_date, utc=True)
-                merged_df = merged_df[merged_df['parsed_entry_timestamp'] >= start]
-            if end_date:
-                end = pd.to_datetime(end_date, utc=True)
-                merged_df = merged_df[merged_df['parsed_entry_timestamp'] <= end]
-            merged_df = merged_df.drop(columns=['parsed_entry_timestamp'])
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid date format: {e}")
-    
-    # Additional filters
-    if license_prefix:
-        merged_df = merged_df[merged_df['license_plate'].str.startswith(license_prefix)]
-    
-    if category:
-        merged_df = merged_df[merged_df['category'].isin(category.split(','))]
-    
-    if color:
-        merged_df = merged_df[merged_df['color'].isin(color.split(','))]
-    
-    if gate:
-        gates = gate.split(',')
-        merged_df = merged_df[
-            merged_df['entry_gate'].isin(gates) |
-            merged_df['exit_gate'].isin(gates)
-        ]
-    
-    # Sort and paginate.
-    merged_df = merged_df.sort_values('entry_timestamp', ascending=False)
-    total = len(merged_df)
-    total_pages = (total + page_size - 1) // page_size
-    paginated = merged_df.iloc[(page-1)*page_size : page*page_size]
-    
-    # Convert to list of dictionaries with safe serialization.
-    data = paginated.apply(lambda row: {col: safe_serialize(val) for col, val in row.items()}, axis=1).tolist()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Serialized column by column and encoded straight to JSON bytes
+        return FastJSONResponse({
+            "data": records(paginated),
+            "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+            "current_page": page,
+            "total_records": total,
+            "next_cursor": next_cursor
+        })
     
-    return {
-        "data": data,
-        "total_pages": total_pages,
-        "current_page": page,
-        "total_records": total
-    }
+    # Revisits get a 304 or the cached bytes; identical concurrent requests share one computation
+    key = ('data', page, page_size, search, start_date, end_date,
+           license_prefix, category, color, gate, cursor, include_total)
+    return await response_cache.respond(request, view, key, compute)
 
 
 
 
-# Modify the existing /data endpoint
 @app.get("/dashboard/data")
-async def get_data(
+async def get_dashboard_data(
+    request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    search: Optional[str] = None,
+    search: Optional[str] = Query(None, description=SEARCH_HELP),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = True
 ):
-    reload_data()
-    
-    filtered_df = df.copy()
-    
-    # License plate prefix filter
-    
-    # Search filter
-    if search:
-        string_columns = df.select_dtypes(include=['object']).columns
-        filter_conditions = []
-        for column in string_columns:
-            filter_conditions.append(df[column].astype(str).str.contains(search, case=False, na=False))
-        filtered_df = df[pd.concat(filter_conditions, axis=1).any(axis=1)]
+    view = await current_view()
     
-    # Date range filter
-    # Sorting and pagination
-    filtered_df = filtered_df.sort_values(by='timestamp', ascending=False)
-    total_records = len(filtered_df)
-    total_pages = (total_records + page_size - 1) // page_size
-    start_idx = (page - 1) * page_size
-    end_idx = start_idx + page_size
-    
-    paginated_df = filtered_df.iloc[start_idx:end_idx]
-    
-    return {
-        "data": paginated_df.to_dict(orient="records"),
-        "total_records": total_records,
-        "total_pages": total_pages,
-        "current_page": page
-    }
-
-# @app.get("/stats/category-stats")
-# async def get_category_stats(
-#     start_date: Optional[str] = None,
-#     end_date: Optional[str] = None
-# ):
-#     try:
-#         reload_data()
-        
-#         filtered_df = df.copy()
-        
-#         # Handle date filtering only if dates are provided
-#         if start_date or end_date:
-#             if 'datetime_utc' not in filtered_df.columns:
-#                 filtered_df['datetime_utc'] = pd.to_datetime(filtered_df['timestamp'], utc=True)
-            
-#             if start_date:
-#                 start = pd.to_datetime(start_date, utc=True)
-#                 filtered_df = filtered_df[filtered_df['datetime_utc'] >= start]
-#             if end_date:
-#                 end = pd.to_datetime(end_date, utc=True)
-#                 filtered_df = filtered_df[filtered_df['datetime_utc'] <= end]
-        
-#         # Handle empty DataFrame
-#         if filtered_df.empty:
-#             return {"category_counts": {}}
-        
-#         # Count by category
-#         category_counts = filtered_df['category'].value_counts().to_dict()
+    def compute():
+        # Events newest first; the backend keeps them in time order, so no sort
+        try:
+            paginated_df, total_records, next_cursor = view.events_page(
+                page, page_size, cursor, include_total, search
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-#         return {"category_counts": category_counts}
+        return FastJSONResponse({
+            "data": records(paginated_df),
+            "total_records": total_records,
+            "total_pages": (total_records + page_size - 1) // page_size if total_records is not None else None,
+            "current_page": page,
+            "next_cursor": next_cursor
+        })
     
-#     except Exception as e:
-#         print(f"Error in category-stats: {str(e)}")
-#         return {"error": str(e)}, 500
+    # Revisits get a 304 or the cached bytes; identical concurrent requests share one computation
+    key = ('dashboard/data', page, page_size, search, cursor, include_total)
+    return await response_cache.respond(request, view, key, compute)
+
+
 @app.get("/stats/category-stats")
 async def get_category_stats(
+    request: Request,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None
 ):
-    # Detailed logging and error handling
-    print("Received parameters:")
-    print(f"start_date: {start_date}")
-    print(f"end_date: {end_date}")
+    view = await current_view()
     
-    reload_data()
-    
-    # Ensure datetime column exists
-    if 'datetime_utc' not in df.columns:
+    def compute():
+        # Date filtering on whole UTC days, summed from the hourly rollup
         try:
-            print("Converting timestamp to datetime")
-            df['datetime_utc'] = pd.to_datetime(df['timestamp'], utc=True)
-            print("Conversion successful")
-        except Exception as conversion_error:
-            print(f"Datetime conversion error: {conversion_error}")
-            print("Sample timestamps:")
-            print(df['timestamp'].head())
-            return {"error": f"Could not convert timestamps: {conversion_error}"}, 500
-    
-    filtered_df = df.copy()
-    
-    # Date filtering with extensive error handling
-    try:
-        if start_date:
-            print(f"Parsing start date: {start_date}")
-            start = pd.to_datetime(start_date)
-            print(f"Parsed start date: {start}")
-            filtered_df = filtered_df[filtered_df['datetime_utc'].dt.date >= start.date()]
-            print("Start date filtering applied")
+            start, end = day_bounds(start_date, end_date)
+            cells = view.range_cells(start, end, end_inclusive=False)
+        except Exception as date_error:
+            logger.warning("Date filtering error: %s", date_error)
+            raise HTTPException(status_code=400, detail=f"Date filtering failed: {date_error}")
         
-        if end_date:
-            print(f"Parsing end date: {end_date}")
-            end = pd.to_datetime(end_date)
-            print(f"Parsed end date: {end}")
-            filtered_df = filtered_df[filtered_df['datetime_utc'].dt.date <= end.date()]
-            print("End date filtering applied")
-    
-    except Exception as date_error:
-        print(f"Date filtering error: {date_error}")
-        print("Timestamps:")
-        print(filtered_df['timestamp'].head())
-        print("Datetime UTC:")
-        print(filtered_df['datetime_utc'].head())
-        return {"error": f"Date filtering failed: {date_error}"}, 400
-    
-    # Handle empty DataFrame
-    if filtered_df.empty:
-        print("Filtered DataFrame is empty")
-        return {"category_counts": {}}
-    
-    # Count by category
-    category_counts = filtered_df['category'].value_counts().to_dict()
+        # Handle empty range
+        if not cells['count'].sum():
+            return FastJSONResponse({"category_counts": {}})
+        
+        # Count by category
+        category_counts = dimension_counts(cells, 'category')
+        
+        return FastJSONResponse({"category_counts": category_counts})
     
-    print(f"Category counts: {category_counts}")
-    return {"category_counts": category_counts}
+    # Revisits get a 304 or the cached bytes; identical concurrent requests share one computation
+    key = ('category-stats', start_date, end_date)
+    return await response_cache.respond(request, view, key, compute)
 
 
 
 
 @app.get("/stats/enhanced-stats")
 async def get_enhanced_stats(
+    request: Request,
     start_date: Optional[str] = Query(None, description="Start date (ISO 8601 format)"),
     end_date: Optional[str] = Query(None, description="End date (ISO 8601 format)"),
-    time_range: Optional[str] = Query('all', enum=['today', 'week', 'month', 'custom'])
+    time_range: Optional[str] = Query('all', enum=['today', 'week', 'month', 'custom']),
+    points: Optional[int] = Query(None, ge=3, le=10_000,
+                                  description="Return the trend as at most this many points (see downsample.py)"),
+    downsample: str = Query('sum', pattern=f"^({'|'.join(DOWNSAMPLE_METHODS)})$")
 ):
-    reload_data()
-    
-    # Get current time (UTC) with timezone awareness
-    now = datetime.utcnow().replace(tzinfo=pytz.utc)
-    
-    # Set start_date and end_date based on the selected time_range
-    if time_range != 'custom':
-        if time_range == 'today':
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now
-        elif time_range == 'week':
-            start_date = now - timedelta(days=now.weekday())
-            start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = now
-        elif time_range == 'month':
-            start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            end_date = now
+    view = await current_view()
+    
+    def compute():
+        # Set start_date and end_date based on the selected time_range
+        if time_range == 'custom':
+            try:
+                start = to_utc(start_date) if start_date else None
+                end = to_utc(end_date) if end_date else None
+            except ValueError as date_error:
+                raise HTTPException(status_code=400, detail=f"Invalid date: {date_error}")
+        elif time_range in ('today', 'week', 'month'):
+            start, end = time_range_bounds(time_range)
         else:  # all time
-            start_date = df['datetime_utc'].min()
-            end_date = df['datetime_utc'].max()
-
-    # If start_date or end_date are provided as strings, convert them
-    if isinstance(start_date, str):
-        start_date = pd.to_datetime(start_date, utc=True)
-    if isinstance(end_date, str):
-        end_date = pd.to_datetime(end_date, utc=True)
-
-    # Filter the dataframe based on the datetime_utc column
-    mask = (df['datetime_utc'] >= start_date) & (df['datetime_utc'] <= end_date)
-    filtered_df = df.loc[mask]
-
-    # Compute statistics using available fields
-    stats = {
-        "total_events": len(filtered_df),
-        "busiest_hour": int(filtered_df['datetime_utc'].dt.hour.mode()[0]) if not filtered_df.empty else None,
-        "category_counts": filtered_df['category'].value_counts().to_dict(),
-        "gate_usage": filtered_df['gate'].value_counts().to_dict(),
-        # Format the hourly trend so that keys are strings (e.g., "2025-01-24 04:00:00+00:00")
-        "hourly_trend": {str(ts): count for ts, count in filtered_df.set_index('datetime_utc').resample('H').size().items()},
-        "color_distribution": filtered_df['color'].value_counts().to_dict(),
-        "zone_counts": filtered_df['zone'].value_counts().to_dict()
-    }
+            start, end = view.time_span()
+        
+        # Whole hours are summed from the rollup cube, partial edge hours from raw rows
+        if start is None and end is None:
+            cells = view.empty_cells()
+        else:
+            cells = view.range_cells(start, end)
+        
+        # One key per hour, or at most `points` points as parallel arrays
+        if points is None:
+            # Format the hourly trend so that keys are strings (e.g., "2025-01-24 04:00:00+00:00")
+            trend_key = "hourly_trend"
+            trend = {str(ts): int(count) for ts, count in hourly_counts(cells).items()}
+        else:
+            trend_key = "trend"
+            trend = downsampled_trend(cells, points, downsample, lambda: view.minute_counts(start, end),
+                                      start, end)
+        
+        # Compute statistics using available fields
+        stats = {
+            "total_events": int(cells['count'].sum()),
+            "busiest_hour": busiest_hour(cells),
+            "category_counts": dimension_counts(cells, 'category'),
+            "gate_usage": dimension_counts(cells, 'gate'),
+            trend_key: trend,
+            "color_distribution": dimension_counts(cells, 'color'),
+            "zone_counts": dimension_counts(cells, 'zone')
+        }
+        
+        return FastJSONResponse(stats)
     
-    return stats
+    # Revisits get a 304 or the cached bytes; identical concurrent requests share one computation.
+    # Ranges ending now are tagged with the minute as well
+    key = ('enhanced-stats', start_date, end_date, time_range, points, downsample)
+    return await response_cache.respond(request, view, key, compute,
+                                        clock=time_range in ('today', 'week', 'month'))
 
-@app.get("/stats/today")
-async def get_today_count():
-    reload_data()
-    today_utc = datetime.now(pytz.utc).date()
-    
-    if pd.api.types.is_datetime64_any_dtype(df['datetime_utc']):
-        today_df = df[df['datetime_utc'].dt.date == today_utc]
-    else:
-        # Fallback if datetime conversion failed
-        print("Warning: Using timestamp string comparison for today's count")
-        today_str = today_utc.strftime('%Y-%m-%d')
-        today_df = df[df['timestamp'].str.startswith(today_str)]
+@app.get("/stats/dwell-time")
+async def get_dwell_time(
+    request: Request,
+    start_date: Optional[str] = Query(None, description="Start date (ISO 8601 format)"),
+    end_date: Optional[str] = Query(None, description="End date (ISO 8601 format)"),
+    time_range: Optional[str] = Query('all', enum=['today', 'week', 'month', 'custom'])
+):
+    view = await current_view()
+    
+    def compute():
+        # Sessions entered in the range; the same ranges as /stats/enhanced-stats
+        start = end = None
+        if time_range == 'custom':
+            try:
+                start = to_utc(start_date) if start_date else None
+                end = to_utc(end_date) if end_date else None
+            except ValueError as date_error:
+                raise HTTPException(status_code=400, detail=f"Invalid date: {date_error}")
+        elif time_range in ('today', 'week', 'month'):
+            start, end = time_range_bounds(time_range)
+        
+        # Whole hours are merged from the hourly histograms, partial edge hours from raw sessions
+        cells = view.dwell_cells(start, end)
+        stats = dwell_summary(cells)
+        for dimension in DWELL_DIMENSIONS:
+            stats[f"by_{dimension}"] = grouped_summaries(cells, dimension)
+        return FastJSONResponse(stats)
     
-    return {"count": len(today_df)}
+    key = ('dwell-time', start_date, end_date, time_range)
+    return await response_cache.respond(request, view, key, compute,
+                                        clock=time_range in ('today', 'week', 'month'))
+
+@app.get("/stats/today")
+async def get_today_count(request: Request):
+    # Per-UTC-day totals, kept up to date as rows are ingested
+    view = await current_view()
+    return await response_cache.respond(request, view, ('today',),
+                                        lambda: FastJSONResponse({"count": view.today()}), clock=True)
 
 
 
 
 @app.get("/stats/recent-entries")
-async def get_recent_entries():
-    reload_data()
-    ten_minutes_ago = datetime.now(pytz.utc) - timedelta(minutes=10)
-    
-    if pd.api.types.is_datetime64_any_dtype(df['datetime_utc']):
-        recent_entries = df[
-            (df['datetime_utc'] >= ten_minutes_ago) &
-            (df['gate'].str.contains('_in'))
-        ]
-    else:
-        # Fallback if datetime conversion failed
-        print("Warning: Using timestamp string comparison for recent entries")
-        recent_entries = df[df['gate'].str.contains('_in')]
-    
-    return {"count": len(recent_entries)}
+async def get_recent_entries(request: Request):
+    # Minute resolution, so the minute in the ETag is exact
+    view = await current_view()
+    return await response_cache.respond(request, view, ('recent-entries',),
+                                        lambda: FastJSONResponse({"count": view.recent_entries()}), clock=True)
 
 @app.get("/stats/recent-exits")
-async def get_recent_exits():
-    reload_data()
-    ten_minutes_ago = datetime.now(pytz.utc) - timedelta(minutes=10)
-    
-    if pd.api.types.is_datetime64_any_dtype(df['datetime_utc']):
-        recent_exits = df[
-            (df['datetime_utc'] >= ten_minutes_ago) &
-            (df['gate'].str.contains('_out'))
-        ]
-    else:
-        # Fallback if datetime conversion failed
-        print("Warning: Using timestamp string comparison for recent exits")
-        recent_exits = df[df['gate'].str.contains('_out')]
+async def get_recent_exits(request: Request):
+    view = await current_view()
+    return await response_cache.respond(request, view, ('recent-exits',),
+                                        lambda: FastJSONResponse({"count": view.recent_exits()}), clock=True)
+
+@app.get("/stats/summary")
+async def get_summary(request: Request):
+    # Today's count and the last ten minutes' entries/exits in one response
+    view = await current_view()
+    return await response_cache.respond(request, view, ('summary',),
+                                        lambda: FastJSONResponse(view.summary()), clock=True)
+
+
+@app.get("/occupancy")
+async def get_occupancy(request: Request):
+    # Open entries per zone and entry gate, replayed from the gate events as they arrive;
+    # "now" is the latest event, so the snapshot's state names the answer
+    snapshot = await current_snapshot()
+    return await response_cache.respond(request, snapshot, ('occupancy',),
+                                        lambda: FastJSONResponse(occupancy(snapshot).as_dict()))
+
+
+@app.get("/vehicles/{plate}")
+async def get_vehicle(request: Request, plate: str):
+    view = await current_view()
+    
+    def compute():
+        if is_unreadable(plate):
+            raise HTTPException(status_code=400, detail=f"Unreadable plate '{plate}' does not identify a vehicle")
+        
+        # The plate's events and sessions, oldest first
+        history, visits = view.vehicle(plate)
+        if not len(history):
+            raise HTTPException(status_code=404, detail=f"No events for plate {plate}")
+        gates = history['gate'].astype(object)
+        
+        # Dwell times of the sessions with a matched exit (duration -1 otherwise)
+        durations = visits['duration'][visits['duration'] >= 0]
+        stamps = history['datetime_utc'].dropna()
+        return FastJSONResponse({
+            "license_plate": plate,
+            "event_count": len(history),
+            "first_seen": stamps.iloc[0].isoformat() if len(stamps) else None,
+            "last_seen": stamps.iloc[-1].isoformat() if len(stamps) else None,
+            "entries": records(history[gates.str.endswith('_in', na=False).to_numpy(dtype=bool)]),
+            "exits": records(history[gates.str.endswith('_out', na=False).to_numpy(dtype=bool)]),
+            "sessions": records(visits),
+            "dwell_time": {
+                "completed_sessions": len(durations),
+                "open_sessions": len(visits) - len(durations),
+                "total_seconds": float(durations.sum()),
+                "mean_seconds": float(durations.mean()) if len(durations) else None,
+                "max_seconds": float(durations.max()) if len(durations) else None,
+            },
+        })
     
-    return {"count": len(recent_exits)}
+    return await response_cache.respond(request, view, ('vehicles', plate), compute)
+
+
+@app.get("/live")
+async def live_updates(request: Request):
+    # Server-Sent Events: one shared ingest loop pushes encoded deltas to every client
+    return StreamingResponse(
+        event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of the latency histograms and dataset gauges."""
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/profile")
+async def get_profile(reset: bool = False):
+    """Collapsed stacks from the sampling profiler (PARKING_PROFILE_INTERVAL)."""
+    if metrics.profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler disabled; set PARKING_PROFILE_INTERVAL")
+    return PlainTextResponse(metrics.profiler.collapsed(reset))
 
 
 @app.get("/filters/categories")
-async def get_unique_categories():
-    reload_data()
-    return {"categories": df['category'].unique().tolist()}
+async def get_unique_categories(request: Request):
+    view = await current_view()
+    return await response_cache.respond(request, view, ('filters', 'category'),
+                                        lambda: FastJSONResponse({"categories": view.distinct('category')}))
 
 @app.get("/filters/colors")
-async def get_unique_colors():
-    reload_data()
-    return {"colors": df['color'].unique().tolist()}
+async def get_unique_colors(request: Request):
+    view = await current_view()
+    return await response_cache.respond(request, view, ('filters', 'color'),
+                                        lambda: FastJSONResponse({"colors": view.distinct('color')}))
 
 @app.get("/filters/gates")
-async def get_unique_gates():
-    reload_data()
-    return {"gates": df['gate'].unique().tolist()}
+async def get_unique_gates(request: Request):
+    view = await current_view()
+    return await response_cache.respond(request, view, ('filters', 'gate'),
+                                        lambda: FastJSONResponse({"gates": view.distinct('gate')}))
 
+@app.get("/filters/zones")
+async def get_unique_zones(request: Request):
+    view = await current_view()
+    return await response_cache.respond(request, view, ('filters', 'zone'),
+                                        lambda: FastJSONResponse({"zones": view.distinct('zone')}))
 
-@app.get("/export")
-async def export_data(
-    file_format: str = Query(..., regex="^(csv|xlsx)$"),
+
+def _export_filters(start_date, end_date, license_prefix, categories, colors, gates, zones, search):
+    return dict(start_date=start_date, end_date=end_date, license_prefix=license_prefix,
+                categories=categories, colors=colors, gates=gates, zones=zones, search=search)
+
+
+@app.get("/export/count")
+async def export_count(
+    request: Request,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     license_prefix: Optional[str] = None,
     categories: Optional[str] = None,
     colors: Optional[str] = None,
     gates: Optional[str] = None,
-    search: Optional[str] = None
+    zones: Optional[str] = None,
+    search: Optional[str] = Query(None, description=SEARCH_HELP)
 ):
-    reload_data()
-    filtered_df = df.copy()
-    
-    # Apply filters
-    if license_prefix:
-        prefix_list = license_prefix.split(',')
-        mask = filtered_df['license_plate'].str[:2].isin(prefix_list)
-        filtered_df = filtered_df[mask]
-    
-    if categories:
-        category_list = categories.split(',')
-        filtered_df = filtered_df[filtered_df['category'].isin(category_list)]
-    
-    if colors:
-        color_list = colors.split(',')
-        filtered_df = filtered_df[filtered_df['color'].isin(color_list)]
+    """Number of rows /export would write for these filters."""
+    view = await current_view()
     
-    if gates:
-        gate_list = gates.split(',')
-        filtered_df = filtered_df[filtered_df['gate'].isin(gate_list)]
+    filters = _export_filters(start_date, end_date, license_prefix, categories, colors, gates, zones, search)
     
-    if search:
-        string_columns = filtered_df.select_dtypes(include=['object']).columns
-        filter_conditions = []
-        for column in string_columns:
-            filter_conditions.append(filtered_df[column].astype(str).str.contains(search, case=False, na=False))
-        filtered_df = filtered_df[pd.concat(filter_conditions, axis=1).any(axis=1)]
-    
-    # Handle datetime conversion
-    if 'timestamp' in filtered_df.columns:
-        if pd.api.types.is_datetime64_any_dtype(filtered_df['timestamp']):
-            # The column is already datetime, so just remove the timezone
-            filtered_df['timestamp'] = filtered_df['timestamp'].dt.tz_localize(None)
-        else:
-            # Parse the column as datetime (allowing mixed formats) and remove timezone
-            filtered_df['timestamp'] = pd.to_datetime(
-                filtered_df['timestamp'],
-                utc=True,
-                errors='coerce'
-            ).dt.tz_localize(None)
+    # Counted by the backend without materializing any rows
+    def compute():
+        try:
+            total = view.export_count(**filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse({"total_records": total})
     
-    # Date range filtering
-    if start_date or end_date:
-        if start_date:
-            start = pd.to_datetime(start_date)
-            filtered_df = filtered_df[filtered_df['timestamp'] >= start]
-        if end_date:
-            end = pd.to_datetime(end_date)
-            filtered_df = filtered_df[filtered_df['timestamp'] <= end]
+    key = ('export/count',) + tuple(filters.values())
+    return await response_cache.respond(request, view, key, compute)
+
+
+@app.get("/export")
+async def export_data(
+    file_format: str = Query(..., regex="^(csv|xlsx)$"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    license_prefix: Optional[str] = None,
+    categories: Optional[str] = None,
+    colors: Optional[str] = None,
+    gates: Optional[str] = None,
+    zones: Optional[str] = None,
+    search: Optional[str] = Query(None, description=SEARCH_HELP),
+    gzip: bool = Query(False, description="gzip-compress the file (adds .gz to the filename)")
+):
+    view = await current_view()
     
-    # Create buffer for file
-    buffer = io.BytesIO()
+    # The backend selects the rows; they are only read chunk by chunk
+    try:
+        selection = await run_blocking(view.export_selection, **_export_filters(
+            start_date, end_date, license_prefix, categories, colors, gates, zones, search))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Export based on format
+    # Rendered chunk by chunk while the response is streamed
     if file_format == 'csv':
-        filtered_df.to_csv(buffer, index=False)
+        content = csv_chunks(selection)
         media_type = 'text/csv'
         filename = 'export.csv'
     else:  # xlsx
-        # Ensure all datetime columns are timezone-naive
-        for column in filtered_df.select_dtypes(include=['datetime64[ns, UTC]']).columns:
-            filtered_df[column] = filtered_df[column].dt.tz_localize(None)
-        
-        filtered_df.to_excel(buffer, index=False, engine='openpyxl')
+        content = xlsx_chunks(selection)
         media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         filename = 'export.xlsx'
     
-    buffer.seek(0)
+    if gzip:
+        content = gzipped(content)
+        media_type = 'application/gzip'
+        filename += '.gz'
     
     return StreamingResponse(
-        buffer,
+        content,
         media_type=media_type,
         headers={
             'Content-Disposition': f'attachment; filename={filename}',
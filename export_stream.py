@@ -0,0 +1,200 @@
+"""
+Streaming CSV/XLSX exports, rendered EXPORT_CHUNK rows at a time.
+
+The renderers take a selection: anything with `columns`,
+`timestamp_unit()` and `frames()` yielding its rows as events frames.
+"""
+import tempfile
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from bitmap_index import bitmap_index, selections
+from metrics import Stopwatch, timed
+from search_index import event_search_index
+from serialization import column_values
+from time_index import event_time_index, restrict
+
+# Rows rendered per chunk
+EXPORT_CHUNK = 5000
+# Bytes per read when streaming a finished XLSX file
+STREAM_BLOCK = 1 << 16
+
+XLSX_DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+
+_NS = {'D': 86_400 * 10**9, 's': 10**9, 'ms': 10**6, 'us': 10**3}
+
+
+def _filter_selections(license_prefix=None, categories=None, colors=None, gates=None, zones=None):
+    return selections(license_prefix=license_prefix, category=categories, color=colors,
+                      gate=gates, zone=zones)
+
+
+def select_rows(snapshot, start_date=None, end_date=None, license_prefix=None,
+                categories=None, colors=None, gates=None, search=None, zones=None):
+    """Sorted positions of the events rows matching the export filters."""
+    with timed('filter'):
+        # Date range: a contiguous block of the time-sorted frame
+        lo, hi = event_time_index(snapshot).bounds(start_date or None, end_date or None)
+
+        # Column filters from the value bitmaps; built first, as that registers the value ids
+        index = bitmap_index(snapshot)
+        chosen = _filter_selections(license_prefix, categories, colors, gates, zones)
+        rows = index.rows(lo, hi, chosen)
+
+        # The search index gives row positions in the full snapshot
+        if search:
+            found = restrict(event_search_index(snapshot).search(search), lo, hi)
+            rows = np.intersect1d(found, rows, assume_unique=True)
+        return rows
+
+
+def count_rows(snapshot, start_date=None, end_date=None, license_prefix=None,
+               categories=None, colors=None, gates=None, search=None, zones=None):
+    """len(select_rows(...)), counted on the bitmaps without listing the rows."""
+    if search:
+        return len(select_rows(snapshot, start_date, end_date, license_prefix,
+                               categories, colors, gates, search, zones))
+    with timed('filter'):
+        lo, hi = event_time_index(snapshot).bounds(start_date or None, end_date or None)
+        index = bitmap_index(snapshot)
+        chosen = _filter_selections(license_prefix, categories, colors, gates, zones)
+        return index.count(lo, hi, chosen)
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), EXPORT_CHUNK):
+        yield rows[start:start + EXPORT_CHUNK]
+
+
+def _naive_timestamps(part):
+    """The export's 'timestamp' column: datetime_utc as naive UTC."""
+    return part['datetime_utc'].dt.tz_localize(None)
+
+
+def timestamp_unit(inexact):
+    """
+    Coarsest unit that shows every value exactly.
+
+    to_csv picks one precision for a whole naive datetime column; chunks are
+    rendered separately, so the unit is fixed up front over the full
+    selection to keep the text identical to a single to_csv call.
+    inexact(ns) tells whether any selected timestamp is not a multiple of ns.
+    """
+    for unit, ns in _NS.items():
+        if not inexact(ns):
+            return unit
+    return 'ns'
+
+
+class RowSelection:
+    """Export rows given as sorted positions into an events frame."""
+
+    def __init__(self, events, rows):
+        self.events = events
+        self.rows = rows
+        self.columns = list(events.columns)
+        self._stamps = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def inexact(self, ns):
+        """True if any selected timestamp is not a multiple of ns."""
+        if self._stamps is None:
+            stamps = self.events['datetime_utc'].iloc[self.rows]
+            self._stamps = stamps.array.asi8[stamps.notna().to_numpy()]
+        return bool((self._stamps % ns).any())
+
+    def timestamp_unit(self):
+        return timestamp_unit(self.inexact)
+
+    def frames(self):
+        for chunk in _chunks(self.rows):
+            yield self.events.iloc[chunk]
+
+
+def _timestamp_text(stamps, unit):
+    values = stamps.to_numpy('datetime64[ns]')
+    text = np.char.replace(np.datetime_as_string(values, unit=unit), 'T', ' ').astype(object)
+    text[np.isnat(values)] = None
+    return text
+
+
+def csv_chunks(selection):
+    """Yield the export as CSV bytes, EXPORT_CHUNK rows at a time."""
+    yield pd.DataFrame(columns=selection.columns).to_csv(index=False).encode()
+    if not len(selection):
+        return
+    # Only the rendering counts as encoding time, not waiting on the client
+    clock = Stopwatch('export_encode')
+    try:
+        with clock:
+            unit = selection.timestamp_unit()
+        frames = selection.frames()
+        while True:
+            with clock:
+                part = next(frames, None)
+                if part is None:
+                    break
+                part = part.assign(timestamp=_timestamp_text(_naive_timestamps(part), unit))
+                data = part.to_csv(index=False, header=False).encode()
+            yield data
+    finally:
+        clock.observe()
+
+
+def _xlsx_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is not None:
+            series = series.dt.tz_localize(None)
+        return series.astype(object).where(series.notna(), None).tolist()
+    return column_values(series)
+
+
+def xlsx_chunks(selection):
+    """Build the export with a write-only workbook and yield the file's bytes."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(list(selection.columns))
+
+    def dated(value):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.number_format = XLSX_DATETIME_FORMAT
+        return cell
+
+    with timed('export_encode'):
+        for part in selection.frames():
+            part = part.assign(timestamp=_naive_timestamps(part))
+            columns = []
+            for name in part.columns:
+                values = _xlsx_values(part[name])
+                if pd.api.types.is_datetime64_any_dtype(part[name]):
+                    values = [dated(v) if v is not None else None for v in values]
+                columns.append(values)
+            for row in zip(*columns):
+                sheet.append(row)
+
+    with tempfile.TemporaryFile() as tmp:
+        with timed('export_encode'):
+            workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            block = tmp.read(STREAM_BLOCK)
+            if not block:
+                break
+            yield block
+
+
+def gzipped(chunks):
+    """gzip-compress a stream of byte chunks."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
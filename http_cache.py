@@ -0,0 +1,132 @@
+"""
+ETags, 304 Not Modified and an LRU of encoded responses for the read endpoints.
+
+The cache is bounded by PARKING_RESPONSE_CACHE entries and
+PARKING_RESPONSE_CACHE_BYTES bytes.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import astuple
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi.responses import Response
+
+from concurrency import single_flight
+
+CACHE_ENTRIES = int(os.environ.get("PARKING_RESPONSE_CACHE", "512"))
+CACHE_BYTES = int(os.environ.get("PARKING_RESPONSE_CACHE_BYTES", str(64 << 20)))
+
+# Bumped when the responses change shape, so clients do not keep old bodies
+FORMAT_VERSION = 1
+
+
+def etag(view, key, clock=False):
+    """Strong ETag of the response to key computed from view's data."""
+    parts = (FORMAT_VERSION, type(view).__name__, astuple(view.state), view.offset, key)
+    if clock:
+        parts += (int(time.time()) // 60,)
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+
+def _matches(header, tag):
+    """If-None-Match: '*' or a list of tags, compared weakly."""
+    if header.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == tag for candidate in header.split(','))
+
+
+def _mtime(view):
+    """
+    The CSV's mtime in whole seconds, or None while the data could change
+    without it: within that second, or while a held-back last line is unread.
+    """
+    seconds = view.state.mtime_ns // 10**9
+    return seconds if seconds < int(view.loaded_at) and view.offset == view.state.size else None
+
+
+def _unmodified_since(header, seconds):
+    try:
+        return seconds <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class ResponseCache:
+    """Bounded LRU of encoded response bodies by ETag, for one dataset state."""
+
+    def __init__(self, entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.entries = entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._bodies = OrderedDict()
+        self._data = None
+        self._loaded_at = 0.0
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def clear(self):
+        self._bodies.clear()
+        self.nbytes = 0
+
+    def _usable(self, view):
+        """True if view's bodies may be cached; empties the cache when view is newer."""
+        data = (view.state, view.offset)
+        if data == self._data:
+            return True
+        if view.loaded_at < self._loaded_at:
+            return False
+        self.clear()
+        self._data, self._loaded_at = data, view.loaded_at
+        return True
+
+    def _put(self, tag, body, media_type):
+        if len(body) > self.max_bytes // 4:
+            return
+        self._bodies[tag] = (body, media_type)
+        self.nbytes += len(body)
+        while len(self._bodies) > self.entries or self.nbytes > self.max_bytes:
+            _, (old, _) = self._bodies.popitem(last=False)
+            self.nbytes -= len(old)
+
+    async def respond(self, request, view, key, compute, clock=False):
+        """
+        The response compute() builds from view, answered from the cache when possible.
+
+        key holds the handler's parsed parameters (not view.version) and,
+        with the view's state, also serves as the single-flight key.
+        compute returns a Response; only 200 responses are cached, and
+        anything else compute returns is passed through untouched.
+        """
+        tag = etag(view, key, clock)
+        headers = {"ETag": tag, "Cache-Control": "no-cache"}
+        mtime = None if clock else _mtime(view)
+        if mtime is not None:
+            headers["Last-Modified"] = formatdate(mtime, usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_none_match is not None:
+            if _matches(if_none_match, tag):
+                return Response(status_code=304, headers=headers)
+        elif mtime is not None and if_modified_since is not None and _unmodified_since(if_modified_since, mtime):
+            return Response(status_code=304, headers=headers)
+
+        cached = self._bodies.get(tag) if self._usable(view) else None
+        if cached is not None:
+            self._bodies.move_to_end(tag)
+            body, media_type = cached
+        else:
+            response = await single_flight.run(('response', tag), compute)
+            if not isinstance(response, Response) or response.status_code != 200:
+                return response
+            body, media_type = response.body, response.media_type
+            # A newer state may have come in while this one was computed
+            if self._usable(view):
+                self._put(tag, body, media_type)
+        return Response(body, media_type=media_type, headers=headers)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,201 @@
+"""
+Server-Sent Events push channel for dashboards.
+
+Events sent on /live:
+
+  state   full current state, on connect and after a resync
+  delta   changes since the previous version
+  reset   the dataset was rebuilt from scratch; clients should refetch
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+
+from concurrency import current_snapshot
+from dataset import concat_frames
+from live_counters import live_counters
+from occupancy import occupancy
+from serialization import dumps, records
+
+logger = logging.getLogger(__name__)
+
+LIVE_INTERVAL = float(os.environ.get("PARKING_LIVE_INTERVAL", "2"))
+# Messages a subscriber may fall behind before it is resynced
+LIVE_QUEUE = 32
+MAX_DELTA_EVENTS = 500
+# Snapshot versions remembered by the ChangeLog
+CHANGE_LOG = 64
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT = 15
+
+
+def sse(event, data, event_id=None):
+    """Encode one SSE message; data is JSON bytes or a value to serialize."""
+    head = f"event: {event}\n" + (f"id: {event_id}\n" if event_id is not None else "")
+    body = data if isinstance(data, bytes) else dumps(data)
+    return head.encode() + b"data: " + body + b"\n\n"
+
+
+def current_state(snapshot):
+    return {
+        "version": snapshot.version,
+        "summary": live_counters(snapshot).summary(),
+        "occupancy": occupancy(snapshot).as_dict(),
+    }
+
+
+class ChangeLog:
+    """
+    Rows appended by the last CHANGE_LOG snapshot versions.
+
+    Maintained through dataset.maintain(), so rows reach the broadcaster
+    even when requests create several versions between two ingest cycles.
+    After an attach to a published version, the appended rows are the ones
+    beyond this worker's previous snapshot, so they still go out as a delta
+    rather than a reset.
+    """
+
+    def __init__(self, start, entries=()):
+        self.start = start  # version the entries follow (a full load, or the last one dropped)
+        self.entries = entries  # ((version, appended frame), ...)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.version)
+
+    def advance(self, snapshot):
+        rows = snapshot.appended
+        if rows is not None and rows.empty:
+            return self
+        entries = self.entries + ((snapshot.version, rows),)
+        start = entries[-CHANGE_LOG - 1][0] if len(entries) > CHANGE_LOG else self.start
+        return ChangeLog(start, entries[-CHANGE_LOG:])
+
+    def since(self, version):
+        """Frames appended after version, or None if they are no longer all known."""
+        if version < self.start:
+            return None
+        return [frame for v, frame in self.entries if v > version]
+
+
+class Subscriber:
+    """One connected client: a bounded queue of encoded messages."""
+
+    def __init__(self):
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.resync = False
+
+    def push(self, message):
+        if len(self.queue) >= LIVE_QUEUE:
+            # Too far behind: drop the backlog and send the full state next
+            self.queue.clear()
+            self.resync = True
+        else:
+            self.queue.append(message)
+        self.ready.set()
+
+    def take(self):
+        messages = list(self.queue)
+        self.queue.clear()
+        self.ready.clear()
+        return messages
+
+
+class Broadcaster:
+    """Runs the ingest loop and fans its messages out to subscribers."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self._task = None
+        self._version = None
+        self._summary = None
+        self._occupancy = None
+        self._state = (None, None)
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, message):
+        for subscriber in list(self.subscribers):
+            subscriber.push(message)
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                # Stat/reload off the event loop
+                snapshot = await current_snapshot()
+                message = self.delta(snapshot)
+                if message is not None:
+                    self.publish(message)
+            except Exception:
+                logger.exception("Error in live ingest loop")
+            await asyncio.sleep(LIVE_INTERVAL)
+
+    def state(self, snapshot):
+        """JSON bytes of the full current state, encoded once per version and summary."""
+        summary = live_counters(snapshot).summary()
+        key = (snapshot.version, tuple(summary.values()))
+        if self._state[0] != key:
+            self._state = (key, dumps(current_state(snapshot)))
+        return self._state[1]
+
+    def delta(self, snapshot):
+        """Encoded message for the changes since the last cycle, or None."""
+        summary = live_counters(snapshot).summary()
+        occupied = occupancy(snapshot).as_dict()
+        previous, self._version = self._version, snapshot.version
+
+        payload = {"version": snapshot.version}
+        if previous is not None and previous != snapshot.version:
+            frames = snapshot.derived('changes', ChangeLog.from_snapshot).since(previous)
+            if frames is None:
+                self._summary, self._occupancy = summary, occupied
+                return sse("reset", self.state(snapshot), snapshot.version)
+            appended = sum(len(frame) for frame in frames)
+            if appended:
+                newest = concat_frames(frames).iloc[-MAX_DELTA_EVENTS:]
+                payload["new_events"] = records(newest)
+                payload["new_event_count"] = appended
+        if summary != self._summary:
+            payload["summary"] = self._summary = summary
+        if occupied != self._occupancy:
+            payload["occupancy"] = self._occupancy = occupied
+        if len(payload) == 1 or previous is None:
+            # Nothing new (the first cycle only records the baseline)
+            return None
+        return sse("delta", payload, snapshot.version)
+
+
+broadcaster = Broadcaster()
+
+
+async def event_stream(request):
+    """SSE body for one client: the current state, then deltas as they are published."""
+    subscriber = broadcaster.subscribe()
+    try:
+        snapshot = await current_snapshot()
+        yield sse("state", broadcaster.state(snapshot), snapshot.version)
+        while not await request.is_disconnected():
+            try:
+                await asyncio.wait_for(subscriber.ready.wait(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            messages = subscriber.take()
+            if subscriber.resync:
+                subscriber.resync = False
+                snapshot = await current_snapshot()
+                messages = [sse("resync", broadcaster.state(snapshot), snapshot.version)]
+            for message in messages:
+                yield message
+    finally:
+        broadcaster.unsubscribe(subscriber)
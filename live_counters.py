@@ -0,0 +1,112 @@
+"""
+Per-minute ring buffers and per-day totals for the Dashboard's live counts.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+MINUTE = 60_000_000_000  # ns
+DAY = 86_400_000_000_000  # ns
+
+# Minutes kept in the ring buffers; must cover RECENT_WINDOW
+RING_MINUTES = 60
+RECENT_WINDOW = timedelta(minutes=10)
+
+# Same gate tests as the old handlers: gate contains '_in' / '_out'
+ENTRY_MARK = '_in'
+EXIT_MARK = '_out'
+
+
+class MinuteRing:
+    """Event counts for the most recent RING_MINUTES distinct minutes seen."""
+
+    def __init__(self, minutes=None, counts=None):
+        self.minutes = minutes if minutes is not None else np.full(RING_MINUTES, -1, dtype=np.int64)
+        self.counts = counts if counts is not None else np.zeros(RING_MINUTES, dtype=np.int64)
+
+    def add(self, stamps_ns):
+        """Return a new ring that also counts the given timestamps (ns, no NaT)."""
+        ring = MinuteRing(self.minutes.copy(), self.counts.copy())
+        if not len(stamps_ns):
+            return ring
+        minutes, counts = np.unique(stamps_ns // MINUTE, return_counts=True)
+        # Only the newest RING_MINUTES minutes can survive in the ring
+        for minute, count in zip(minutes[-RING_MINUTES:].tolist(), counts[-RING_MINUTES:].tolist()):
+            slot = minute % RING_MINUTES
+            if ring.minutes[slot] < minute:
+                ring.minutes[slot] = minute
+                ring.counts[slot] = count
+            elif ring.minutes[slot] == minute:
+                ring.counts[slot] += count
+        return ring
+
+    def since(self, minute):
+        """Events in minutes >= minute (later minutes included)."""
+        return int(self.counts[self.minutes >= minute].sum())
+
+
+class LiveCounters:
+    """Entry/exit minute rings and per-day totals for one dataset snapshot."""
+
+    def __init__(self, entries, exits, days):
+        self.entries = entries
+        self.exits = exits
+        self.days = days
+
+    @classmethod
+    def build(cls, events):
+        return cls(MinuteRing(), MinuteRing(), {}).extend(events)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls.build(snapshot.events)
+
+    def advance(self, snapshot):
+        """DatasetManager.maintain() hook: count the snapshot's appended rows."""
+        return self.extend(snapshot.appended)
+
+    def extend(self, events):
+        """Return new counters that also include events."""
+        if events.empty:
+            return self
+        stamps = events['datetime_utc']
+        valid = stamps.notna().to_numpy()
+        values = stamps.array.asi8[valid]
+        gates = events['gate'][valid]
+
+        days = dict(self.days)
+        day_numbers, counts = np.unique(values // DAY, return_counts=True)
+        for day, count in zip(day_numbers.tolist(), counts.tolist()):
+            days[day] = days.get(day, 0) + count
+
+        is_entry = gates.str.contains(ENTRY_MARK, regex=False).fillna(False).to_numpy(dtype=bool)
+        is_exit = gates.str.contains(EXIT_MARK, regex=False).fillna(False).to_numpy(dtype=bool)
+        return LiveCounters(self.entries.add(values[is_entry]), self.exits.add(values[is_exit]), days)
+
+    def today(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        return self.days.get(int(now.timestamp()) // 86_400, 0)
+
+    def recent_entries(self, now=None):
+        return self.entries.since(self._window_start(now))
+
+    def recent_exits(self, now=None):
+        return self.exits.since(self._window_start(now))
+
+    def summary(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        return {
+            "today_count": self.today(now),
+            "recent_entries": self.recent_entries(now),
+            "recent_exits": self.recent_exits(now),
+        }
+
+    @staticmethod
+    def _window_start(now=None):
+        now = now or datetime.now(pytz.utc)
+        return int((now - RECENT_WINDOW).timestamp()) // 60
+
+
+def live_counters(snapshot):
+    return snapshot.derived('counters', LiveCounters.from_snapshot)
@@ -0,0 +1,214 @@
+"""
+Per-stage latency histograms and the Prometheus /metrics exposition.
+
+Setting PARKING_PROFILE_INTERVAL (seconds) starts a sampling profiler whose
+collapsed stacks are served at /metrics/profile.
+"""
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Route template of the request being served
+endpoint = contextvars.ContextVar('endpoint', default='')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in the Prometheus text format."""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._series = {}  # label values -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-1] += value
+
+    def collect(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labelvalues, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = _labels(self.labelnames + ('le',), labelvalues + (_number(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_number(values[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time (None: not reported)."""
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def collect(self):
+        try:
+            value = self.read()
+        except Exception:
+            logger.exception("Error reading gauge %s", self.name)
+            value = None
+        if value is None:
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_number(value)}"
+
+
+request_seconds = Histogram('parking_request_seconds', "Request latency by endpoint.",
+                            ('endpoint', 'method', 'status'))
+stage_seconds = Histogram('parking_stage_seconds', "Latency of processing stages by endpoint.",
+                          ('endpoint', 'stage'))
+
+_collectors = [request_seconds, stage_seconds]
+
+
+def gauge(name, help, read):
+    """Register a gauge read from read() whenever /metrics is scraped."""
+    _collectors.append(Gauge(name, help, read))
+
+
+def observe_stage(stage, seconds):
+    stage_seconds.observe(seconds, endpoint.get(), stage)
+
+
+@contextmanager
+def timed(stage):
+    """Observe the duration of the with-block as one run of stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+class Stopwatch:
+    """Accumulates the time of several with-blocks into one observation of stage."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed += time.perf_counter() - self._started
+
+    def observe(self):
+        observe_stage(self.stage, self.elapsed)
+
+
+def exposition():
+    """Every registered metric in the Prometheus text format."""
+    lines = [line for collector in _collectors for line in collector.collect()]
+    return '\n'.join(lines) + '\n'
+
+
+def route_template(app, scope):
+    """Path template of the route scope matches (e.g. /vehicles/{plate}), or '' if none."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', '')
+    return ''
+
+
+def resident_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads every interval seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="parking-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                sampled.append(';'.join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(sampled)
+                self.samples += 1
+
+    def collapsed(self, reset=False):
+        """Sampled stacks as 'frame;frame;... count' lines, most frequent first."""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+        return '\n'.join(lines) + '\n'
+
+
+PROFILE_INTERVAL = float(os.environ.get("PARKING_PROFILE_INTERVAL", "0"))
+
+profiler = SamplingProfiler(PROFILE_INTERVAL).start() if PROFILE_INTERVAL > 0 else None
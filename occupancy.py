@@ -0,0 +1,156 @@
+"""
+Live occupancy per zone and gate, replayed from `_in`/`_out` events.
+
+Zone capacities come from PARKING_ZONE_CAPACITIES, e.g. "50:120,60:80".
+"""
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from sessions import MATCH_TOLERANCE
+
+ENTRY_SUFFIX = '_in'
+EXIT_SUFFIX = '_out'
+
+
+def parse_capacities(spec):
+    """Parse "zone:capacity,..." into a dict; numeric zone names become ints."""
+    capacities = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        zone, _, capacity = item.partition(':')
+        zone = zone.strip()
+        capacities[int(zone) if zone.lstrip('-').isdigit() else zone] = int(capacity)
+    return capacities
+
+
+ZONE_CAPACITIES = parse_capacities(os.environ.get("PARKING_ZONE_CAPACITIES", ""))
+
+
+class OccupancyEngine:
+    """Mutable open-entry state, advanced one gate event at a time."""
+
+    def __init__(self):
+        self.clock = None  # ns timestamp of the latest event processed
+        self.open = {}  # license_plate -> deque of (ts, zone, gate)
+        self.expiry = deque()  # (ts, license_plate) of entries in arrival order
+        self.zones = {}
+        self.gates = {}
+        self.descriptions = {}
+        self.total = 0
+        self._tolerance = MATCH_TOLERANCE.value
+
+    @classmethod
+    def from_events(cls, events):
+        """Engine state after the events within MATCH_TOLERANCE of the newest one."""
+        engine = cls()
+        stamps = events['datetime_utc']
+        valid = int(stamps.notna().sum())
+        if valid:
+            # Events are sorted by time; earlier entries would have expired
+            start = stamps.iloc[:valid].searchsorted(stamps.iloc[valid - 1] - MATCH_TOLERANCE)
+            engine.process(events.iloc[start:valid])
+        return engine
+
+    def process(self, events):
+        """Apply events, which must not be older than the clock."""
+        stamps = events['datetime_utc']
+        gates = events['gate'].astype(object)
+        is_entry = gates.str.endswith(ENTRY_SUFFIX, na=False).to_numpy(dtype=bool)
+        is_exit = gates.str.endswith(EXIT_SUFFIX, na=False).to_numpy(dtype=bool)
+        keep = (is_entry | is_exit) & stamps.notna().to_numpy() & events['license_plate'].notna().to_numpy()
+        if not keep.any():
+            return
+
+        ts = stamps.array.asi8[keep]
+        exits = is_exit[keep]
+        # Time order; at equal times entries first, as merge_asof matches exact times
+        order = np.lexsort((exits, ts))
+        columns = zip(ts[order].tolist(), exits[order].tolist(),
+                      events['license_plate'].to_numpy()[keep][order].tolist(),
+                      events['zone'].to_numpy()[keep][order].tolist(),
+                      gates.to_numpy()[keep][order].tolist(),
+                      events['description'].astype(object).to_numpy()[keep][order].tolist())
+        for event in columns:
+            self._apply(*event)
+
+    def _apply(self, ts, is_exit, plate, zone, gate, description):
+        self.clock = ts if self.clock is None else max(self.clock, ts)
+        self._expire(ts - self._tolerance)
+        if is_exit:
+            for _, entry_zone, entry_gate in self.open.pop(plate, ()):
+                self._count(entry_zone, entry_gate, -1)
+            return
+        self.open.setdefault(plate, deque()).append((ts, zone, gate))
+        self.expiry.append((ts, plate))
+        self.descriptions[zone] = description
+        self._count(zone, gate, 1)
+
+    def _expire(self, cutoff):
+        expiry, open_entries = self.expiry, self.open
+        while expiry and expiry[0][0] < cutoff:
+            ts, plate = expiry.popleft()
+            entries = open_entries.get(plate)
+            # Entries closed by an exit are no longer in their plate's deque
+            if entries and entries[0][0] == ts:
+                _, zone, gate = entries.popleft()
+                self._count(zone, gate, -1)
+                if not entries:
+                    del open_entries[plate]
+
+    def _count(self, zone, gate, delta):
+        self.total += delta
+        self.zones[zone] = self.zones.get(zone, 0) + delta
+        self.gates[gate] = self.gates.get(gate, 0) + delta
+
+
+class Occupancy:
+    """Occupancy figures for one dataset snapshot, backed by a shared engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.clock = engine.clock
+        self.total = engine.total
+        self.zones = {zone: n for zone, n in engine.zones.items() if n}
+        self.gates = {gate: n for gate, n in engine.gates.items() if n}
+        self.descriptions = dict(engine.descriptions)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(OccupancyEngine.from_events(snapshot.events))
+
+    def advance(self, snapshot):
+        """DatasetManager.maintain() hook: feed the snapshot's appended rows to the engine."""
+        appended = snapshot.appended
+        stamps = appended['datetime_utc'].dropna()
+        if stamps.empty:
+            return self
+        if self.engine.clock is not None and stamps.min().value < self.engine.clock:
+            return Occupancy.from_snapshot(snapshot)
+        self.engine.process(appended)
+        return Occupancy(self.engine)
+
+    def as_dict(self, capacities=None):
+        capacities = ZONE_CAPACITIES if capacities is None else capacities
+        zones = []
+        for zone in sorted(set(self.zones) | set(capacities), key=str):
+            occupied = self.zones.get(zone, 0)
+            capacity = capacities.get(zone)
+            zones.append({
+                "zone": zone,
+                "description": self.descriptions.get(zone),
+                "occupied": occupied,
+                "capacity": capacity,
+                "fill": round(occupied / capacity, 4) if capacity else None,
+            })
+        return {
+            "as_of": pd.Timestamp(self.clock, tz='UTC').isoformat() if self.clock is not None else None,
+            "occupied": self.total,
+            "zones": zones,
+            "gates": self.gates,
+        }
+
+
+def occupancy(snapshot):
+    return snapshot.derived('occupancy', Occupancy.from_snapshot)
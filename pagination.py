@@ -0,0 +1,205 @@
+"""
+Newest-first page-number and keyset-cursor paging over presorted frames.
+
+Totals are cached per dataset version in a Counts LRU of
+PARKING_COUNT_CACHE filter combinations.
+"""
+import base64
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Rows examined per step when scanning for filtered cursor pages
+SCAN_CHUNK = 512
+
+COUNT_CACHE = int(os.environ.get("PARKING_COUNT_CACHE", "256"))
+
+
+def encode_cursor(ts_ns, insertion_id):
+    key = f"{'nat' if ts_ns is None else ts_ns}:{insertion_id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (ts_ns or None, insertion_id); raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        ts, insertion_id = raw.split(':')
+        return (None if ts == 'nat' else int(ts)), int(insertion_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class NewestFirst:
+    """
+    Rank <-> position mapping for newest-first traversal.
+
+    Positions [0, valid) hold rows with a timestamp in ascending order and
+    [valid, size) those without one, ordered by insertion_id. Rank 0 is the
+    newest timestamped row; untimestamped rows come after all of them.
+    """
+
+    def __init__(self, timestamps, insertion_ids):
+        self.size = len(timestamps)
+        self.valid = int(timestamps.notna().sum())
+        stamps = timestamps.array.asi8 if self.size else np.empty(0, dtype=np.int64)
+        self.stamps = stamps[:self.valid]
+        self.ids = np.asarray(insertion_ids, dtype=np.int64)
+
+    def positions(self, ranks):
+        ranks = np.asarray(ranks, dtype=np.int64)
+        return np.where(ranks < self.valid, self.valid - 1 - ranks, self.size - 1 - (ranks - self.valid))
+
+    def ranks(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        return np.where(positions < self.valid, self.valid - 1 - positions,
+                        self.valid + self.size - 1 - positions)
+
+    def order(self, positions):
+        """Ascending positions rearranged newest-first."""
+        split = np.searchsorted(positions, self.valid)
+        return np.concatenate([positions[:split][::-1], positions[split:][::-1]])
+
+    def cursor_at(self, position):
+        ts = int(self.stamps[position]) if position < self.valid else None
+        return encode_cursor(ts, int(self.ids[position]))
+
+    def rank_after(self, cursor):
+        """Rank of the first row that comes after the cursor."""
+        ts, insertion_id = decode_cursor(cursor)
+        if ts is None:
+            ids = self.ids[self.valid:]
+            return self.size - int(np.searchsorted(ids, insertion_id, side='left'))
+        lo = int(np.searchsorted(self.stamps, ts, side='left'))
+        hi = int(np.searchsorted(self.stamps, ts, side='right'))
+        cut = lo + int(np.searchsorted(self.ids[lo:hi], insertion_id, side='left'))
+        return self.valid - cut
+
+    def rank_range(self, lo=None, hi=None):
+        """Ranks covering rows in position range [lo, hi) of the timestamped block."""
+        if lo is None and hi is None:
+            return 0, self.size
+        return self.valid - hi, self.valid - lo
+
+    def page(self, frame, page_size, start_rank=0, bounds=None, candidates=None, predicate=None):
+        """
+        Up to page_size row positions, newest first, starting at start_rank.
+
+        bounds is a (lo, hi) position range, candidates a sorted array of
+        allowed positions, and predicate a function from a frame slice to a
+        boolean mask.
+        """
+        first, stop = self.rank_range(*(bounds or (None, None)))
+        first = max(first, start_rank)
+        found = []
+        count = 0
+
+        if candidates is not None:
+            ranks = np.sort(self.ranks(candidates))
+            ranks = ranks[(ranks >= first) & (ranks < stop)]
+            chunks = (ranks[i:i + SCAN_CHUNK] for i in range(0, len(ranks), SCAN_CHUNK))
+        else:
+            chunks = (np.arange(r, min(r + SCAN_CHUNK, stop)) for r in range(first, stop, SCAN_CHUNK))
+
+        for chunk in chunks:
+            if predicate is None and candidates is None:
+                # Unfiltered: the page is just the next page_size ranks
+                chunk = np.arange(chunk[0], min(chunk[0] + page_size - count, stop))
+            positions = self.positions(chunk)
+            if predicate is not None:
+                positions = positions[np.asarray(predicate(frame.iloc[positions]), dtype=bool)]
+            found.append(positions[:page_size - count])
+            count += len(found[-1])
+            if count >= page_size:
+                break
+
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+class Counts:
+    """Bounded LRU of the totals of filtered selections, for one dataset version."""
+
+    def __init__(self, entries=COUNT_CACHE):
+        self.entries = entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def get(self, key, count):
+        """The total under key, calling count() when it is not cached."""
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+        total = count()
+        self.put(key, total)
+        return total
+
+    def put(self, key, total):
+        with self._lock:
+            self._counts[key] = total
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.entries:
+                self._counts.popitem(last=False)
+
+
+def counts(snapshot):
+    return snapshot.derived('counts', lambda s: Counts())
+
+
+def newest_first(snapshot, key, timestamps, insertion_ids):
+    return snapshot.derived(f'order:{key}', lambda s: NewestFirst(timestamps, insertion_ids))
+
+
+def paginate(snapshot, order, frame, page, page_size, cursor=None, include_total=True,
+             bounds=None, candidates=None, predicate=None, count_key=None):
+    """
+    Select one newest-first page of frame.
+
+    Returns (positions, total, next_cursor); total is None when it was
+    skipped. Totals are kept in the snapshot's Counts under count_key, so
+    repeated cursor pages with the same filters only count once.
+    """
+    def select_all():
+        if candidates is not None:
+            rows = candidates
+            if bounds is not None:
+                rows = rows[(rows >= bounds[0]) & (rows < bounds[1])]
+        elif bounds is not None:
+            rows = np.arange(*bounds)
+        else:
+            rows = np.arange(len(frame))
+        if predicate is not None and len(rows):
+            rows = rows[np.asarray(predicate(frame.iloc[rows]), dtype=bool)]
+        return rows
+
+    def count():
+        if candidates is None and predicate is None:
+            lo, hi = bounds if bounds is not None else (0, len(frame))
+            return hi - lo
+        return len(select_all())
+
+    if cursor is None and (candidates is not None or predicate is not None):
+        # Page numbers over a filtered selection: every match has to be found
+        # anyway to report the total
+        rows = select_all()
+        total = len(rows)
+        positions = order.order(rows)[(page - 1) * page_size:page * page_size]
+        if count_key is not None:
+            counts(snapshot).put(count_key, total)
+    else:
+        if cursor is not None:
+            start_rank = order.rank_after(cursor)
+        else:
+            start_rank = order.rank_range(*(bounds or (None, None)))[0] + (page - 1) * page_size
+        positions = order.page(frame, page_size, start_rank, bounds, candidates, predicate)
+        total = None
+        if include_total:
+            total = counts(snapshot).get(count_key, count) if count_key is not None else count()
+
+    next_cursor = order.cursor_at(positions[-1]) if len(positions) == page_size else None
+    return positions, total, next_cursor
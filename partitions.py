@@ -0,0 +1,627 @@
+"""
+Time-partitioned storage backend (PARKING_BACKEND=partitioned).
+
+    parking_export.csv.partitions/
+        manifest.json     partitions, ingest cursor and version
+        lock              flock()ed by the process that is ingesting
+        d20250124-<n>/    one UTC day's events and hourly cells
+        m202412-<n>/      the days of an old month, merged by compaction
+        undated-<n>/      rows whose timestamp could not be parsed
+
+Build or compact by hand with:
+
+    python partitions.py parking_export.csv [--compact-days N]
+"""
+import argparse
+import base64
+import dataclasses
+import fcntl
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from backends import PandasView
+from dataset import (EVENT_ORDER, MARKER_SIZE, FileState, IngestCursor, Snapshot, caught_up, concat_frames,
+                     csv_blocks, grew_past, insert_sorted, parse_events, settled, sort_events)
+from export_stream import timestamp_unit
+from live_counters import MINUTE, LiveCounters, live_counters
+from metrics import timed
+from pagination import decode_cursor
+from rollup import DIMENSIONS, Rollup, aggregate
+from sessions import MATCH_TOLERANCE
+from snapshot_store import read_frame, write_frame
+from time_index import to_utc
+
+logger = logging.getLogger(__name__)
+
+PARTITIONS_PATH = os.environ.get("PARKING_PARTITIONS")
+SUFFIX = '.partitions'
+MANIFEST = 'manifest.json'
+
+# Bumped when the layout changes; older directories are ingested again
+FORMAT_VERSION = 1
+
+# Bytes of CSV parsed at a time
+INGEST_BLOCK = 32 << 20
+
+# Day partitions of a month are merged once the month ended this many
+# days before the newest event
+COMPACT_AFTER_DAYS = int(os.environ.get("PARKING_COMPACT_DAYS", "31"))
+
+# Opened partition sets kept in memory, with their indexes
+PARTITION_CACHE = int(os.environ.get("PARKING_PARTITION_CACHE", "8"))
+
+DAY = 86_400 * 10**9  # ns
+TOLERANCE = MATCH_TOLERANCE.value
+
+
+def _month(start):
+    """(name, start, stop) of the calendar month holding timestamp start (ns)."""
+    first = pd.Timestamp(start, tz='UTC').normalize().replace(day=1)
+    return first.strftime('m%Y%m'), first.value, (first + pd.offsets.MonthBegin(1)).value
+
+
+def _day(start):
+    day = start // DAY * DAY
+    return pd.Timestamp(day, tz='UTC').strftime('d%Y%m%d'), day, day + DAY
+
+
+def _trim_categories(frame):
+    """Drop dictionary entries no row uses, so each partition's dictionaries are its values."""
+    trimmed = {column: frame[column].cat.remove_unused_categories()
+               for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)}
+    return frame.assign(**trimmed)
+
+
+def _empty_events(columns):
+    return parse_events(io.StringIO(','.join(columns) + '\n'))
+
+
+class PartitionSelection:
+    """Export rows of several partitions, streamed one partition after the other."""
+
+    def __init__(self, columns, parts):
+        self.columns = columns
+        self.parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def timestamp_unit(self):
+        return timestamp_unit(lambda ns: any(part.inexact(ns) for part in self.parts))
+
+    def frames(self):
+        for part in self.parts:
+            yield from part.frames()
+
+
+class PartitionedView:
+    """Queries over the partitions named by one manifest; see backends.py for the methods."""
+
+    def __init__(self, backend, manifest, identity):
+        self.backend = backend
+        self.identity = identity
+        self.version = manifest['version']
+        self.state = FileState(**manifest['state'])
+        self.offset = manifest['offset']
+        self.columns = manifest['columns']
+        self.rows = manifest['rows']
+        self.cursor = IngestCursor(self.offset, base64.b64decode(manifest['marker']),
+                                   manifest['ends_with_newline'], tuple(self.columns))
+        self.load_seconds = manifest['load_seconds']
+        self.loaded_at = manifest['loaded_at']
+        # Dated partitions by time, then the undated one
+        self.partitions = manifest['partitions']
+        self.dated = [p for p in self.partitions if p['start'] is not None]
+        self.undated = [p for p in self.partitions if p['start'] is None]
+
+    def __len__(self):
+        return self.rows
+
+    def _open(self, partitions):
+        return PandasView(self.backend.snapshot(partitions, self.columns, self.version))
+
+    def _overlapping(self, lo=None, hi=None):
+        """Dated partitions with events in [lo, hi] (ns, None for open ends)."""
+        return [p for p in self.dated
+                if (lo is None or p['max_ts'] >= lo) and (hi is None or p['min_ts'] <= hi)]
+
+    def _newest(self, cursor, needed, count, lookahead=0):
+        """
+        The newest partitions holding the `needed` newest-first rows (after
+        cursor, if given), counted by the partitions' `count` field; all
+        partitions when they do not suffice.
+
+        lookahead keeps that much time after the cursor, for exits paired
+        with the entries on the page.
+        """
+        ts = None
+        if cursor is not None:
+            ts, _ = decode_cursor(cursor)
+            if ts is None:
+                # Past every dated row: only the undated ones remain
+                return self.undated
+        chosen, found = [], 0
+        for p in reversed(self.dated):
+            if ts is not None and p['min_ts'] > ts + lookahead:
+                continue
+            chosen.append(p)
+            # The partition holding the cursor may have nothing after it
+            if ts is None or p['max_ts'] < ts:
+                found += p[count]
+            if found >= needed:
+                return chosen[::-1]
+        return self.partitions
+
+    def sessions_page(self, page, page_size, cursor=None, include_total=True, search=None,
+                      start_date=None, end_date=None, license_prefix=None,
+                      category=None, color=None, gate=None):
+        filters = dict(search=search, start_date=start_date, end_date=end_date,
+                       license_prefix=license_prefix, category=category, color=color, gate=gate)
+        if start_date or end_date:
+            # Entries in the range, and the exits they pair with
+            try:
+                lo = to_utc(start_date).value if start_date else None
+                hi = to_utc(end_date).value + TOLERANCE if end_date else None
+            except Exception as e:
+                raise ValueError(f"Invalid date format: {e}") from e
+            return self._open(self._overlapping(lo, hi)).sessions_page(
+                page, page_size, cursor, include_total, **filters)
+        if search or license_prefix or category or color or gate:
+            return self._open(self.partitions).sessions_page(page, page_size, cursor, include_total, **filters)
+
+        needed = page_size if cursor is not None else page * page_size
+        partitions = self._newest(cursor, needed, 'entries', TOLERANCE)
+        frame, _, next_cursor = self._open(partitions).sessions_page(page, page_size, cursor, False)
+        total = sum(p['entries'] for p in self.partitions) if include_total else None
+        return frame, total, next_cursor
+
+    def events_page(self, page, page_size, cursor=None, include_total=True, search=None):
+        if search:
+            return self._open(self.partitions).events_page(page, page_size, cursor, include_total, search)
+
+        needed = page_size if cursor is not None else page * page_size
+        partitions = self._newest(cursor, needed, 'rows')
+        frame, _, next_cursor = self._open(partitions).events_page(page, page_size, cursor, False)
+        return frame, self.rows if include_total else None, next_cursor
+
+    def range_cells(self, start=None, end=None, end_inclusive=True):
+        if start is None and end is None:
+            return self.backend.cells(self.partitions, self.columns)
+        lo = to_utc(start).value if start is not None else None
+        hi = to_utc(end).value if end is not None else None
+
+        # Stored cells of the partitions wholly inside the range, raw rows at the edges
+        inside, edges = [], []
+        for p in self._overlapping(lo, hi):
+            if ((lo is None or p['min_ts'] >= lo) and
+                    (hi is None or p['max_ts'] < hi or (end_inclusive and p['max_ts'] == hi))):
+                inside.append(p)
+            else:
+                edges.append(self._open([p]).range_cells(start, end, end_inclusive))
+        return concat_frames([self.backend.cells(inside, self.columns)] + edges, ignore_index=True)
+
+    def empty_cells(self):
+        return self.backend.cells([], self.columns)
+
+    def time_span(self):
+        if not self.dated:
+            return None, None
+        return (pd.Timestamp(min(p['min_ts'] for p in self.dated), tz='UTC'),
+                pd.Timestamp(max(p['max_ts'] for p in self.dated), tz='UTC'))
+
+    def recent(self, window):
+        """(events, state, cursor) of the events within window of the newest one, for DatasetManager.replay_recent()."""
+        if not self.dated:
+            return _empty_events(self.columns), self.state, self.cursor
+        lo = max(p['max_ts'] for p in self.dated) - window.value
+        events = sort_events(concat_frames([self.backend.events(p) for p in self._overlapping(lo)],
+                                           ignore_index=True))
+        events = events[events['datetime_utc'] >= pd.Timestamp(lo, tz='UTC')].reset_index(drop=True)
+        return events, self.state, self.cursor
+
+    def minute_counts(self, start=None, end=None):
+        lo = to_utc(start).value if start is not None else None
+        hi = to_utc(end).value if end is not None else None
+        return self._open(self._overlapping(lo, hi)).minute_counts(start, end)
+
+    def dwell_cells(self, start=None, end=None):
+        # Sessions entered in range find their exits up to MATCH_TOLERANCE later
+        lo = to_utc(start).value if start is not None else None
+        hi = to_utc(end).value + TOLERANCE if end is not None else None
+        return self._open(self._overlapping(lo, hi)).dwell_cells(start, end)
+
+    def _export_partitions(self, start_date=None, end_date=None, categories=None, colors=None,
+                           gates=None, zones=None):
+        """Partitions that can hold rows matching the export filters."""
+        if start_date or end_date:
+            # Same inclusive bounds as TimeIndex.bounds(); undated rows only without bounds
+            partitions = self._overlapping(to_utc(start_date).value if start_date else None,
+                                           to_utc(end_date).value if end_date else None)
+        else:
+            partitions = self.partitions
+        wanted = [(column, set(values.split(','))) for column, values in
+                  (('category', categories), ('color', colors), ('gate', gates), ('zone', zones))
+                  if values]
+        return [p for p in partitions
+                if all(values & {str(v) for v in p['values'][column]} for column, values in wanted)]
+
+    def _export_scope(self, filters):
+        keys = ('start_date', 'end_date', 'categories', 'colors', 'gates', 'zones')
+        return self._export_partitions(**{key: filters.get(key) for key in keys})
+
+    def export_selection(self, **filters):
+        # Row positions per partition; rows are read partition by partition
+        parts = [self._open([p]).export_selection(**filters) for p in self._export_scope(filters)]
+        return PartitionSelection(self.columns + ['datetime_utc'], parts)
+
+    def export_count(self, **filters):
+        return sum(self._open([p]).export_count(**filters) for p in self._export_scope(filters))
+
+    def vehicle(self, plate):
+        # A plate's exits are in partitions holding the plate, like its entries
+        return self._open([p for p in self.partitions if plate in self.backend.plates(p)]).vehicle(plate)
+
+    def distinct(self, column):
+        values = set()
+        for p in self.partitions:
+            values.update(p['values'][column])
+        return sorted(values)
+
+    def today(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        day = int(now.timestamp()) // 86_400 * DAY
+        cells = self.backend.cells(self._overlapping(day, day + DAY - 1), self.columns)
+        hours = cells['hour'].to_numpy()
+        return int(cells['count'].to_numpy()[(hours >= day) & (hours < day + DAY)].sum())
+
+    def _counters(self, now=None):
+        # Everything from the window's first minute on, as the minute rings see it
+        since = LiveCounters._window_start(now) * MINUTE
+        partitions = self._overlapping(since)
+        if not partitions:
+            return None
+        return live_counters(self.backend.snapshot(partitions, self.columns, self.version))
+
+    def recent_entries(self, now=None):
+        counters = self._counters(now)
+        return counters.recent_entries(now) if counters is not None else 0
+
+    def recent_exits(self, now=None):
+        counters = self._counters(now)
+        return counters.recent_exits(now) if counters is not None else 0
+
+    def summary(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        return {
+            "today_count": self.today(now),
+            "recent_entries": self.recent_entries(now),
+            "recent_exits": self.recent_exits(now),
+        }
+
+
+class PartitionedBackend:
+    """The CSV ingested into day partitions, kept up to date as it grows."""
+
+    def __init__(self, csv_path, path=None, compact_days=COMPACT_AFTER_DAYS):
+        self.csv_path = csv_path
+        self.path = path or PARTITIONS_PATH or csv_path + SUFFIX
+        self.compact_days = compact_days
+        self._lock = threading.Lock()
+        self._view = None
+        self._cache_lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._cells = OrderedDict()
+        self._plates = {}
+
+    def current(self):
+        """The latest view, ingesting first if the CSV (or the manifest) changed."""
+        view = self._view
+        if (view is not None and caught_up(view.state, view.offset, FileState.of(self.csv_path))
+                and view.identity == self._identity()):
+            return view
+        return self.refresh()
+
+    def latest(self):
+        return self._view
+
+    def refresh(self):
+        with self._lock:
+            state = FileState.of(self.csv_path)
+            view = self._view
+            if (view is not None and caught_up(view.state, view.offset, state)
+                    and view.identity == self._identity()):
+                return view
+            try:
+                manifest = self._ingest(state)
+            except Exception:
+                logger.exception("Error ingesting %s into %s", self.csv_path, self.path)
+                if view is None:
+                    raise
+                return view
+            self._view = PartitionedView(self, manifest, self._identity())
+            return self._view
+
+    def compact(self, days=None):
+        """Merge old day partitions now; return the partitions after compaction."""
+        with self._writing():
+            manifest = self._read_manifest()
+            if manifest is None:
+                return []
+            previous = dict(manifest)
+            if self._compact(manifest, self.compact_days if days is None else days):
+                manifest['version'] += 1
+                self._publish(manifest, previous)
+        return manifest['partitions']
+
+    # Reading
+
+    def _cached(self, cache, key, build):
+        """build() memoized in cache, an LRU of PARTITION_CACHE entries."""
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+                return value
+        value = build()
+        with self._cache_lock:
+            value = cache.setdefault(key, value)
+            cache.move_to_end(key)
+            while len(cache) > PARTITION_CACHE:
+                cache.popitem(last=False)
+        return value
+
+    def snapshot(self, partitions, columns, version):
+        """The events of partitions as one Snapshot, cached per set of partitions."""
+        def build():
+            started = time.perf_counter()
+            frames = [self.events(p) for p in partitions]
+            events = concat_frames(frames, ignore_index=True) if frames else _empty_events(columns)
+            snapshot = Snapshot(version, events, None, None, time.perf_counter() - started)
+            # The rollup is made of the partitions' stored cells
+            snapshot.derived('rollup', lambda s: Rollup(self.cells(partitions, columns)))
+            return snapshot
+
+        return self._cached(self._snapshots, tuple(p['path'] for p in partitions), build)
+
+    def cells(self, partitions, columns):
+        """The stored rollup cells of partitions, undated ones first as Rollup sorts them."""
+        def build():
+            frames = [read_frame(os.path.join(self.path, p['path'], 'cells'), p['cells'])
+                      for p in sorted(partitions, key=lambda p: p['start'] is not None)]
+            if not frames:
+                return aggregate(_empty_events(columns))
+            return concat_frames(frames, ignore_index=True)
+
+        return self._cached(self._cells, tuple(p['path'] for p in partitions), build)
+
+    def events(self, partition):
+        return read_frame(os.path.join(self.path, partition['path']), partition['columns'])
+
+    def plates(self, partition):
+        """The distinct plates of a partition, read from its plate dictionary."""
+        plates = self._plates.get(partition['path'])
+        if plates is None:
+            with open(os.path.join(self.path, partition['path'], 'license_plate.dict.json')) as f:
+                plates = self._plates[partition['path']] = frozenset(json.load(f))
+        return plates
+
+    def _identity(self):
+        try:
+            return FileState.of(os.path.join(self.path, MANIFEST))
+        except FileNotFoundError:
+            return None
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return manifest if manifest.get('format') == FORMAT_VERSION else None
+
+    # Ingest
+
+    def _writing(self):
+        """Hold the directory's lock (blocking) while ingesting or compacting."""
+        os.makedirs(self.path, exist_ok=True)
+        lock = open(os.path.join(self.path, 'lock'), 'a+')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _ingest(self, state):
+        with self._writing():
+            manifest = self._read_manifest()
+            if manifest is not None and caught_up(FileState(**manifest['state']), manifest['offset'], state):
+                # Another worker ingested it while we waited for the lock
+                return manifest
+            started = time.perf_counter()
+            previous = manifest
+            appending = manifest is not None and grew_past(
+                self.csv_path, FileState(**manifest['state']), state, manifest['offset'],
+                base64.b64decode(manifest['marker']), manifest['ends_with_newline'])
+            manifest = self._load(manifest if appending else None, previous)
+            self._compact(manifest, self.compact_days)
+            manifest['load_seconds'] = time.perf_counter() - started
+            self._publish(manifest, previous)
+            return manifest
+
+    def _load(self, manifest, previous):
+        """Ingest the CSV from the manifest's offset (None: from scratch); return the new manifest."""
+        with open(self.csv_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if manifest is None:
+                header = f.readline()
+                columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+                offset, recent, rows, partitions = len(header), header, 0, {}
+                ends_with_newline = header.endswith(b'\n')
+            else:
+                columns = manifest['columns']
+                offset, recent, rows = manifest['offset'], base64.b64decode(manifest['marker']), manifest['rows']
+                ends_with_newline = manifest['ends_with_newline']
+                partitions = {p['name']: p for p in manifest['partitions']}
+            self._serial = previous['serial'] if previous is not None else 0
+            self._written = set()
+
+            # Whole lines INGEST_BLOCK bytes at a time, up to the size seen by fstat
+            state = FileState.from_stat(st)
+            for part in csv_blocks(f, offset, st.st_size, INGEST_BLOCK, complete=settled(state)):
+                if part.strip():
+                    with timed('csv_load'):
+                        events = parse_events(io.BytesIO(part), names=columns)
+                    if len(events):
+                        self._add(partitions, events)
+                        rows += len(events)
+                offset += len(part)
+                recent = (recent + part)[-MARKER_SIZE:]
+                ends_with_newline = part.endswith(b'\n')
+
+        return {
+            'format': FORMAT_VERSION,
+            'version': previous['version'] + 1 if previous is not None else 1,
+            'serial': self._serial,
+            'state': dataclasses.asdict(state),
+            'offset': offset,
+            'marker': base64.b64encode(recent[-MARKER_SIZE:]).decode(),
+            'ends_with_newline': ends_with_newline,
+            'columns': columns,
+            'rows': rows,
+            'load_seconds': 0.0,
+            'loaded_at': time.time(),
+            'partitions': _ordered(partitions),
+        }
+
+    def _add(self, partitions, events):
+        """Merge parsed rows into the partitions they belong in, rewriting those."""
+        stamps = events['datetime_utc']
+        valid = stamps.notna().to_numpy()
+        targets = {}
+        if not valid.all():
+            targets['undated'] = (None, None, ~valid)
+        days = np.where(valid, stamps.array.asi8 // DAY, 0)
+        for day in np.unique(days[valid]).tolist():
+            # Days of an already compacted month go into the month's partition
+            name, start, stop = _month(day * DAY)
+            if name not in partitions:
+                name, start, stop = _day(day * DAY)
+            mask = valid & (days == day)
+            if name in targets:
+                mask = mask | targets[name][2]
+            targets[name] = (start, stop, mask)
+
+        for name, (start, stop, mask) in targets.items():
+            old = partitions.get(name)
+            rows = events[mask]
+            frame = sort_events(rows) if old is None else insert_sorted(self.events(old), rows, EVENT_ORDER)
+            partitions[name] = self._store(frame, name, start, stop)
+            self._discard(old)
+
+    def _store(self, frame, name, start, stop):
+        """Write one partition and return its manifest entry."""
+        frame = _trim_categories(frame)
+        self._serial += 1
+        path = f'{name}-{self._serial}'
+        directory = os.path.join(self.path, path)
+        columns = write_frame(frame, directory)
+        cells = write_frame(aggregate(frame), os.path.join(directory, 'cells'))
+        self._written.add(path)
+
+        stamps = frame['datetime_utc']
+        dated = frame[stamps.notna()]
+        values = stamps.array.asi8[stamps.notna().to_numpy()]
+        return {
+            'name': name,
+            'path': path,
+            'start': start,
+            'stop': stop,
+            'min_ts': int(values.min()) if len(values) else None,
+            'max_ts': int(values.max()) if len(values) else None,
+            'rows': len(frame),
+            # Entries as sessions.split_entries_exits() finds them
+            'entries': int(dated['gate'].str.endswith('_in', na=False).sum()),
+            'values': {column: frame[column].cat.categories.tolist() for column in DIMENSIONS},
+            'columns': columns,
+            'cells': cells,
+        }
+
+    def _discard(self, partition):
+        """Remove a partition written earlier in this ingest and replaced since."""
+        if partition is not None and partition['path'] in self._written:
+            shutil.rmtree(os.path.join(self.path, partition['path']), ignore_errors=True)
+            self._written.discard(partition['path'])
+
+    def _compact(self, manifest, days):
+        """Merge the day partitions of old months into month partitions; True if any were."""
+        partitions = {p['name']: p for p in manifest['partitions']}
+        dated = [p for p in partitions.values() if p['start'] is not None]
+        if days is None or days < 0 or not dated:
+            return False
+        cutoff = (max(p['max_ts'] for p in dated) // DAY - days) * DAY
+
+        months = {}
+        for p in dated:
+            month = _month(p['start'])
+            if p['name'].startswith('d') and month[2] <= cutoff:
+                months.setdefault(month, []).append(p)
+        if not months:
+            return False
+
+        self._serial = manifest['serial']
+        self._written = set()
+        with timed('compaction'):
+            for (name, start, stop), group in sorted(months.items()):
+                group = sorted(group + ([partitions[name]] if name in partitions else []),
+                               key=lambda p: p['start'])
+                frame = sort_events(concat_frames([self.events(p) for p in group], ignore_index=True))
+                for p in group:
+                    del partitions[p['name']]
+                partitions[name] = self._store(frame, name, start, stop)
+        manifest['serial'] = self._serial
+        manifest['partitions'] = _ordered(partitions)
+        return True
+
+    def _publish(self, manifest, previous):
+        """Swap the manifest in, then remove directories neither it nor the previous one names."""
+        tmp = os.path.join(self.path, f'.{MANIFEST}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+        keep = {p['path'] for p in manifest['partitions']}
+        if previous is not None:
+            keep.update(p['path'] for p in previous['partitions'])
+        for entry in os.listdir(self.path):
+            if entry not in keep and os.path.isdir(os.path.join(self.path, entry)):
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+
+def _ordered(partitions):
+    """Manifest order: dated partitions by time, the undated one last."""
+    return sorted(partitions.values(), key=lambda p: (p['start'] is None, p['start'] or 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest CSV exports into day partitions and compact old months.")
+    parser.add_argument('csv', nargs='+', help="CSV files to partition")
+    parser.add_argument('--compact-days', type=int, default=COMPACT_AFTER_DAYS,
+                        help="merge the days of months that ended this many days before the newest event")
+    args = parser.parse_args()
+    for path in args.csv:
+        backend = PartitionedBackend(path, compact_days=args.compact_days)
+        view = backend.refresh()
+        partitions = backend.compact()
+        print(f"{path}: {len(view)} rows in {len(partitions)} partitions under {backend.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Rows per license plate, with exact and prefix lookups.
+
+Unreadable plates (no letter or digit, e.g. '-') sort after the readable ones.
+"""
+import numpy as np
+import pandas as pd
+
+
+def is_unreadable(plate):
+    return not any(ch.isalnum() for ch in plate)
+
+
+def successor(prefix):
+    """Smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class PlateIndex:
+    """Row positions of one plate column grouped by plate, in plate order."""
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(series)
+        uniques = np.array([str(v) for v in np.asarray(uniques, dtype=object)], dtype=object)
+        unreadable = np.array([is_unreadable(v) for v in uniques], dtype=bool)
+
+        # Readable plates get their sorted rank, unreadable ones the sorted
+        # ranks after them, and missing plates come last
+        readable = np.flatnonzero(~unreadable)
+        unreadable = np.flatnonzero(unreadable)
+        ranked = np.concatenate([readable[np.argsort(uniques[readable], kind='stable')],
+                                 unreadable[np.argsort(uniques[unreadable], kind='stable')]])
+        self.plates = uniques[ranked]
+        self.readable = len(readable)
+        rank = np.full(len(uniques) + 1, len(ranked), dtype=np.int64)
+        rank[ranked] = np.arange(len(ranked))
+        row_ranks = rank[codes]  # code -1 picks the trailing "missing" rank
+
+        self.order = np.argsort(row_ranks, kind='stable')
+        counts = np.bincount(row_ranks, minlength=len(ranked) + 1)
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+
+    def _slice(self, lo, hi):
+        return self.order[self.starts[lo]:self.starts[hi]]
+
+    def _sections(self):
+        """(first, end) ranks of the sorted readable plates, then of the unreadable ones."""
+        return (0, self.readable), (self.readable, len(self.plates))
+
+    def _position(self, plate, section):
+        first, end = section
+        return first + int(np.searchsorted(self.plates[first:end], plate, side='left'))
+
+    def bucket(self):
+        """Sorted positions of the rows with an unreadable plate."""
+        return np.sort(self._slice(self.readable, len(self.plates)))
+
+    def lookup(self, plate):
+        """Sorted positions of the rows holding exactly this plate."""
+        section = self._sections()[is_unreadable(plate)]
+        pos = self._position(plate, section)
+        if pos == section[1] or self.plates[pos] != plate:
+            return np.empty(0, dtype=np.int64)
+        return self._slice(pos, pos + 1)
+
+    def prefix(self, prefix):
+        """Sorted positions of the rows whose plate starts with prefix."""
+        # '-' starts readable plates ('-MH01') as well as unreadable ones
+        # ('--'), so both runs are searched
+        rows = [self._slice(self._position(prefix, section), self._position(successor(prefix), section))
+                for section in self._sections()]
+        return np.sort(np.concatenate(rows))
+
+
+def event_plate_index(snapshot):
+    return snapshot.derived('plates:events', lambda s: PlateIndex(s.events['license_plate']))
+
+
+def session_plate_index(snapshot, sessions):
+    return snapshot.derived('plates:sessions', lambda s: PlateIndex(sessions.table['license_plate']))
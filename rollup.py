@@ -0,0 +1,165 @@
+"""
+Hourly rollup cube of event counts per (hour, gate, category, color, zone).
+
+Range queries sum the cells of whole hours and aggregate raw rows only at
+the partial edge hours. Undated rows are counted under the UNDATED hour.
+"""
+import numpy as np
+import pandas as pd
+
+from dataset import concat_frames
+from time_index import event_time_index, to_utc
+
+HOUR = 3_600_000_000_000  # ns
+DIMENSIONS = ['gate', 'category', 'color', 'zone']
+CELL_KEYS = ['hour'] + DIMENSIONS
+
+# Same integer as NaT; hour of the cells for rows without a timestamp
+UNDATED = np.iinfo(np.int64).min
+
+
+def aggregate(events):
+    """Count events per (hour, gate, category, color, zone) cell, sorted by hour."""
+    stamps = events['datetime_utc']
+    hours = np.where(stamps.notna().to_numpy(), stamps.array.asi8 // HOUR * HOUR, UNDATED)
+    cells = events[DIMENSIONS].assign(hour=hours)
+    return (cells.groupby(CELL_KEYS, dropna=False, sort=True, observed=True).size()
+            .rename('count').reset_index())
+
+
+def _merge(cells, added):
+    """Add the counts of added into cells, re-aggregating only from added's first hour on."""
+    if added.empty:
+        return cells
+    pos = cells['hour'].searchsorted(added['hour'].min(), side='left')
+    suffix = (concat_frames([cells.iloc[pos:], added])
+              .groupby(CELL_KEYS, dropna=False, sort=True, observed=True)['count'].sum().reset_index())
+    return concat_frames([cells.iloc[:pos], suffix], ignore_index=True)
+
+
+def split_hours(index, start=None, end=None, end_inclusive=True):
+    """
+    Split the rows of a time range around the whole hours it covers.
+
+    Returns (lo, head, tail, hi, first, stop): rows [lo, hi) are in range,
+    [lo, head) and [tail, hi) in its partial edge hours and [head, tail) in
+    the whole hours [first, stop) (None for an open end). head and tail are
+    None when the range covers no whole hour.
+    """
+    lo, hi = index.bounds(start, end, end_inclusive)
+
+    # Whole hours [first, stop) lie entirely inside the range
+    first = stop = None
+    if start is not None:
+        first = -(-to_utc(start).value // HOUR) * HOUR
+    if end is not None:
+        end_ns = to_utc(end).value + (1 if end_inclusive else 0)
+        stop = end_ns // HOUR * HOUR
+    if first is not None and stop is not None and first >= stop:
+        return lo, None, None, hi, first, stop
+
+    head = lo if first is None else max(lo, int(np.searchsorted(index.values, first, side='left')))
+    tail = hi if stop is None else min(hi, int(np.searchsorted(index.values, stop, side='left')))
+    return lo, head, tail, hi, first, stop
+
+
+class Rollup:
+    """Hourly event-count cells for one dataset snapshot."""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.hours = cells['hour'].to_numpy()
+
+    def __len__(self):
+        return len(self.cells)
+
+    @classmethod
+    def build(cls, events):
+        return cls(aggregate(events))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls.build(snapshot.events)
+
+    @classmethod
+    def from_table(cls, table, snapshot):
+        """DatasetManager publish hook: the cells stored with the snapshot."""
+        return cls(table)
+
+    def to_table(self):
+        """DatasetManager publish hook: the frame to store with the snapshot."""
+        return self.cells
+
+    def advance(self, snapshot):
+        """DatasetManager.maintain() hook: add the snapshot's appended rows."""
+        return self.extend(snapshot.appended)
+
+    def extend(self, appended):
+        if appended.empty:
+            return self
+        return Rollup(_merge(self.cells, aggregate(appended)))
+
+    def empty(self):
+        return self.cells.iloc[0:0]
+
+    def _hour_range(self, first=None, stop=None):
+        lo = np.searchsorted(self.hours, UNDATED, side='right')
+        lo = lo if first is None else max(lo, np.searchsorted(self.hours, first, side='left'))
+        hi = len(self.hours) if stop is None else np.searchsorted(self.hours, stop, side='left')
+        return self.cells.iloc[lo:max(lo, hi)]
+
+    def range_cells(self, snapshot, start=None, end=None, end_inclusive=True):
+        """
+        Cells covering exactly the events with start <= ts <= end (or < end).
+
+        Whole hours come from the cube; the partial hours at the edges are
+        aggregated from the raw rows. Without any bound, undated rows are
+        included, as with TimeIndex.bounds().
+        """
+        if start is None and end is None:
+            return self.cells
+
+        lo, head, tail, hi, first, stop = split_hours(event_time_index(snapshot), start, end, end_inclusive)
+        if head is None:
+            return aggregate(snapshot.events.iloc[lo:hi])
+        parts = [aggregate(snapshot.events.iloc[lo:head]), self._hour_range(first, stop),
+                 aggregate(snapshot.events.iloc[tail:hi])]
+        return concat_frames([part for part in parts if not part.empty] or [self.empty()],
+                             ignore_index=True)
+
+
+def rollup(snapshot):
+    return snapshot.derived('rollup', Rollup.from_snapshot)
+
+
+def dimension_counts(cells, dimension):
+    """Counts per value of one dimension, largest first, like value_counts().to_dict()."""
+    counts = cells.groupby(dimension, observed=True)['count'].sum()
+    # Ties in value order, whatever order the categories were appended in
+    counts.index = counts.index.astype(object)
+    counts = counts.sort_index()
+    counts = counts[counts > 0].sort_values(ascending=False, kind='mergesort')
+    return counts.to_dict()
+
+
+def hourly_counts(cells):
+    """Event counts per UTC hour from the first to the last hour present, gaps as 0."""
+    dated = cells[cells['hour'] != UNDATED]
+    totals = dated.groupby('hour', sort=True)['count'].sum()
+    totals = totals[totals > 0]
+    if totals.empty:
+        return pd.Series(dtype='int64')
+    hours = np.arange(totals.index[0], totals.index[-1] + HOUR, HOUR)
+    totals = totals.reindex(hours, fill_value=0)
+    totals.index = pd.DatetimeIndex(hours.view('datetime64[ns]')).tz_localize('UTC')
+    return totals
+
+
+def busiest_hour(cells):
+    """Most frequent UTC hour of day (smallest on ties, like mode()[0]), or None."""
+    dated = cells[cells['hour'] != UNDATED]
+    if dated.empty:
+        return None
+    by_hour = np.bincount((dated['hour'].to_numpy() // HOUR) % 24,
+                          weights=dated['count'].to_numpy(), minlength=24)
+    return int(np.argmax(by_hour))
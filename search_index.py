@@ -0,0 +1,147 @@
+"""
+Trigram index over distinct values for the case-insensitive `search` parameter.
+
+Events are also searchable by UTC day or month ('date' column, e.g.
+`search=2025-01-24`); times of day are not indexed.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+EVENT_SEARCH_COLUMNS = ['license_plate', 'category', 'color', 'gate', 'description', 'date']
+SESSION_SEARCH_COLUMNS = ['license_plate', 'category', 'color', 'entry_gate', 'exit_gate', 'description']
+
+# Session gate columns share the event 'gate' vocabulary
+_DICTIONARY_FOR = {'entry_gate': 'gate', 'exit_gate': 'gate'}
+
+DAY = 86_400_000_000_000  # ns
+
+
+def search_values(frame, column):
+    """The values searched for column: the frame's column, or for 'date' the UTC day of datetime_utc."""
+    if column != 'date':
+        return frame[column]
+    stamps = frame['datetime_utc']
+    days = pd.Series(stamps.array.asi8 // DAY, index=frame.index).where(stamps.notna().to_numpy())
+    codes, uniques = pd.factorize(days)
+    labels = pd.to_datetime(uniques.astype('int64') * DAY, utc=True).strftime('%Y-%m-%d')
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=frame.index)
+
+
+def _trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class ValueTrigrams:
+    """Growing set of distinct lowercase strings with trigram postings."""
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+        self.postings = {}
+        self._lock = threading.Lock()
+
+    def add(self, values):
+        """Return the id of each value, registering the ones not seen before."""
+        ids = np.empty(len(values), dtype=np.int64)
+        with self._lock:
+            for i, value in enumerate(values):
+                vid = self.ids.get(value)
+                if vid is None:
+                    vid = len(self.values)
+                    self.values.append(value)
+                    self.ids[value] = vid
+                    for gram in _trigrams(value):
+                        self.postings.setdefault(gram, []).append(vid)
+                ids[i] = vid
+        return ids
+
+    def matching(self, needle):
+        """Ids of values containing needle (already lowercased)."""
+        grams = _trigrams(needle)
+        if not grams:
+            candidates = range(len(self.values))
+        else:
+            # Intersect starting from the rarest trigram
+            lists = sorted((self.postings.get(g, ()) for g in grams), key=len)
+            candidates = set(lists[0])
+            for other in lists[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(other)
+        values = self.values
+        return np.fromiter((vid for vid in candidates if needle in values[vid]), dtype=np.int64)
+
+
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def dictionary_for(column):
+    name = _DICTIONARY_FOR.get(column, column)
+    with _dictionaries_lock:
+        if name not in _dictionaries:
+            _dictionaries[name] = ValueTrigrams()
+        return _dictionaries[name]
+
+
+def _lowercase_codes(series):
+    """pd.factorize() of the column's lowercased str values."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return pd.factorize(series.astype(str).str.lower())
+    # Categorical: lowercase the dictionary once and remap the row codes
+    labels = series.cat.categories.astype(str).str.lower().tolist() + ['nan']
+    label_codes, uniques = pd.factorize(np.array(labels, dtype=object))
+    # Row code -1 (missing) picks the trailing 'nan', as astype(str) would
+    return label_codes[series.cat.codes.to_numpy()], uniques
+
+
+class _ColumnPostings:
+    """Row positions of one column grouped by the value id they hold."""
+
+    def __init__(self, series, dictionary):
+        codes, uniques = _lowercase_codes(series)
+        value_ids = dictionary.add(list(uniques))
+        row_ids = value_ids[codes]
+
+        self.dictionary = dictionary
+        self.order = np.argsort(row_ids, kind='stable')
+        # starts[v]:starts[v+1] is the slice of self.order holding value v
+        counts = np.bincount(row_ids, minlength=len(dictionary.values) + 1)
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+
+    def rows(self, needle):
+        value_ids = self.dictionary.matching(needle)
+        value_ids = value_ids[value_ids < len(self.starts) - 1]
+        if not len(value_ids):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[self.starts[v]:self.starts[v + 1]] for v in value_ids])
+
+
+class SearchIndex:
+    """Case-insensitive substring lookup over some text columns of one frame."""
+
+    def __init__(self, frame, columns):
+        self.size = len(frame)
+        self.columns = {
+            column: _ColumnPostings(search_values(frame, column), dictionary_for(column))
+            for column in columns if column in frame.columns or column == 'date'
+        }
+
+    def search(self, needle):
+        """Sorted positions of rows where any indexed column contains needle."""
+        needle = needle.lower()
+        hits = [postings.rows(needle) for postings in self.columns.values()]
+        hits = [h for h in hits if len(h)]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(hits))
+
+
+def event_search_index(snapshot):
+    return snapshot.derived('search:events', lambda s: SearchIndex(s.events, EVENT_SEARCH_COLUMNS))
+
+
+def session_search_index(snapshot, sessions):
+    return snapshot.derived('search:sessions', lambda s: SearchIndex(sessions.table, SESSION_SEARCH_COLUMNS))
@@ -0,0 +1,213 @@
+"""
+Materialized entry/exit sessions.
+
+An entry at an `_in` gate is paired with the first exit of the same
+license plate at an `_out` gate within MATCH_TOLERANCE (pd.merge_asof,
+direction='forward'). The SessionTable keeps that pairing for the whole
+dataset, sorted by (entry_timestamp, insertion_id), and updates it from
+appended events by pairing only the sessions they can change: the new
+entries, and the entries a new exit closes earlier than before. An exit
+never changes the match of an entry that already had an earlier one, so
+even the unreadable '-' plate, which is in nearly every append, only
+re-pairs its few open sessions.
+"""
+import numpy as np
+import pandas as pd
+
+from dataset import align_categories, concat_frames, insert_sorted
+from metrics import timed
+
+# Maximum allowed gap between an entry and its exit
+MATCH_TOLERANCE = pd.Timedelta(days=7)
+
+SESSION_COLUMNS = ['insertion_id', 'license_plate', 'category', 'color',
+                   'entry_timestamp', 'entry_gate', 'exit_timestamp', 'exit_gate',
+                   'zone', 'description', 'insertion_id_exit', 'duration']
+
+SORT_KEYS = ['entry_timestamp', 'insertion_id']
+
+# The entry columns a session keeps, under their event names
+ENTRY_COLUMNS = {'insertion_id': 'insertion_id', 'license_plate': 'license_plate', 'category': 'category',
+                 'color': 'color', 'entry_timestamp': 'datetime_utc', 'entry_gate': 'gate', 'zone': 'zone',
+                 'description': 'description'}
+
+
+def split_entries_exits(df):
+    """Split events into entries and exits, each sorted by time for merge_asof."""
+    df = df.dropna(subset=['datetime_utc'])
+    entries = df[df['gate'].str.endswith('_in', na=False)]
+    exits = df[df['gate'].str.endswith('_out', na=False)]
+    exits = exits.rename(columns={'datetime_utc': 'exit_timestamp'})
+    return (entries.sort_values('datetime_utc', kind='mergesort'),
+            exits.sort_values('exit_timestamp', kind='mergesort'))
+
+
+def _blank_gates(gates):
+    """Fill missing exit gates with ''; a categorical column keeps its dictionary."""
+    if isinstance(gates.dtype, pd.CategoricalDtype) and '' not in gates.cat.categories:
+        gates = gates.cat.add_categories([''])
+    return gates.fillna('')
+
+
+def pair_sessions(entries, exits):
+    """Pair sorted entries with sorted exits and return rows in SESSION_COLUMNS order."""
+    with timed('session_merge'):
+        return _pair_sessions(entries, exits)
+
+
+def _pair_sessions(entries, exits):
+    if exits.empty:
+        result = entries.rename(columns={'datetime_utc': 'entry_timestamp', 'gate': 'entry_gate'})
+        result = result.assign(
+            exit_timestamp=pd.Series(pd.NaT, index=result.index, dtype=entries['datetime_utc'].dtype),
+            exit_gate=_blank_gates(result['entry_gate'].where(pd.Series(False, index=result.index))),
+            insertion_id_exit=-1,
+            duration=-1.0,
+        )
+        return result[SESSION_COLUMNS].reset_index(drop=True)
+
+    # merge_asof needs the same plate dictionary on both sides
+    entries, exits = align_categories([entries, exits[['license_plate', 'exit_timestamp', 'gate', 'insertion_id']]])
+    merged = pd.merge_asof(
+        left=entries,
+        right=exits,
+        left_on='datetime_utc',
+        right_on='exit_timestamp',
+        by='license_plate',
+        direction='forward',
+        suffixes=('', '_exit'),
+        tolerance=MATCH_TOLERANCE
+    )
+    merged = merged.rename(columns={
+        'datetime_utc': 'entry_timestamp',
+        'gate': 'entry_gate',
+        'gate_exit': 'exit_gate',
+    })
+
+    # Duration in seconds as a column operation; -1 when no exit was found
+    merged['duration'] = (merged['exit_timestamp'] - merged['entry_timestamp']).dt.total_seconds().fillna(-1)
+    merged['exit_gate'] = _blank_gates(merged['exit_gate'])
+    merged['insertion_id_exit'] = merged['insertion_id_exit'].fillna(-1).astype('int64')
+    return merged[SESSION_COLUMNS]
+
+
+def merge_entries_exits(df):
+    """
+    Pair every entry in df with its exit.
+
+    Returns one row per entry, sorted by entry time, or an empty frame when
+    there are no entries.
+    """
+    entries, exits = split_entries_exits(df)
+    if entries.empty:
+        return pd.DataFrame()
+    return pair_sessions(entries, exits)
+
+
+def reopened(table, new_exits):
+    """
+    Positions in a session table of the sessions new exits can close earlier.
+
+    A new exit at time t changes the match of an entry of its plate in
+    [t - MATCH_TOLERANCE, t] only if that entry had no exit yet, or a
+    later (or simultaneous) one.
+    """
+    if new_exits.empty:
+        return np.empty(0, dtype=np.int64)
+    earliest = new_exits['exit_timestamp'].iloc[0]
+    start = table['entry_timestamp'].searchsorted(earliest - MATCH_TOLERANCE)
+    window = table.iloc[start:]
+    # Still open at the earliest new exit, and of a plate that has one
+    current = window['exit_timestamp']
+    candidates = np.flatnonzero(((current.isna() | (current >= earliest))
+                                 & window['license_plate'].isin(new_exits['license_plate'].unique())).to_numpy())
+    if not len(candidates):
+        return candidates
+    window = window.iloc[candidates]
+    # The first new exit of the plate at or after each entry; plates as
+    # strings, so the few rows need no shared category dictionary
+    first = pd.merge_asof(
+        window[['entry_timestamp']].assign(license_plate=window['license_plate'].astype(str)),
+        new_exits[['exit_timestamp']].assign(license_plate=new_exits['license_plate'].astype(str))
+        .rename(columns={'exit_timestamp': 'new_exit'}),
+        left_on='entry_timestamp', right_on='new_exit', by='license_plate',
+        direction='forward', tolerance=MATCH_TOLERANCE)['new_exit'].to_numpy()
+    current = window['exit_timestamp'].to_numpy()
+    closes = ~pd.isna(first) & (pd.isna(current) | (first <= current))
+    return start + candidates[closes]
+
+
+class SessionTable:
+    """Entries, exits and their pairing for one dataset snapshot."""
+
+    def __init__(self, entries, exits, table, events=None, changes=None):
+        # entries/exits may be None for a table loaded from a published
+        # snapshot; they are split from events the first time they are needed
+        self.entries = entries
+        self.exits = exits
+        self.table = table
+        self._events = events
+        # (removed, added) sessions when extend() made this table, else None
+        self.changes = changes
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def build(cls, events):
+        entries, exits = split_entries_exits(events)
+        table = pair_sessions(entries, exits).sort_values(SORT_KEYS, kind='mergesort')
+        return cls(entries.reset_index(drop=True), exits.reset_index(drop=True),
+                   table.reset_index(drop=True))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls.build(snapshot.events)
+
+    @classmethod
+    def from_table(cls, table, snapshot):
+        """DatasetManager publish hook: a table stored with the snapshot."""
+        return cls(None, None, table, snapshot.events)
+
+    def to_table(self):
+        """DatasetManager publish hook: the frame to store with the snapshot."""
+        return self.table
+
+    def _split(self):
+        if self.entries is None:
+            entries, exits = split_entries_exits(self._events)
+            self.entries, self.exits = entries.reset_index(drop=True), exits.reset_index(drop=True)
+            self._events = None
+
+    def advance(self, snapshot):
+        """DatasetManager.maintain() hook: extend with the snapshot's appended rows."""
+        return self.extend(snapshot.appended)
+
+    def extend(self, appended):
+        """Return a new SessionTable that also covers the appended events."""
+        new_entries, new_exits = split_entries_exits(appended)
+        if new_entries.empty and new_exits.empty:
+            return self
+
+        self._split()
+        entries = insert_sorted(self.entries, new_entries, 'datetime_utc')
+        exits = insert_sorted(self.exits, new_exits, 'exit_timestamp')
+
+        positions = reopened(self.table, new_exits)
+        removed = self.table.iloc[positions]
+        pending = concat_frames([removed[list(ENTRY_COLUMNS)].rename(columns=ENTRY_COLUMNS),
+                                 new_entries[list(ENTRY_COLUMNS.values())]], ignore_index=True)
+        if pending.empty:
+            return SessionTable(entries, exits, self.table, changes=(removed, removed))
+        pending = pending.sort_values('datetime_utc', kind='mergesort')
+        start = pending['datetime_utc'].iloc[0]
+        window_exits = exits.iloc[exits['exit_timestamp'].searchsorted(start):]
+        window_exits = window_exits[window_exits['license_plate'].isin(pending['license_plate'].unique())]
+        added = pair_sessions(pending, window_exits)
+
+        pos = self.table['entry_timestamp'].searchsorted(start)
+        kept = np.ones(len(self.table) - pos, dtype=bool)
+        kept[positions - pos] = False
+        suffix = concat_frames([self.table.iloc[pos:][kept], added]).sort_values(SORT_KEYS, kind='mergesort')
+        table = concat_frames([self.table.iloc[:pos], suffix], ignore_index=True)
+        return SessionTable(entries, exits, table, changes=(removed, added))
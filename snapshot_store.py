@@ -0,0 +1,242 @@
+"""
+Versioned, memory-mapped columnar snapshots of parking_export.csv.
+
+    parking_export.csv.snapshot/
+        CURRENT          name of the published version, replaced atomically
+        lock             flock()ed by the one process that writes versions
+        v<N>/            meta.json, one .npy per column, tables/<name>/
+
+Convert existing exports with:
+
+    python snapshot_store.py parking_export.csv [other.csv ...]
+"""
+import argparse
+import base64
+import fcntl
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 5
+SUFFIX = '.snapshot'
+POINTER = 'CURRENT'
+# Published versions kept on disk, including the current one
+KEEP_VERSIONS = 2
+
+
+def snapshot_dir(csv_path):
+    return csv_path + SUFFIX
+
+
+def _column_kind(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(series):
+        return 'numeric'
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'categorical'
+    return 'dictionary'
+
+
+def write_frame(frame, directory):
+    """Write frame's columns into directory; return their meta.json entries."""
+    os.makedirs(directory)
+    columns = []
+    for name in frame.columns:
+        series = frame[name]
+        kind = _column_kind(series)
+        if kind == 'datetime':
+            values = series.dt.tz_convert('UTC').dt.as_unit('ns').dt.tz_localize(None)
+            np.save(os.path.join(directory, f"{name}.npy"), values.to_numpy().view('int64'))
+        elif kind == 'numeric':
+            np.save(os.path.join(directory, f"{name}.npy"), series.to_numpy())
+        elif kind == 'categorical':
+            # Codes as they are in memory, so readers map them instead of re-encoding
+            np.save(os.path.join(directory, f"{name}.npy"), series.cat.codes.to_numpy())
+            with open(os.path.join(directory, f"{name}.dict.json"), 'w') as f:
+                json.dump(series.cat.categories.tolist(), f)
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            np.save(os.path.join(directory, f"{name}.npy"), codes.astype('int32'))
+            with open(os.path.join(directory, f"{name}.dict.json"), 'w') as f:
+                json.dump([str(v) for v in uniques], f)
+        columns.append({'name': name, 'kind': kind})
+    return columns
+
+
+def read_frame(directory, columns):
+    """Load a frame written by write_frame, memory-mapping the numeric arrays."""
+    data = {}
+    for column in columns:
+        name, kind = column['name'], column['kind']
+        values = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+        if kind == 'datetime':
+            data[name] = pd.DatetimeIndex(values.view('datetime64[ns]')).tz_localize('UTC')
+        elif kind == 'numeric':
+            data[name] = values
+        elif kind == 'categorical':
+            with open(os.path.join(directory, f"{name}.dict.json")) as f:
+                categories = json.load(f)
+            data[name] = pd.Categorical.from_codes(values, categories)
+        else:
+            with open(os.path.join(directory, f"{name}.dict.json")) as f:
+                dictionary = np.array(json.load(f) + [np.nan], dtype=object)
+            # Code -1 (missing) picks the trailing NaN
+            data[name] = dictionary.take(values)
+    return pd.DataFrame(data, copy=False)
+
+
+def _versions(directory):
+    return sorted(int(name[1:]) for name in os.listdir(directory)
+                  if name.startswith('v') and name[1:].isdigit())
+
+
+def lock_writer(directory):
+    """
+    Try to become the process that writes versions for directory.
+
+    Returns the open lock file (keep it open to stay the writer), or None if
+    another live process holds the lock. The lock is released by the OS when
+    the holder exits, so a surviving worker can take over.
+    """
+    os.makedirs(directory, exist_ok=True)
+    lock = open(os.path.join(directory, 'lock'), 'a+')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def write_snapshot(events, state, cursor, directory, tables=None):
+    """
+    Publish events plus the CSV state/cursor they correspond to as a new version.
+
+    tables maps names to derived frames stored alongside (e.g. the session
+    table), so readers do not have to rebuild them.
+    """
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        # Unversioned layout written by an older release; the lock file is the caller's
+        for entry in os.scandir(directory):
+            if entry.name == 'lock':
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+    os.makedirs(directory, exist_ok=True)
+
+    versions = _versions(directory)
+    version = (versions[-1] + 1) if versions else 1
+    name = f"v{version}"
+    tmp = os.path.join(directory, f"tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    columns = write_frame(events, tmp)
+    stored_tables = {}
+    for table, frame in (tables or {}).items():
+        stored_tables[table] = write_frame(frame, os.path.join(tmp, 'tables', table))
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'rows': len(events),
+        'columns': columns,
+        'tables': stored_tables,
+        'state': {'inode': state.inode, 'size': state.size, 'mtime_ns': state.mtime_ns},
+        'cursor': {
+            'offset': cursor.offset,
+            'marker': base64.b64encode(cursor.marker).decode('ascii'),
+            'ends_with_newline': cursor.ends_with_newline,
+            'columns': list(cursor.columns),
+        },
+        'written_at': time.time(),
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # The version becomes visible to readers only when CURRENT names it
+    os.replace(tmp, os.path.join(directory, name))
+    pointer = os.path.join(directory, f"{POINTER}.tmp-{os.getpid()}")
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(directory, POINTER))
+
+    for old in _versions(directory)[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(directory, f"v{old}"), ignore_errors=True)
+    return version
+
+
+def pointer_state(directory):
+    """(inode, mtime_ns) of the CURRENT pointer, or None; changes whenever a version is published."""
+    try:
+        st = os.stat(os.path.join(directory, POINTER))
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def read_meta(directory):
+    """Return the published version's meta.json contents, or None if there is no usable snapshot."""
+    try:
+        with open(os.path.join(directory, POINTER)) as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('format') != FORMAT_VERSION:
+        return None
+    meta['path'] = path
+    return meta
+
+
+def load_columns(directory, meta):
+    """Load the snapshot's events frame, memory-mapping the numeric arrays."""
+    return read_frame(meta['path'], meta['columns'])
+
+
+def load_tables(directory, meta):
+    """Load the derived frames stored with the snapshot, by name."""
+    return {name: read_frame(os.path.join(meta['path'], 'tables', name), columns)
+            for name, columns in meta.get('tables', {}).items()}
+
+
+def convert(csv_path):
+    """Parse csv_path once and write its snapshot, with the tables the server publishes."""
+    from backends import PandasBackend
+    from dataset import DatasetManager
+
+    lock = lock_writer(snapshot_dir(csv_path))
+    if lock is None:
+        raise RuntimeError(f"{snapshot_dir(csv_path)} is being written by a running server")
+    try:
+        manager = DatasetManager(csv_path, persist=False)
+        PandasBackend(manager)
+        snapshot = manager.refresh(force=True)
+        write_snapshot(snapshot.events, snapshot.state, snapshot.cursor, snapshot_dir(csv_path),
+                       manager.tables(snapshot))
+    finally:
+        lock.close()
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert parking CSV exports to columnar snapshots.")
+    parser.add_argument('csv', nargs='+', help="CSV files in the parking_export.csv schema")
+    args = parser.parse_args()
+
+    for path in args.csv:
+        started = time.perf_counter()
+        snapshot = convert(path)
+        print(f"{path}: {len(snapshot)} rows -> {snapshot_dir(path)} "
+              f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
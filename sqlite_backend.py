@@ -0,0 +1,786 @@
+"""
+SQLite storage backend (PARKING_BACKEND=sqlite).
+
+The CSV is ingested into an SQLite file next to it (PARKING_SQLITE,
+default <csv>.sqlite) holding the events, sessions, hourly and dwell
+cells, filter dictionaries and an FTS5 trigram vocabulary for search.
+"""
+import base64
+import dataclasses
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import dwell
+from dataset import (MARKER_SIZE, FileState, IngestCursor, caught_up, categorize, csv_blocks, grew_past,
+                     parse_events, settled)
+from export_stream import EXPORT_CHUNK, timestamp_unit
+from live_counters import ENTRY_MARK, EXIT_MARK, MINUTE, RECENT_WINDOW
+from metrics import timed
+from pagination import Counts, decode_cursor, encode_cursor
+from plate_index import successor
+from rollup import CELL_KEYS, DIMENSIONS, HOUR, UNDATED, aggregate
+from search_index import EVENT_SEARCH_COLUMNS, SESSION_SEARCH_COLUMNS, search_values
+from serialization import column_values
+from sessions import MATCH_TOLERANCE, SESSION_COLUMNS
+from time_index import to_utc
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PATH = os.environ.get("PARKING_SQLITE")
+
+# Bytes of CSV parsed and inserted at a time
+INGEST_BLOCK = 32 << 20
+
+# Bumped when the schema changes; older files are ingested again
+SCHEMA_VERSION = 4
+
+DAY = 86_400 * 10**9  # ns
+
+DATE_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+
+# Columns listed by the /filters endpoints
+DICTIONARY_COLUMNS = ['category', 'color', 'gate', 'zone']
+
+SESSION_SELECT = ('insertion_id, license_plate, category, color, entry_ts, entry_gate, exit_ts, '
+                  'exit_gate, zone, description, insertion_id_exit')
+
+SCHEMA = """
+CREATE TABLE events (seq INTEGER PRIMARY KEY, {columns}, ts INTEGER, direction INTEGER NOT NULL);
+CREATE INDEX events_time ON events (ts, insertion_id);
+CREATE INDEX events_plate ON events (license_plate, ts, insertion_id);
+CREATE INDEX events_exits ON events (license_plate, ts, insertion_id) WHERE direction = 2;
+CREATE INDEX events_category ON events (category);
+CREATE INDEX events_color ON events (color);
+CREATE INDEX events_gate ON events (gate);
+CREATE INDEX events_zone ON events (zone);
+CREATE INDEX events_description ON events (description);
+
+CREATE TABLE sessions (
+    entry_seq INTEGER PRIMARY KEY, insertion_id, license_plate, category, color,
+    entry_ts INTEGER NOT NULL, entry_gate, zone, description,
+    exit_seq INTEGER, exit_ts INTEGER, exit_gate DEFAULT '', insertion_id_exit DEFAULT -1
+);
+CREATE INDEX sessions_time ON sessions (entry_ts, insertion_id);
+CREATE INDEX sessions_plate ON sessions (license_plate, entry_ts);
+CREATE INDEX sessions_category ON sessions (category);
+CREATE INDEX sessions_color ON sessions (color);
+CREATE INDEX sessions_entry_gate ON sessions (entry_gate);
+CREATE INDEX sessions_exit_gate ON sessions (exit_gate);
+CREATE INDEX sessions_description ON sessions (description);
+
+CREATE TABLE hourly (hour INTEGER, gate, category, color, zone, count INTEGER NOT NULL);
+CREATE INDEX hourly_hour ON hourly (hour);
+
+CREATE TABLE dwell (hour INTEGER NOT NULL, zone, category, gate, bucket INTEGER NOT NULL,
+                    count INTEGER NOT NULL, seconds REAL NOT NULL);
+CREATE INDEX dwell_hour ON dwell (hour);
+
+CREATE TABLE dictionary (name TEXT NOT NULL, value NOT NULL, PRIMARY KEY (name, value)) WITHOUT ROWID;
+CREATE TABLE searchable (value TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE VIRTUAL TABLE vocabulary USING fts5 (value, tokenize = 'trigram');
+
+CREATE TABLE ingest (id INTEGER PRIMARY KEY CHECK (id = 0), info TEXT NOT NULL);
+"""
+
+TABLES = ['events', 'sessions', 'hourly', 'dwell', 'dictionary', 'searchable', 'vocabulary', 'ingest']
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+def _stamps(values):
+    """datetime64[ns, UTC] Series from ns integers, None as NaT."""
+    ns = np.array([np.iinfo(np.int64).min if v is None else v for v in values], dtype=np.int64)
+    return pd.Series(ns.view('datetime64[ns]')).dt.tz_localize('UTC')
+
+
+def _timestamp(ns):
+    return pd.Timestamp(ns, tz='UTC') if ns is not None else None
+
+
+def events_frame(rows, columns):
+    """Events frame, as in memory, from (CSV columns..., ts) rows; later fields are dropped."""
+    frame = pd.DataFrame([row[:len(columns)] for row in rows], columns=columns)
+    frame['datetime_utc'] = _stamps([row[len(columns)] for row in rows])
+    return frame
+
+
+def sessions_frame(rows):
+    """Session table frame, as in memory, from SESSION_SELECT rows; later fields are dropped."""
+    names = SESSION_SELECT.split(', ')
+    frame = pd.DataFrame([row[:len(names)] for row in rows], columns=names)
+    entry = _stamps([row[names.index('entry_ts')] for row in rows])
+    exit_ = _stamps([row[names.index('exit_ts')] for row in rows])
+    frame['entry_timestamp'] = entry
+    frame['exit_timestamp'] = exit_
+    frame['duration'] = (exit_ - entry).dt.total_seconds().fillna(-1)
+    frame['insertion_id_exit'] = frame['insertion_id_exit'].astype('int64')
+    return frame[SESSION_COLUMNS]
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA cache_size = -65536')
+    return conn
+
+
+class Where:
+    """AND-ed SQL conditions with their parameters."""
+
+    def __init__(self):
+        self.terms = []
+        self.params = []
+
+    def add(self, term, *params):
+        self.terms.append(term)
+        self.params.extend(params)
+        return self
+
+    def isin(self, column, values):
+        return self.add(f'{column} IN ({_placeholders(values)})', *values)
+
+    def extend(self, other):
+        self.terms += other.terms
+        self.params += other.params
+        return self
+
+    def copy(self):
+        return Where().extend(self)
+
+    def sql(self):
+        return ' AND '.join(self.terms) if self.terms else '1'
+
+
+def _search(where, needle, columns):
+    """Rows where any of columns contains needle, case-insensitively (as SearchIndex.search)."""
+    if any(ch in needle for ch in '%_\\'):
+        # ESCAPE turns the trigram index off, so only use it when needed
+        escaped = needle.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        hits = "SELECT value FROM vocabulary WHERE value LIKE ? ESCAPE '\\'"
+        pattern = f'%{escaped}%'
+    else:
+        hits = 'SELECT value FROM vocabulary WHERE value LIKE ?'
+        pattern = f'%{needle}%'
+    # 'date' is not stored: it is the UTC day of ts, its vocabulary values are 'YYYY-MM-DD'
+    days = (f"SELECT CAST(strftime('%s', value) AS INTEGER) / 86400 FROM ({hits}) "
+            f"WHERE value GLOB '{DATE_GLOB}'")
+    terms = [f'ts / {DAY} IN ({days})' if column == 'date' else f'{column} IN ({hits})' for column in columns]
+    params = [pattern] * len(columns)
+    # SearchIndex sees missing values as the text 'nan'
+    if needle.lower() in 'nan':
+        terms += ['ts IS NULL' if column == 'date' else f'{column} IS NULL' for column in columns]
+    where.add('(' + ' OR '.join(terms) + ')', *params)
+
+
+def _plate_prefixes(where, prefixes):
+    """Export license_prefix: the first two characters of the plate are one of prefixes."""
+    terms, params = [], []
+    for prefix in prefixes:
+        if len(prefix) == 2:
+            terms.append('(license_plate >= ? AND license_plate < ?)')
+            params += [prefix, successor(prefix)]
+        elif len(prefix) < 2:
+            terms.append('license_plate = ?')
+            params.append(prefix)
+    where.add('(' + (' OR '.join(terms) or '0') + ')', *params)
+
+
+def _zone_values(zones):
+    """Zone filter values; zones are stored as numbers when the CSV has numbers."""
+    values = []
+    for zone in zones:
+        values.append(zone)
+        if zone.lstrip('-').isdigit():
+            values.append(int(zone))
+    return values
+
+
+class SQLiteSelection:
+    """Export rows streamed from the events table, in the events frame's order."""
+
+    def __init__(self, backend, columns, where):
+        self.backend = backend
+        self.columns = columns + ['datetime_utc']
+        self._fields = ', '.join(map(_quote, columns)) + ', ts'
+        self.where = where
+        self._summary = None
+
+    def _summarize(self):
+        if self._summary is None:
+            units = ', '.join(f'ifnull(max(ts % {ns} != 0), 0)' for ns in (DAY, 10**9, 10**6, 10**3))
+            with timed('filter'):
+                row = self.backend.connection().execute(
+                    f'SELECT count(*), {units} FROM events WHERE {self.where.sql()}', self.where.params).fetchone()
+            self._summary = row[0], dict(zip((DAY, 10**9, 10**6, 10**3), map(bool, row[1:])))
+        return self._summary
+
+    def __len__(self):
+        return self._summarize()[0]
+
+    def timestamp_unit(self):
+        inexact = self._summarize()[1]
+        return timestamp_unit(lambda ns: inexact[ns])
+
+    def frames(self):
+        # Dated rows in time order, then the undated ones, as in the frame;
+        # a connection of its own, as the response is iterated from
+        # whichever thread serves the next chunk
+        conn = connect(self.backend.path)
+        try:
+            for part, order in (('ts IS NOT NULL', 'ts, insertion_id, seq'),
+                                ('ts IS NULL', 'insertion_id, seq')):
+                cursor = conn.execute(f'SELECT {self._fields} FROM events WHERE {self.where.sql()} '
+                                      f'AND {part} ORDER BY {order}', self.where.params)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_CHUNK)
+                    if not rows:
+                        break
+                    yield events_frame(rows, self.columns[:-1])
+        finally:
+            conn.close()
+
+
+class SQLiteView:
+    """Queries over the ingested SQLite tables; see backends.py for the methods."""
+
+    def __init__(self, backend, info):
+        self.backend = backend
+        self.version = info['version']
+        self.state = FileState(**info['state'])
+        self.offset = info['offset']
+        self.columns = info['columns']
+        self.rows = info['rows']
+        self.cursor = IngestCursor(self.offset, base64.b64decode(info['marker']), info['ends_with_newline'],
+                                   tuple(self.columns))
+        self.load_seconds = info['load_seconds']
+        self.loaded_at = info['loaded_at']
+        self._counts = Counts()
+
+    def __len__(self):
+        return self.rows
+
+    def _query(self, sql, params=()):
+        return self.backend.connection().execute(sql, params).fetchall()
+
+    def _count(self, key, table, where):
+        return self._counts.get(key, lambda: self._query(f'SELECT count(*) FROM {table} WHERE {where.sql()}',
+                                                         where.params)[0][0])
+
+    def _page(self, table, fields, time, where, page, page_size, cursor, include_total, count_key,
+              dated_only=False):
+        """
+        One newest-first page: (rows, total, next_cursor).
+
+        Rows with a time come first, newest first, then the undated ones in
+        reverse row order, as pagination.NewestFirst orders the frame. The
+        last two fields of each row are the cursor's (time, insertion_id).
+        """
+        order = f'{time} DESC, insertion_id DESC, {"seq" if table == "events" else "entry_seq"} DESC'
+        dated = where.copy().add(f'{time} IS NOT NULL')
+        undated = where.copy().add(f'{time} IS NULL')
+        offset = 0
+        if cursor is not None:
+            ts, insertion_id = decode_cursor(cursor)
+            if ts is None:
+                dated = None
+                undated.add('insertion_id < ?', insertion_id)
+            else:
+                dated.add(f'({time}, insertion_id) < (?, ?)', ts, insertion_id)
+        else:
+            offset = (page - 1) * page_size
+
+        rows = []
+        with timed('filter'):
+            if dated is not None:
+                rows = self._query(f'SELECT {fields} FROM {table} WHERE {dated.sql()} '
+                                   f'ORDER BY {order} LIMIT ? OFFSET ?', dated.params + [page_size, offset])
+            if len(rows) < page_size and not dated_only:
+                if offset and dated is not None:
+                    # Skip over the dated matches first
+                    offset = max(0, offset - self._count(count_key + ('dated',), table, dated))
+                rows += self._query(f'SELECT {fields} FROM {table} WHERE {undated.sql()} '
+                                    f'ORDER BY {order} LIMIT ? OFFSET ?',
+                                    undated.params + [page_size - len(rows), offset])
+            total = self._count(count_key, table, where) if include_total else None
+
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1]) if len(rows) == page_size else None
+        return rows, total, next_cursor
+
+    def sessions_page(self, page, page_size, cursor=None, include_total=True, search=None,
+                      start_date=None, end_date=None, license_prefix=None,
+                      category=None, color=None, gate=None):
+        where = Where()
+        try:
+            if start_date:
+                where.add('entry_ts >= ?', to_utc(start_date).value)
+            if end_date:
+                where.add('entry_ts <= ?', to_utc(end_date).value)
+        except Exception as e:
+            raise ValueError(f"Invalid date format: {e}") from e
+        if search:
+            _search(where, search, SESSION_SEARCH_COLUMNS)
+        if license_prefix:
+            where.add('license_plate >= ? AND license_plate < ?', license_prefix, successor(license_prefix))
+        if category:
+            where.isin('category', category.split(','))
+        if color:
+            where.isin('color', color.split(','))
+        if gate:
+            gates = gate.split(',')
+            where.add(f'(entry_gate IN ({_placeholders(gates)}) OR exit_gate IN ({_placeholders(gates)}))',
+                      *gates, *gates)
+
+        count_key = ('sessions', search, start_date, end_date, license_prefix, category, color, gate)
+        rows, total, next_cursor = self._page('sessions', SESSION_SELECT + ', entry_ts, insertion_id', 'entry_ts',
+                                              where, page, page_size, cursor, include_total, count_key,
+                                              dated_only=True)
+        return sessions_frame(rows), total, next_cursor
+
+    def events_page(self, page, page_size, cursor=None, include_total=True, search=None):
+        where = Where()
+        if search:
+            _search(where, search, EVENT_SEARCH_COLUMNS)
+        fields = ', '.join(map(_quote, self.columns)) + ', ts, ts, insertion_id'
+        rows, total, next_cursor = self._page('events', fields, 'ts', where, page, page_size, cursor,
+                                              include_total, ('events', search))
+        return events_frame(rows, self.columns), total, next_cursor
+
+    def _cells(self, sql, params=()):
+        rows = self._query(sql, params)
+        cells = pd.DataFrame(rows, columns=CELL_KEYS + ['count'])
+        cells['hour'] = cells['hour'].fillna(UNDATED).astype('int64')
+        cells['count'] = cells['count'].astype('int64')
+        return cells
+
+    def _raw_cells(self, lo, hi):
+        """Cells aggregated from the events with lo <= ts < hi (None: unbounded)."""
+        where = Where().add('ts IS NOT NULL')
+        if lo is not None:
+            where.add('ts >= ?', lo)
+        if hi is not None:
+            where.add('ts < ?', hi)
+        return self._cells(f'SELECT ts - ((ts % {HOUR}) + {HOUR}) % {HOUR}, {", ".join(DIMENSIONS)}, count(*) '
+                           f'FROM events WHERE {where.sql()} GROUP BY 1, 2, 3, 4, 5', where.params)
+
+    def range_cells(self, start=None, end=None, end_inclusive=True):
+        """Same cells as Rollup.range_cells(): whole hours from `hourly`, the edges from `events`."""
+        dimensions = ', '.join(DIMENSIONS)
+        if start is None and end is None:
+            return self._cells(f'SELECT hour, {dimensions}, sum(count) FROM hourly GROUP BY 1, 2, 3, 4, 5')
+
+        lo = hi = first = stop = None
+        if start is not None:
+            lo = to_utc(start).value
+            first = -(-lo // HOUR) * HOUR
+        if end is not None:
+            hi = to_utc(end).value + (1 if end_inclusive else 0)
+            stop = hi // HOUR * HOUR
+        if first is not None and stop is not None and first >= stop:
+            return self._raw_cells(lo, hi)
+
+        where = Where().add('hour IS NOT NULL')
+        if first is not None:
+            where.add('hour >= ?', first)
+        if stop is not None:
+            where.add('hour < ?', stop)
+        parts = [self._cells(f'SELECT hour, {dimensions}, sum(count) FROM hourly WHERE {where.sql()} '
+                             f'GROUP BY 1, 2, 3, 4, 5', where.params)]
+        if first is not None:
+            parts.append(self._raw_cells(lo, first))
+        if stop is not None:
+            parts.append(self._raw_cells(stop, hi))
+        return pd.concat(parts, ignore_index=True)
+
+    def empty_cells(self):
+        return self._cells('SELECT NULL, NULL, NULL, NULL, NULL, 0 WHERE 0')
+
+    def _raw_dwell_cells(self, lo, hi):
+        """dwell.py cells of the closed sessions with lo <= entry_ts < hi."""
+        where = Where().add('exit_ts IS NOT NULL').add('entry_ts >= ?', lo).add('entry_ts < ?', hi)
+        return dwell.aggregate(sessions_frame(self._query(
+            f'SELECT {SESSION_SELECT} FROM sessions WHERE {where.sql()}', where.params)))
+
+    def dwell_cells(self, start=None, end=None):
+        """Same cells as DwellRollup.range_cells(): whole hours from `dwell`, the edges from `sessions`."""
+        lo = hi = first = stop = None
+        if start is not None:
+            lo = to_utc(start).value
+            first = -(-lo // HOUR) * HOUR
+        if end is not None:
+            hi = to_utc(end).value + 1
+            stop = hi // HOUR * HOUR
+        if first is not None and stop is not None and first >= stop:
+            return self._raw_dwell_cells(lo, hi)
+
+        where = Where()
+        if first is not None:
+            where.add('hour >= ?', first)
+        if stop is not None:
+            where.add('hour < ?', stop)
+        keys = ', '.join(dwell.CELL_KEYS)
+        rows = self._query(f'SELECT {keys}, sum(count), sum(seconds) FROM dwell WHERE {where.sql()} '
+                           f'GROUP BY 1, 2, 3, 4, 5 HAVING sum(count) != 0', where.params)
+        parts = [pd.DataFrame(rows, columns=dwell.CELL_KEYS + ['count', 'seconds'])]
+        if first is not None:
+            parts.append(self._raw_dwell_cells(lo, first))
+        if stop is not None:
+            parts.append(self._raw_dwell_cells(stop, hi))
+        cells = pd.concat(parts, ignore_index=True)
+        return cells.astype({'hour': 'int64', 'bucket': 'int64', 'count': 'int64', 'seconds': 'float64'})
+
+    def time_span(self):
+        first, last = self._query('SELECT min(ts), max(ts) FROM events')[0]
+        return _timestamp(first), _timestamp(last)
+
+    def recent(self, window):
+        """
+        (events, state, cursor) of the events within window of the newest
+        one, for DatasetManager.replay_recent(); rows of later ingests are
+        left out.
+        """
+        fields = ', '.join(map(_quote, self.columns)) + ', ts'
+        rows = self._query(f'SELECT {fields} FROM events WHERE seq <= ? AND ts >= '
+                           f'(SELECT max(ts) FROM events WHERE seq <= ?) - ? ORDER BY ts, insertion_id, seq',
+                           (self.rows, self.rows, window.value))
+        return categorize(events_frame(rows, self.columns)), self.state, self.cursor
+
+    def minute_counts(self, start=None, end=None):
+        where = Where()
+        where.add('ts IS NOT NULL')
+        if start is not None:
+            where.add('ts >= ?', to_utc(start).value)
+        if end is not None:
+            where.add('ts <= ?', to_utc(end).value)
+        rows = self._query(f'SELECT ts / {MINUTE} * {MINUTE} AS minute, count(*) FROM events '
+                           f'WHERE {where.sql()} GROUP BY minute ORDER BY minute', where.params)
+        return (np.array([minute for minute, _ in rows], dtype=np.int64),
+                np.array([count for _, count in rows], dtype=np.int64))
+
+    def _export_where(self, start_date=None, end_date=None, license_prefix=None, categories=None,
+                      colors=None, gates=None, search=None, zones=None):
+        where = Where()
+        # Same bounds as TimeIndex.bounds(): inclusive end, undated rows only without bounds
+        if start_date:
+            where.add('ts >= ?', to_utc(start_date).value)
+        if end_date:
+            where.add('ts <= ?', to_utc(end_date).value)
+        if license_prefix:
+            _plate_prefixes(where, license_prefix.split(','))
+        for column, values in (('category', categories), ('color', colors), ('gate', gates)):
+            if values:
+                where.isin(column, values.split(','))
+        if zones:
+            where.isin('zone', _zone_values(zones.split(',')))
+        if search:
+            _search(where, search, EVENT_SEARCH_COLUMNS)
+        return where
+
+    def export_selection(self, **filters):
+        return SQLiteSelection(self.backend, self.columns, self._export_where(**filters))
+
+    def export_count(self, **filters):
+        where = self._export_where(**filters)
+        with timed('filter'):
+            return self._query(f'SELECT count(*) FROM events WHERE {where.sql()}', where.params)[0][0]
+
+    def vehicle(self, plate):
+        fields = ', '.join(map(_quote, self.columns)) + ', ts'
+        history = self._query(f'SELECT {fields} FROM events WHERE license_plate = ? '
+                              f'ORDER BY ts IS NULL, ts, insertion_id, seq', (plate,))
+        visits = self._query(f'SELECT {SESSION_SELECT} FROM sessions WHERE license_plate = ? '
+                             f'ORDER BY entry_ts, insertion_id, entry_seq', (plate,))
+        return events_frame(history, self.columns), sessions_frame(visits)
+
+    def distinct(self, column):
+        return [value for value, in self._query('SELECT value FROM dictionary WHERE name = ? ORDER BY value',
+                                                (column,))]
+
+    def today(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        day = int(now.timestamp()) // 86_400 * DAY
+        return self._query('SELECT ifnull(sum(count), 0) FROM hourly WHERE hour >= ? AND hour < ?',
+                           (day, day + DAY))[0][0]
+
+    def _recent(self, mark, now=None):
+        # Whole minutes, as the LiveCounters minute rings count them
+        now = now or datetime.now(pytz.utc)
+        since = int((now - RECENT_WINDOW).timestamp()) // 60 * 60 * 10**9
+        return self._query('SELECT count(*) FROM events WHERE ts >= ? AND instr(gate, ?) > 0',
+                           (since, mark))[0][0]
+
+    def recent_entries(self, now=None):
+        return self._recent(ENTRY_MARK, now)
+
+    def recent_exits(self, now=None):
+        return self._recent(EXIT_MARK, now)
+
+    def summary(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        return {
+            "today_count": self.today(now),
+            "recent_entries": self.recent_entries(now),
+            "recent_exits": self.recent_exits(now),
+        }
+
+
+class SQLiteBackend:
+    """The CSV ingested into an SQLite file, kept up to date as it grows."""
+
+    def __init__(self, csv_path, path=None):
+        self.csv_path = csv_path
+        self.path = path or SQLITE_PATH or csv_path + '.sqlite'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._view = None
+
+    def connection(self):
+        """This thread's connection to the database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def current(self):
+        """The latest view, ingesting first if the CSV changed."""
+        view = self._view
+        if view is not None and caught_up(view.state, view.offset, FileState.of(self.csv_path)):
+            return view
+        return self.refresh()
+
+    def latest(self):
+        return self._view
+
+    def refresh(self):
+        with self._lock:
+            state = FileState.of(self.csv_path)
+            view = self._view
+            if view is not None and caught_up(view.state, view.offset, state):
+                return view
+            try:
+                info = self._ingest(self.connection(), state)
+            except Exception:
+                logger.exception("Error ingesting %s into %s", self.csv_path, self.path)
+                if view is None:
+                    raise
+                return view
+            self._view = SQLiteView(self, info)
+            return self._view
+
+    # Ingest
+
+    def _read_info(self, conn):
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            return None
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ingest'").fetchone():
+            return None
+        row = conn.execute('SELECT info FROM ingest').fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _is_append(self, info, state):
+        return grew_past(self.csv_path, FileState(**info['state']), state, info['offset'],
+                         base64.b64decode(info['marker']), info['ends_with_newline'])
+
+    def _ingest(self, conn, state):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            info = self._read_info(conn)
+            if info is not None and caught_up(FileState(**info['state']), info['offset'], state):
+                # Another worker ingested it while we waited for the write lock
+                conn.execute('ROLLBACK')
+                return info
+            started = time.perf_counter()
+            version = info['version'] + 1 if info is not None else 1
+            if info is None or not self._is_append(info, state):
+                info = None
+            info = self._load(conn, info, version, started)
+            conn.execute('INSERT OR REPLACE INTO ingest (id, info) VALUES (0, ?)', (json.dumps(info),))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('PRAGMA optimize')
+        return info
+
+    def _create(self, conn, columns):
+        # Statement by statement: executescript() would commit the transaction
+        for table in TABLES:
+            conn.execute(f'DROP TABLE IF EXISTS {table}')
+        for statement in SCHEMA.format(columns=', '.join(map(_quote, columns))).split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _load(self, conn, info, version, started):
+        """Ingest the CSV from info's offset (None: from scratch); return the new info."""
+        with open(self.csv_path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if info is None:
+                header = f.readline()
+                columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+                self._create(conn, columns)
+                offset, recent, rows = len(header), header, 0
+                ends_with_newline = header.endswith(b'\n')
+            else:
+                columns = info['columns']
+                offset, recent, rows = info['offset'], base64.b64decode(info['marker']), info['rows']
+                ends_with_newline = info['ends_with_newline']
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS repair (entry_seq INTEGER PRIMARY KEY)')
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS batch (value TEXT PRIMARY KEY)')
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS hours (hour UNIQUE)')
+            last_seq = conn.execute('SELECT ifnull(max(seq), 0) FROM events').fetchone()[0]
+            marks = {table: conn.execute(f'SELECT ifnull(max(rowid), 0) FROM {table}').fetchone()[0]
+                     for table in ('hourly', 'dwell')}
+
+            # Whole lines INGEST_BLOCK bytes at a time, up to the size seen by fstat
+            state = FileState.from_stat(st)
+            for part in csv_blocks(f, offset, st.st_size, INGEST_BLOCK, complete=settled(state)):
+                if part.strip():
+                    with timed('csv_load'):
+                        events = parse_events(io.BytesIO(part), names=columns)
+                    if len(events):
+                        self._insert(conn, columns, events)
+                        rows += len(events)
+                offset += len(part)
+                recent = (recent + part)[-MARKER_SIZE:]
+                ends_with_newline = part.endswith(b'\n')
+
+            with timed('session_merge'):
+                self._pair_sessions(conn, last_seq, full=info is None)
+            self._compact(conn, 'hourly', ['hour'] + DIMENSIONS, ['count'], marks['hourly'])
+            self._compact(conn, 'dwell', dwell.CELL_KEYS, ['count', 'seconds'], marks['dwell'])
+
+        return {
+            'version': version,
+            'state': dataclasses.asdict(state),
+            'offset': offset,
+            'marker': base64.b64encode(recent[-MARKER_SIZE:]).decode(),
+            'ends_with_newline': ends_with_newline,
+            'columns': columns,
+            'rows': rows,
+            'load_seconds': time.perf_counter() - started,
+            'loaded_at': time.time(),
+        }
+
+    def _insert(self, conn, columns, events):
+        """Insert parsed events and their hourly cells, dictionary and search values."""
+        stamps = events['datetime_utc']
+        dated = stamps.notna().to_numpy()
+        gates = events['gate'].astype(object)
+        entry = gates.str.endswith('_in', na=False).to_numpy(dtype=bool) & dated
+        exit_ = gates.str.endswith('_out', na=False).to_numpy(dtype=bool) & dated
+        direction = np.where(entry, 1, np.where(exit_, 2, 0)).tolist()
+        ts = np.where(dated, stamps.array.asi8, 0).tolist()
+        ts = [t if ok else None for t, ok in zip(ts, dated.tolist())]
+
+        fields = ', '.join(map(_quote, columns))
+        values = [column_values(events[column]) for column in columns]
+        conn.executemany(f'INSERT INTO events ({fields}, ts, direction) '
+                         f'VALUES ({_placeholders(columns)}, ?, ?)', zip(*values, ts, direction))
+
+        cells = aggregate(events)
+        hours = [None if hour == UNDATED else hour for hour in cells['hour'].tolist()]
+        conn.executemany(f'INSERT INTO hourly (hour, {", ".join(DIMENSIONS)}, count) VALUES (?, ?, ?, ?, ?, ?)',
+                         zip(hours, *(column_values(cells[d]) for d in DIMENSIONS), cells['count'].tolist()))
+
+        for column in DICTIONARY_COLUMNS:
+            distinct = events[column].dropna().unique()
+            conn.executemany('INSERT OR IGNORE INTO dictionary (name, value) VALUES (?, ?)',
+                             ((column, value) for value in column_values(pd.Series(distinct))))
+
+        conn.execute('DELETE FROM temp.batch')
+        for column in EVENT_SEARCH_COLUMNS:
+            distinct = search_values(events, column).dropna().astype(str).unique().tolist()
+            conn.executemany('INSERT OR IGNORE INTO temp.batch (value) VALUES (?)', ((v,) for v in distinct))
+        conn.execute('INSERT INTO vocabulary (value) SELECT value FROM temp.batch '
+                     'WHERE value NOT IN (SELECT value FROM searchable)')
+        conn.execute('INSERT OR IGNORE INTO searchable (value) SELECT value FROM temp.batch')
+
+    def _compact(self, conn, table, keys, sums, mark):
+        """Merge the rows of the hours that got rows after rowid mark into one row per cell."""
+        conn.execute('DELETE FROM temp.hours')
+        conn.execute(f'INSERT OR IGNORE INTO temp.hours SELECT DISTINCT hour FROM {table} WHERE rowid > ?', (mark,))
+        # IS, so the undated (NULL) hour is matched too
+        touched = f'EXISTS (SELECT 1 FROM temp.hours AS h WHERE h.hour IS {table}.hour)'
+        columns = ', '.join(keys + sums)
+        rows = conn.execute(f'SELECT {", ".join(keys)}, {", ".join(f"sum({s})" for s in sums)} FROM {table} '
+                            f'WHERE {touched} GROUP BY {", ".join(keys)} HAVING sum(count) != 0').fetchall()
+        conn.execute(f'DELETE FROM {table} WHERE {touched}')
+        conn.executemany(f'INSERT INTO {table} ({columns}) VALUES ({_placeholders(keys + sums)})', rows)
+
+    def _pair_sessions(self, conn, last_seq, full):
+        """
+        Add the entries after last_seq to `sessions` and (re)pair the affected ones.
+
+        Same pairing and the same affected sessions as SessionTable.extend():
+        an entry takes the first exit of its plate at or after it, within
+        MATCH_TOLERANCE, so besides the new entries a new exit only changes
+        the entries of its plate since the plate's previous exit that were
+        not closed before it.
+        """
+        conn.execute('INSERT INTO sessions (entry_seq, insertion_id, license_plate, category, color, '
+                     'entry_ts, entry_gate, zone, description) '
+                     'SELECT seq, insertion_id, license_plate, category, color, ts, gate, zone, description '
+                     'FROM events WHERE seq > ? AND direction = 1', (last_seq,))
+        tolerance = MATCH_TOLERANCE.value
+        if full:
+            scope, params = '1', []
+        else:
+            conn.execute('DELETE FROM temp.repair')
+            conn.execute('INSERT INTO temp.repair SELECT seq FROM events WHERE seq > ? AND direction = 1',
+                         (last_seq,))
+            conn.execute('INSERT OR IGNORE INTO temp.repair SELECT s.entry_seq FROM events AS x '
+                         'JOIN sessions AS s ON s.license_plate = x.license_plate '
+                         'AND s.entry_ts BETWEEN x.ts - ? AND x.ts '
+                         'AND s.entry_ts > ifnull((SELECT max(y.ts) FROM events AS y WHERE y.direction = 2 '
+                         'AND y.license_plate = x.license_plate AND y.ts < x.ts), -1 << 63) '
+                         'WHERE x.seq > ? AND x.direction = 2 AND (s.exit_ts IS NULL OR s.exit_ts >= x.ts)',
+                         (tolerance, last_seq))
+            if not conn.execute('SELECT 1 FROM temp.repair LIMIT 1').fetchone():
+                return
+            scope, params = 'sessions.entry_seq IN (SELECT entry_seq FROM temp.repair)', []
+            # Take the old pairing of the sessions about to be re-paired out of `dwell`
+            self._add_dwell(conn, scope, params, -1)
+
+        conn.execute(f'UPDATE sessions SET exit_seq = ('
+                     f'SELECT x.seq FROM events AS x WHERE x.direction = 2 '
+                     f'AND x.license_plate = sessions.license_plate '
+                     f'AND x.ts >= sessions.entry_ts AND x.ts <= sessions.entry_ts + ? '
+                     f'ORDER BY x.ts, x.insertion_id, x.seq LIMIT 1) WHERE {scope}', [tolerance] + params)
+        conn.execute(f'UPDATE sessions SET exit_ts = x.ts, exit_gate = x.gate, insertion_id_exit = x.insertion_id '
+                     f'FROM events AS x WHERE x.seq = sessions.exit_seq AND {scope}', params)
+        conn.execute(f"UPDATE sessions SET exit_ts = NULL, exit_gate = '', insertion_id_exit = -1 "
+                     f"WHERE sessions.exit_seq IS NULL AND {scope}", params)
+        self._add_dwell(conn, scope, params, 1)
+
+    def _add_dwell(self, conn, scope, params, sign):
+        """Append the dwell cells of the closed sessions in scope, times sign."""
+        cursor = conn.execute(f'SELECT {SESSION_SELECT} FROM sessions '
+                              f'WHERE sessions.exit_ts IS NOT NULL AND {scope}', params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK)
+            if not rows:
+                break
+            cells = dwell.aggregate(sessions_frame(rows))
+            conn.executemany(f'INSERT INTO dwell ({", ".join(dwell.CELL_KEYS)}, count, seconds) '
+                             f'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             zip(cells['hour'].tolist(), *(column_values(cells[d]) for d in dwell.DIMENSIONS),
+                                 cells['bucket'].tolist(), (sign * cells['count']).tolist(),
+                                 (sign * cells['seconds']).tolist()))
@@ -28,6 +28,9 @@ import {
 } from '@mui/material';
 import { styled } from '@mui/system';
 
+// Points of the trend line requested from /stats/enhanced-stats
+const TREND_POINTS = 300;
+
 const DashboardContainer = styled(Box)(({ theme }) => ({
   padding: theme.spacing(4),
   backgroundColor: '#f5f6fa',
@@ -79,6 +82,9 @@ const AnalyticsDashboard = () => {
         time_range: timeRange === 'custom' ? 'custom' : timeRange,
         start_date: timeRange === 'custom' ? dateRange.startDate.toISOString() : undefined,
         end_date: timeRange === 'custom' ? dateRange.endDate.toISOString() : undefined,
+        // The server picks the bucket size and keeps the peaks
+        points: TREND_POINTS,
+        downsample: 'lttb',
       };
       
       const response = await axios.get('http://localhost:8000/stats/enhanced-stats', { params });
@@ -171,8 +177,8 @@ const AnalyticsDashboard = () => {
               <Typography variant="h6" gutterBottom>Hourly Trend</Typography>
               <ResponsiveContainer width="100%" height={300}>
                 <LineChart
-                  data={Object.entries(stats.hourly_trend || {}).map(
-                    ([hour, count]) => ({ hour, count })
+                  data={(stats.trend?.timestamps || []).map(
+                    (ms, i) => ({ hour: new Date(ms).toISOString(), count: stats.trend.counts[i] })
                   )}
                 >
                   <CartesianGrid strokeDasharray="3 3" />
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react'
+import React, { useEffect, useRef, useState } from 'react'
 import '../Styles/Dashboard.css';
 import { parkingService } from '../Serivces/Data';
 import Card  from '../Components/Cards';
@@ -98,13 +98,11 @@ function Dashboard() {
     useEffect(() => {
       const fetchStatistics = async () => {
         try {
-          const todayRes = await parkingService.getTodayCount();
-          const entriesRes = await parkingService.getRecentEntries();
-          const exitsRes = await parkingService.getRecentExits();
+          const summary = await parkingService.getSummary();
           
-          setTodayCount(todayRes.count);
-          setEnteredCount(entriesRes.count);
-          setExitedCount(exitsRes.count);
+          setTodayCount(summary.today_count);
+          setEnteredCount(summary.recent_entries);
+          setExitedCount(summary.recent_exits);
         } catch (error) {
           console.error('Error fetching statistics:', error);
         }
@@ -113,6 +111,36 @@ function Dashboard() {
       fetchStatistics();
     }, []);
 
+    // The live handlers read the current page and search through refs, so
+    // the stream is opened once instead of on every page change
+    const pageRef = useRef(currentPage);
+    const searchRef = useRef(searchTerm);
+    pageRef.current = currentPage;
+    searchRef.current = searchTerm;
+
+    // Counters and new events are pushed by the server instead of polled
+    useEffect(() => {
+      const applySummary = (summary) => {
+        setTodayCount(summary.today_count);
+        setEnteredCount(summary.recent_entries);
+        setExitedCount(summary.recent_exits);
+      };
+      const applyState = (state) => applySummary(state.summary);
+
+      return parkingService.subscribeLive({
+        state: applyState,
+        resync: applyState,
+        reset: (state) => {
+          applyState(state);
+          fetchData(pageRef.current, searchRef.current);
+        },
+        delta: (delta) => {
+          if (delta.summary) applySummary(delta.summary);
+          if (delta.new_event_count && pageRef.current === 1) fetchData(1, searchRef.current);
+        },
+      });
+    }, []);
+
 
     const formatTime = (timestamp) => {
       const date = new Date(timestamp);
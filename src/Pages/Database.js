@@ -1,5 +1,5 @@
 import React from "react";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import "../Styles/Database.css";
 import DateTime from "../Serivces/DateTime";
 import { parkingService } from "../Serivces/Data";
@@ -41,6 +41,11 @@ function Database() {
   const [categories, setCategories] = useState([]);
   const [colors, setColors] = useState([]);
   const [gates, setGates] = useState([]);
+
+  // next_cursor of each page already seen, keyed by the page it leads to,
+  // so stepping forward is a keyset lookup instead of an offset query
+  const pageCursors = useRef({});
+
   const fetchData = async () => {
     setIsLoading(true);
     try {
@@ -53,16 +58,31 @@ function Database() {
         licensePrefix,
         categoryFilter.join(","),
         colorFilter.join(","),
-        gateFilter.join(",")
+        gateFilter.join(","),
+        pageCursors.current[currentPage]
       );
       setData(result.data);
-      setTotalPages(result.total_pages);
+      if (result.total_pages !== null) setTotalPages(result.total_pages);
+      if (result.next_cursor) pageCursors.current[currentPage + 1] = result.next_cursor;
     } catch (error) {
       console.error("Error fetching data:", error);
     }
     setIsLoading(false);
   };
 
+  useEffect(() => {
+    pageCursors.current = {};
+  }, [
+    itemsPerPage,
+    searchTerm,
+    startDate,
+    endDate,
+    licensePrefix,
+    categoryFilter,
+    colorFilter,
+    gateFilter,
+  ]);
+
   useEffect(() => {
     fetchData();
   }, [
@@ -18,12 +18,8 @@ const Export = () => {
     setIsLoading(true);
     setError(null);
     try {
-      const response = await axios.get('http://localhost:8000/data', {
-        params: {
-          ...convertFiltersToParams(filterOptions),
-          page: 1,
-          page_size: 10
-        }
+      const response = await axios.get('http://localhost:8000/export/count', {
+        params: convertFiltersToParams(filterOptions)
       });
   
       setRecordCount(response.data.total_records || 0);
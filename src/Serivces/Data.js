@@ -13,7 +13,8 @@ class ParkingService {
     licensePrefix = "",
     categoryFilter = "",
     colorFilter = "",
-    gateFilter = ""
+    gateFilter = "",
+    cursor = null
   ) {
     try {
       const queryParams = new URLSearchParams({
@@ -26,6 +27,8 @@ class ParkingService {
         ...(categoryFilter && { category: categoryFilter }),
         ...(colorFilter && { color: colorFilter }),
         ...(gateFilter && { gate: gateFilter }),
+        // With a cursor the server seeks straight to the page and can skip the count
+        ...(cursor && { cursor: cursor, include_total: false }),
       });
 
       const response = await fetch(`${BASE_URL}/data?${queryParams}`);
@@ -118,6 +121,30 @@ class ParkingService {
     }
   }
 
+  // Today's count plus the last ten minutes' entries and exits in one request
+  async getSummary() {
+    try {
+      const response = await fetch(`${BASE_URL}/stats/summary`);
+      if (!response.ok)
+        throw new Error(`HTTP error! status: ${response.status}`);
+      return await response.json();
+    } catch (error) {
+      console.error("Error fetching summary:", error);
+      throw error;
+    }
+  }
+
+  // Subscribe to server-pushed updates; returns a function that closes the stream
+  subscribeLive(handlers) {
+    const source = new EventSource(`${BASE_URL}/live`);
+    ["state", "resync", "reset", "delta"].forEach((type) => {
+      if (handlers[type])
+        source.addEventListener(type, (event) => handlers[type](JSON.parse(event.data)));
+    });
+    source.onerror = (error) => console.error("Live updates error:", error);
+    return () => source.close();
+  }
+
   async getRecentExits() {
     try {
       const response = await fetch(`${BASE_URL}/stats/recent-exits`);
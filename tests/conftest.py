@@ -0,0 +1,100 @@
+"""
+Shared fixtures: small synthetic exports (bench.generate) and the three
+storage backends over them.
+
+Every test gets its own copy of the CSV in tmp_path, and the backends keep
+their derived files (snapshots, SQLite database, partitions) there too.
+
+The app itself (endpoint1) reads PARKING_CSV when it is imported, so it is
+pointed at an export in a directory of its own before anything else is;
+the `client` fixture writes that export.
+"""
+import os
+import tempfile
+
+os.environ['PARKING_CSV'] = os.path.join(tempfile.mkdtemp(prefix='parking-tests-'), 'parking_export.csv')
+
+import numpy as np
+import pytest
+
+from backends import PandasBackend
+from bench.generate import generate
+from dataset import DatasetManager
+from partitions import PartitionedBackend
+from sqlite_backend import SQLiteBackend
+
+BACKENDS = ['pandas', 'sqlite', 'partitioned']
+
+
+def row(insertion_id, timestamp, plate='-', category='car', gate='ganajan_car_in', zone=50,
+        description='ZONE 2 - Table'):
+    """One CSV line in the export's format, without its newline."""
+    return f"{insertion_id},{plate},{category},white,{timestamp},{gate},{zone},{description}"
+
+
+def append(path, text):
+    with open(path, 'a', newline='') as f:
+        f.write(text)
+
+
+def settle(path, seconds=60):
+    """Move path's mtime into the past, so its unterminated last line is read."""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 10**9))
+
+
+def replay(path, chunks, refresh):
+    """Write path back chunk by chunk, calling refresh() after each one."""
+    with open(path) as f:
+        header, *lines = f.readlines()
+    # Some old rows again at the end, as a late export would send them
+    lines += lines[:400:7]
+    with open(path, 'w') as f:
+        f.write(header)
+    refresh()
+    for part in np.array_split(np.arange(len(lines)), chunks):
+        append(path, ''.join(lines[i] for i in part))
+        refresh()
+
+
+def published(manager):
+    """manager.current(), once the version it may be publishing is written."""
+    snapshot = manager.current()
+    thread = manager._persist_thread
+    if thread is not None:
+        thread.join()
+    return snapshot
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / 'parking_export.csv')
+    generate(3000, path, seed=7, days=4)
+    return path
+
+
+def open_backend(name, csv_path, persist=False):
+    directory = os.path.dirname(csv_path)
+    if name == 'pandas':
+        return PandasBackend(DatasetManager(csv_path, persist=persist))
+    if name == 'sqlite':
+        return SQLiteBackend(csv_path, os.path.join(directory, 'events.sqlite'))
+    if name == 'partitioned':
+        return PartitionedBackend(csv_path, os.path.join(directory, 'events.partitions'))
+    raise ValueError(name)
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, csv_path):
+    return open_backend(request.param, csv_path)
+
+
+@pytest.fixture(scope='session')
+def client():
+    """A TestClient of the app, over an export of its own."""
+    from fastapi.testclient import TestClient
+
+    generate(3000, os.environ['PARKING_CSV'], seed=11, days=4)
+    settle(os.environ['PARKING_CSV'])
+    import endpoint1
+    return TestClient(endpoint1.app)
@@ -0,0 +1,97 @@
+"""The HTTP endpoints over the app's own export (see the client fixture)."""
+import os
+
+import pytest
+
+from conftest import append, row, settle
+
+
+def test_category_stats(client):
+    response = client.get('/stats/category-stats', params={'start_date': '2025-01-01', 'end_date': '2025-01-04'})
+    assert response.status_code == 200
+    total = client.get('/export/count').json()['total_records']
+    assert sum(response.json()['category_counts'].values()) == total
+
+
+def test_category_stats_rejects_bad_dates(client):
+    response = client.get('/stats/category-stats', params={'start_date': 'bad'})
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('Date filtering failed')
+
+
+@pytest.mark.parametrize('path', ['/stats/enhanced-stats', '/stats/dwell-time'])
+def test_custom_ranges_reject_bad_dates(client, path):
+    response = client.get(path, params={'time_range': 'custom', 'start_date': 'bad'})
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith('Invalid date')
+
+
+def _samples(client):
+    """The /metrics samples, by name and labels."""
+    response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith('#'):
+            key, value = line.rsplit(' ', 1)
+            samples[key] = float(value)
+    return response.text, samples
+
+
+def test_metrics_count_requests_by_route_template(client):
+    labels = 'endpoint="/data",method="GET",status="200"'
+    _, before = _samples(client)
+    client.get('/data', params={'page_size': 5})
+    client.get('/vehicles/ZZ99NOPLATE')
+    text, after = _samples(client)
+
+    assert '# TYPE parking_request_seconds histogram' in text
+    assert after[f'parking_request_seconds_count{{{labels}}}'] == before.get(
+        f'parking_request_seconds_count{{{labels}}}', 0) + 1
+    buckets = [value for key, value in after.items()
+               if key.startswith(f'parking_request_seconds_bucket{{{labels},le=')]
+    # Cumulative, ending with +Inf == count
+    assert buckets == sorted(buckets)
+    assert after[f'parking_request_seconds_bucket{{{labels},le="+Inf"}}'] == after[
+        f'parking_request_seconds_count{{{labels}}}']
+    # Paths are labelled with their route, not the raw URL
+    assert 'parking_request_seconds_count{endpoint="/vehicles/{plate}",method="GET",status="404"}' in after
+    assert not any('ZZ99NOPLATE' in key for key in after)
+
+
+def test_etag_round_trip(client):
+    first = client.get('/filters/categories')
+    assert first.status_code == 200
+    tag = first.headers['etag']
+    assert first.headers['cache-control'] == 'no-cache'
+
+    repeat = client.get('/filters/categories', headers={'If-None-Match': tag})
+    assert repeat.status_code == 304
+    assert repeat.content == b''
+    assert repeat.headers['etag'] == tag
+    assert client.get('/filters/categories', headers={'If-None-Match': f'"other", W/{tag}'}).status_code == 304
+
+    # Other parameters are another question
+    other = client.get('/stats/category-stats', headers={'If-None-Match': tag})
+    assert other.status_code == 200 and other.headers['etag'] != tag
+
+
+def test_last_modified_round_trip(client):
+    first = client.get('/stats/category-stats')
+    since = first.headers['last-modified']
+    response = client.get('/stats/category-stats', headers={'If-Modified-Since': since})
+    assert response.status_code == 304
+    # If-None-Match wins over If-Modified-Since
+    response = client.get('/stats/category-stats', headers={'If-Modified-Since': since, 'If-None-Match': '"x"'})
+    assert response.status_code == 200
+
+
+def test_appends_change_the_etag(client):
+    first = client.get('/filters/categories')
+    path = os.environ['PARKING_CSV']
+    append(path, row(9000000, '2025-01-05 00:00:00.00+00', category='zzz-new') + '\n')
+    settle(path)
+    response = client.get('/filters/categories', headers={'If-None-Match': first.headers['etag']})
+    assert response.status_code == 200
+    assert 'zzz-new' in response.json()['categories']
+    assert response.headers['etag'] != first.headers['etag']
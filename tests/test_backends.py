@@ -0,0 +1,58 @@
+"""Every backend answers the same questions with the same data."""
+import os
+
+import numpy as np
+
+import dwell
+import rollup
+from conftest import append, open_backend, replay, row
+from rollup import DIMENSIONS
+from sqlite_backend import SQLiteBackend
+
+
+def test_loads_every_row(backend):
+    view = backend.current()
+    assert len(view) == 3000
+    assert backend.current() is view
+
+
+def test_events_page_matches_pandas(csv_path, backend):
+    expected, expected_total, _ = open_backend('pandas', csv_path).current().events_page(1, 50)
+    rows, total, _ = backend.current().events_page(1, 50)
+    assert total == expected_total
+    assert rows['insertion_id'].tolist() == expected['insertion_id'].tolist()
+
+
+def test_distinct_values_after_appends(csv_path, backend):
+    backend.current()
+    append(csv_path, row(5000000, '2025-01-05 00:00:00.00+00', category='aaa', gate='aaa_in') + '\n'
+           + row(5000001, '2025-01-05 00:01:00.00+00', category='zzz', gate='aaa_out') + '\n')
+    view = backend.current()
+    expected = open_backend('pandas', csv_path).current()
+    for column in ['category', 'gate', 'color']:
+        values = view.distinct(column)
+        assert values == sorted(values)
+        assert values == expected.distinct(column)
+
+
+def _sorted_cells(cells, keys):
+    return cells.astype({k: str for k in keys}).sort_values(keys).reset_index(drop=True)
+
+
+def test_sqlite_cells_stay_compact(csv_path):
+    store = open_backend('sqlite', csv_path)
+    replay(csv_path, 20, store.current)
+    view = store.current()
+    conn = store.connection()
+    for table, keys in [('hourly', ['hour'] + DIMENSIONS), ('dwell', dwell.CELL_KEYS)]:
+        rows, cells, empty = conn.execute(
+            f'SELECT count(*), (SELECT count(*) FROM (SELECT DISTINCT {", ".join(keys)} FROM {table})), '
+            f'(SELECT count(*) FROM {table} WHERE count = 0) FROM {table}').fetchone()
+        assert rows == cells and not empty
+
+    # The same cells as ingesting the whole file at once
+    fresh = SQLiteBackend(csv_path, os.path.join(os.path.dirname(csv_path), 'fresh.sqlite')).current()
+    for cells, keys in [(lambda v: v.range_cells(), rollup.CELL_KEYS), (lambda v: v.dwell_cells(), dwell.CELL_KEYS)]:
+        got, expected = _sorted_cells(cells(view), keys), _sorted_cells(cells(fresh), keys)
+        assert got[keys].equals(expected[keys])
+        assert np.allclose(got.drop(columns=keys).astype(float), expected.drop(columns=keys).astype(float))
@@ -0,0 +1,59 @@
+"""The filter bitmaps agree with the filters run over the rows."""
+import numpy as np
+import pytest
+
+import bitmap_index
+from bitmap_index import BitmapIndex, selections
+from conftest import append, row
+from dataset import DatasetManager
+
+FILTERS = [
+    {'category': 'car'},
+    {'category': 'bus,heavy', 'zone': '50'},
+    {'license_prefix': 'MH,KA', 'gate': 'ganajan_car_in,ganajan_car_out'},
+    {'license_prefix': '-', 'color': 'white'},
+    {'category': 'nothing-like-this'},
+]
+
+
+def _expected(events, filters):
+    mask = np.ones(len(events), dtype=bool)
+    for name, value in filters.items():
+        column, key = bitmap_index.FILTERS[name]
+        mask &= events[column].map(key).isin(value.split(',')).to_numpy(dtype=bool)
+    return np.flatnonzero(mask)
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Many blocks, each with values common enough for bitmaps and rare ones for offsets
+    monkeypatch.setattr(bitmap_index, 'BLOCK_ROWS', 256)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_rows_and_counts(csv_path, small_blocks, filters):
+    snapshot = DatasetManager(csv_path, persist=False).current()
+    events = snapshot.events
+    index = BitmapIndex.from_snapshot(snapshot)
+    kinds = {c.dtype.name for block in index.blocks for containers in block.values() for c in containers.values()}
+    assert kinds == {'uint8', 'uint16'}
+
+    expected = _expected(events, filters)
+    selected = selections(**filters)
+    for lo, hi in [(0, len(events)), (0, 256), (100, 1000), (257, 2999), (512, 768)]:
+        inside = expected[(expected >= lo) & (expected < hi)]
+        assert index.rows(lo, hi, selected).tolist() == inside.tolist()
+        assert index.count(lo, hi, selected) == len(inside)
+
+
+def test_appends_rebuild_the_last_blocks(csv_path, small_blocks):
+    manager = DatasetManager(csv_path, persist=False)
+    index = BitmapIndex.from_snapshot(manager.current())
+    append(csv_path, ''.join(row(5000000 + i, f'2025-01-05 00:0{i}:00.00+00', plate=f'ZZ{i}') + '\n'
+                             for i in range(5)))
+    snapshot = manager.current()
+    advanced = index.advance(snapshot)
+    assert all(new is old for new, old in zip(advanced.blocks, index.blocks[:-1]))
+    selected = selections(license_prefix='ZZ')
+    assert advanced.count(0, len(snapshot), selected) == 5
+    assert advanced.rows(0, len(snapshot), selected).tolist() == list(range(len(snapshot) - 5, len(snapshot)))
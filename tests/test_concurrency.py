@@ -0,0 +1,85 @@
+"""Identical concurrent requests share one computation in the pool."""
+import asyncio
+import threading
+
+import pytest
+
+from concurrency import SingleFlight, run_blocking
+
+
+class Computation:
+    """Blocks in the pool until released, counting how often it ran."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.result, self.error = result, error
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def _waiters(flights, key, computation, count=5):
+    tasks = [asyncio.ensure_future(flights.run(key, computation)) for _ in range(count)]
+    await run_blocking(computation.started.wait, 5)
+    # Late arrivals join the running computation too
+    tasks.append(asyncio.ensure_future(flights.run(key, computation)))
+    await asyncio.sleep(0)
+    computation.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_identical_requests_share_one_computation():
+    async def scenario():
+        flights = SingleFlight()
+        shared = Computation(result=['rows'])
+        other = Computation(result=['other'])
+        other.release.set()
+        results, other_result = await asyncio.gather(_waiters(flights, ('data', 1), shared),
+                                                     flights.run(('data', 2), other))
+        return flights, shared, results, other_result
+
+    flights, shared, results, other_result = asyncio.run(scenario())
+    assert shared.calls == 1
+    assert all(result is shared.result for result in results)
+    assert other_result == ['other']
+    assert len(flights) == 0
+
+
+def test_an_error_reaches_every_waiter_and_is_not_kept():
+    async def scenario():
+        flights = SingleFlight()
+        failing = Computation(error=ValueError('bad date'))
+        results = await _waiters(flights, 'key', failing)
+        await asyncio.sleep(0)
+        retry = Computation(result='ok')
+        retry.release.set()
+        return flights, failing, results, await flights.run('key', retry)
+
+    flights, failing, results, retried = asyncio.run(scenario())
+    assert failing.calls == 1
+    assert len(results) == 6 and all(isinstance(r, ValueError) for r in results)
+    assert retried == 'ok'
+    assert len(flights) == 0
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_others():
+    async def scenario():
+        flights = SingleFlight()
+        computation = Computation(result=1)
+        first = asyncio.ensure_future(flights.run('key', computation))
+        second = asyncio.ensure_future(flights.run('key', computation))
+        await run_blocking(computation.started.wait, 5)
+        first.cancel()
+        computation.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == 1
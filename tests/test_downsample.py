@@ -0,0 +1,88 @@
+"""Bounded trend series: bucket levels, sums, minmax and LTTB picks."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import open_backend
+from downsample import HOUR, MINUTE, WEEK, level, lttb, minmax, trend
+from rollup import hourly_counts
+
+T0 = pd.Timestamp('2025-01-06', tz='UTC').value  # a Monday
+
+
+@pytest.mark.parametrize('span, points, expected', [
+    (30 * MINUTE, 50, ('minute', 1)),
+    (50 * MINUTE - 1, 50, ('minute', 1)),
+    (50 * MINUTE, 50, ('hour', 1)),
+    (49 * HOUR, 50, ('hour', 1)),
+    (50 * HOUR, 50, ('day', 1)),
+    (49 * 7 * 24 * HOUR, 50, ('week', 1)),
+    (400 * 7 * 24 * HOUR, 50, ('week', 9)),
+])
+def test_level_is_the_finest_that_fits(span, points, expected):
+    name, width, origin, interval = level(T0, T0 + span, points)
+    assert (name, interval) == expected
+    assert (T0 + span - origin) // (width * interval) - (T0 - origin) // (width * interval) + 1 <= points
+
+
+@pytest.fixture
+def view(csv_path):
+    return open_backend('pandas', csv_path).current()
+
+
+def _trend(view, points, method, start=None, end=None):
+    """(cells, trend) of a range, the whole span by default, as /stats/enhanced-stats builds them."""
+    if start is None:
+        start, end = view.time_span()
+    else:
+        start, end = pd.Timestamp(start, tz='UTC'), pd.Timestamp(end, tz='UTC')
+    cells = view.range_cells(start, end)
+    return cells, trend(cells, points, method, lambda: view.minute_counts(start, end), start, end)
+
+
+@pytest.mark.parametrize('points', [3, 5, 10, 50, 500])
+def test_sum_keeps_the_total(view, points):
+    cells, result = _trend(view, points, 'sum')
+    assert len(result['counts']) <= points
+    assert sum(result['counts']) == cells['count'].sum()
+
+
+@pytest.mark.parametrize('points', [4, 10, 30])
+def test_minmax_keeps_the_extremes(view, points):
+    cells, result = _trend(view, points, 'minmax')
+    hourly = hourly_counts(cells)
+    assert result['bucket'] == 'hour' and len(result['counts']) <= points
+    assert max(result['counts']) == hourly.max() and min(result['counts']) == hourly.min()
+    assert result['timestamps'] == sorted(result['timestamps'])
+
+
+@pytest.mark.parametrize('points', [3, 10, 30])
+def test_lttb_keeps_the_first_and_last_points(view, points):
+    cells, result = _trend(view, points, 'lttb')
+    hourly = hourly_counts(cells)
+    assert len(result['counts']) == points
+    assert result['timestamps'][0] == hourly.index[0].value // 1_000_000
+    assert result['timestamps'][-1] == hourly.index[-1].value // 1_000_000
+    assert result['counts'][0] == hourly.iloc[0] and result['counts'][-1] == hourly.iloc[-1]
+
+
+def test_lttb_keeps_a_spike():
+    counts = np.ones(100, dtype=np.int64)
+    counts[37] = 50
+    assert 37 in lttb(np.arange(100) * HOUR, counts, 10).tolist()
+    assert minmax(np.arange(100) * HOUR, counts, 10).tolist().count(37) == 1
+
+
+def test_a_short_range_gets_minute_buckets(view):
+    # Less than an hour, inside one hour cell
+    cells, result = _trend(view, 50, 'sum', '2025-01-02 10:10', '2025-01-02 10:40')
+    assert result['bucket'] == 'minute'
+    assert len(result['counts']) <= 31 and sum(result['counts']) == cells['count'].sum() > 0
+
+
+def test_long_ranges_are_summed_into_weeks():
+    hours = np.arange(0, 3 * 52 * WEEK, HOUR)
+    cells = pd.DataFrame({'hour': T0 + hours, 'count': 1})
+    result = trend(cells, 50, 'sum')
+    assert result['bucket'] == 'week' and result['interval'] == 4
+    assert len(result['counts']) <= 50 and sum(result['counts']) == len(hours)
@@ -0,0 +1,103 @@
+"""Dwell-time histograms: bucket edges, percentile error and re-pairing on appends."""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dwell
+from conftest import BACKENDS, append, open_backend, row
+from dwell import BUCKETS, SUB_BUCKETS, bucket_bounds, bucket_of, summary
+
+
+def test_buckets_tile_the_durations():
+    seconds = np.arange(2 ** 20)
+    lower, upper = bucket_bounds(bucket_of(seconds))
+    assert ((lower <= seconds) & (seconds < upper)).all()
+    # Consecutive buckets meet, one second wide up to 64 s
+    lower, upper = bucket_bounds(np.arange(BUCKETS))
+    assert (upper[:-1] == lower[1:]).all()
+    assert (upper[:64] - lower[:64] == 1).all()
+    # Then at most 1/32 of the lower bound wide
+    assert ((upper - lower)[64:] * SUB_BUCKETS <= lower[64:]).all()
+
+
+@pytest.mark.parametrize('seconds, expected', [
+    (0, (0, 1)), (63.9, (63, 64)), (64, (64, 66)), (65, (64, 66)), (127, (126, 128)), (128, (128, 132)),
+    (2 ** 10, (2 ** 10, 2 ** 10 + 32)), (2 ** 20 - 1, (2 ** 20 - 2 ** 14, 2 ** 20)),
+])
+def test_bucket_edges(seconds, expected):
+    lower, upper = bucket_bounds([bucket_of(np.array([seconds]))[0]])
+    assert (lower[0], upper[0]) == expected
+
+
+def test_durations_past_the_last_bucket_are_clipped():
+    assert bucket_of(np.array([2.0 ** 24, -5]))[0] == BUCKETS - 1
+    assert bucket_of(np.array([-5.0]))[0] == 0
+
+
+def _sessions(seconds):
+    count = len(seconds)
+    return pd.DataFrame({
+        'entry_timestamp': pd.date_range('2025-01-01', periods=count, freq='min', tz='UTC').as_unit('ns'),
+        'zone': pd.Categorical(np.where(np.arange(count) % 3, 50, 60)),
+        'category': pd.Categorical(['car'] * count),
+        'entry_gate': pd.Categorical(['ganajan_car_in'] * count),
+        'duration': seconds,
+    })
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_percentiles_are_within_one_bucket(seed):
+    rng = np.random.default_rng(seed)
+    seconds = np.round(rng.lognormal(7, 1.5, 5000), 2)
+    # Open sessions are not counted
+    stats = summary(dwell.aggregate(_sessions(np.concatenate([seconds, [-1.0] * 10]))))
+    assert stats['completed_sessions'] == len(seconds)
+    assert stats['mean_seconds'] == pytest.approx(seconds.mean())
+    for q in dwell.QUANTILES:
+        exact = np.percentile(seconds, q, method='inverted_cdf')
+        lower, upper = bucket_bounds([bucket_of(np.array([exact]))[0]])
+        assert abs(stats[f'p{q}_seconds'] - exact) <= upper[0] - lower[0]
+    assert sum(stats['histogram']['counts']) == len(seconds)
+
+
+def _cells(view):
+    cells = view.dwell_cells()
+    keys = dwell.CELL_KEYS
+    cells = cells.astype({k: str for k in keys}).sort_values(keys).reset_index(drop=True)
+    return cells[keys], cells[['count', 'seconds']].astype(float)
+
+
+def _stamp(ts):
+    return ts.strftime('%Y-%m-%d %H:%M:%S.%f')[:-4] + '+00'
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_appends_match_a_rebuild(csv_path, tmp_path, name):
+    backend = open_backend(name, csv_path)
+    backend.current()
+    table = open_backend('pandas', csv_path).current().snapshot.derived('sessions', None).table
+    open_sessions = table[table['duration'] < 0].tail(2)
+    closed = table[table['duration'] > 3600].head(2)
+    lines = [row(5000000 + i, _stamp(s.entry_timestamp + pd.Timedelta(minutes=40)), plate=s.license_plate,
+                 gate='ganajan_car_out', zone=s.zone)
+             for i, s in enumerate(open_sessions.itertuples())]
+    # Earlier exits of closed sessions: the old pairing is subtracted, the new one added
+    lines += [row(5000100 + i, _stamp(s.entry_timestamp + pd.Timedelta(minutes=10)), plate=s.license_plate,
+                  gate='ganajan_car_out', zone=s.zone)
+              for i, s in enumerate(closed.itertuples())]
+    append(csv_path, ''.join(line + '\n' for line in lines))
+    view = backend.current()
+
+    fresh = tmp_path / 'fresh'
+    fresh.mkdir()
+    shutil.copy(csv_path, fresh / os.path.basename(csv_path))
+    rebuilt = open_backend(name, str(fresh / os.path.basename(csv_path))).current()
+    keys, values = _cells(view)
+    expected_keys, expected_values = _cells(rebuilt)
+    assert keys.equals(expected_keys)
+    assert np.allclose(values, expected_values)
+    assert summary(view.dwell_cells())['completed_sessions'] == summary(rebuilt.dwell_cells())[
+        'completed_sessions'] > summary(dwell.aggregate(table))['completed_sessions']
@@ -0,0 +1,109 @@
+"""Reading the growing CSV: whole lines only, tail appends, rebuilds."""
+import io
+import os
+
+import pandas as pd
+
+from conftest import BACKENDS, append, open_backend, row, settle
+from dataset import DatasetManager, csv_blocks
+
+PARTIAL = row(5000000, '2025-01-04 20:00:00.00+00', plate='MH01AB1234')
+
+
+def _ids(view):
+    rows, total, _ = view.events_page(1, 10)
+    return total, rows['insertion_id'].tolist()
+
+
+def test_csv_blocks_stop_at_the_last_newline():
+    data = b'a\nbb\nccc\ndd'
+    f = io.BytesIO(data)
+    assert b''.join(csv_blocks(f, 0, len(data), 4)) == b'a\nbb\nccc\n'
+    assert all(block.endswith(b'\n') for block in csv_blocks(f, 0, len(data), 4))
+    assert b''.join(csv_blocks(f, 0, len(data), 4, complete=True)) == data
+
+
+def test_partial_last_line_is_held_back(csv_path):
+    size = os.path.getsize(csv_path)
+    append(csv_path, PARTIAL[:40])
+    manager = DatasetManager(csv_path, persist=False)
+    snapshot = manager.current()
+
+    assert len(snapshot) == 3000
+    assert snapshot.cursor.offset == size
+    assert snapshot.state.size == size + 40
+    # Nothing new to read until the line is finished
+    assert manager.current() is snapshot
+
+
+def test_finished_line_is_appended(csv_path):
+    append(csv_path, PARTIAL[:40])
+    manager = DatasetManager(csv_path, persist=False)
+    manager.current()
+
+    append(csv_path, PARTIAL[40:] + '\n')
+    snapshot = manager.current()
+    assert snapshot.appended is not None and len(snapshot.appended) == 1
+    assert snapshot.appended['description'].tolist() == ['ZONE 2 - Table']
+    assert snapshot.cursor.offset == os.path.getsize(csv_path)
+
+
+def test_settled_unterminated_line_is_read(csv_path):
+    append(csv_path, PARTIAL)
+    manager = DatasetManager(csv_path, persist=False)
+    assert len(manager.current()) == 3000
+
+    settle(csv_path)
+    snapshot = manager.current()
+    assert len(snapshot) == 3001
+    assert snapshot.appended is not None
+    assert snapshot.cursor.offset == os.path.getsize(csv_path)
+
+    # The writer starts its next row on a new line: still an append
+    append(csv_path, '\n' + row(5000001, '2025-01-04 20:01:00.00+00') + '\n')
+    snapshot = manager.current()
+    assert len(snapshot) == 3002
+    assert snapshot.appended is not None
+
+
+def test_rewrite_before_the_offset_rebuilds(csv_path):
+    manager = DatasetManager(csv_path, persist=False)
+    manager.current()
+    # Within the marker kept from just before the offset
+    with open(csv_path, 'r+b') as f:
+        f.seek(-10, os.SEEK_END)
+        f.write(b'9')
+    append(csv_path, row(5000000, '2025-01-04 20:00:00.00+00') + '\n')
+    snapshot = manager.current()
+    assert snapshot.appended is None
+    assert len(snapshot) == 3001
+
+
+def test_tail_appends_match_a_full_load(csv_path):
+    manager = DatasetManager(csv_path, persist=False)
+    manager.current()
+    for i in range(3):
+        # Rows that sort into the middle of the file as well as at its end
+        append(csv_path, row(5000000 + 2 * i, f'2025-01-0{2 + i} 12:00:00.00+00', plate=f'MH01AB{i}') + '\n'
+               + row(5000001 + 2 * i, f'2025-01-04 2{i}:00:00.00+00', gate='ganajan_car_out') + '\n')
+        manager.current()
+    incremental = manager.current()
+    full = DatasetManager(csv_path, persist=False).current()
+    assert incremental.appended is not None
+    pd.testing.assert_frame_equal(incremental.events.reset_index(drop=True),
+                                  full.events.reset_index(drop=True), check_categorical=False)
+
+
+def test_backends_hold_back_partial_lines(csv_path):
+    append(csv_path, PARTIAL[:40])
+    for name in BACKENDS:
+        backend = open_backend(name, csv_path)
+        view = backend.current()
+        assert _ids(view)[0] == 3000
+        assert backend.current() is view
+
+    append(csv_path, PARTIAL[40:] + '\n')
+    for name in BACKENDS:
+        total, ids = _ids(open_backend(name, csv_path).current())
+        assert total == 3001
+        assert 5000000 in ids
@@ -0,0 +1,89 @@
+"""The live feed's change log and replayed window of events."""
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import dataset as dataset_module
+from bench.generate import generate
+from conftest import append, open_backend, published, row
+from dataset import DatasetManager
+from live import CHANGE_LOG, ChangeLog
+from live_counters import live_counters
+from occupancy import occupancy
+from sessions import MATCH_TOLERANCE
+
+
+def _manager(csv_path):
+    manager = DatasetManager(csv_path, persist=True)
+    manager.maintain('changes', ChangeLog.from_snapshot, ChangeLog.advance)
+    return manager
+
+
+def test_since_skips_versions_of_other_logs():
+    frame = pd.DataFrame({'insertion_id': [1]})
+    log = ChangeLog(1)
+    for version in (2, 5, 6):
+        log = log.advance(SimpleNamespace(version=version, appended=frame))
+    assert len(log.since(1)) == 3
+    assert len(log.since(4)) == 2
+    assert log.since(6) == []
+    assert log.since(0) is None
+
+
+def test_since_forgets_dropped_versions():
+    log = ChangeLog(0)
+    for version in range(1, CHANGE_LOG + 3):
+        log = log.advance(SimpleNamespace(version=version, appended=None))
+    assert log.since(1) is None
+    assert len(log.since(2)) == CHANGE_LOG
+
+
+def test_change_log_is_continued_across_attach(csv_path, monkeypatch):
+    monkeypatch.setattr(dataset_module, 'PUBLISH_SECONDS', 0)
+    writer = _manager(csv_path)
+    published(writer)
+    worker = _manager(csv_path)
+    before = worker.current()
+    assert worker._writer is None
+
+    append(csv_path, ''.join(row(5000000 + i, f'2025-01-05 0{i}:00:00.00+00') + '\n' for i in range(3)))
+    published(writer)
+    after = worker.current()
+    assert after.version > before.version
+
+    # The rows come out as a delta, not a reset
+    frames = after.derived('changes', ChangeLog.from_snapshot).since(before.version)
+    assert frames is not None
+    assert pd.concat(frames)['insertion_id'].tolist() == [5000000, 5000001, 5000002]
+
+
+@pytest.mark.parametrize('name', ['sqlite', 'partitioned'])
+def test_replay_recent_holds_the_window(csv_path, name):
+    store = open_backend(name, csv_path)
+    window = pd.Timedelta(days=1)
+    manager = DatasetManager(csv_path, persist=False)
+    manager.replay_recent(lambda w: store.current().recent(w), window)
+    full = DatasetManager(csv_path, persist=False)
+
+    for appended in range(3):
+        events, expected = manager.current().events, full.current().events
+        newest = expected['datetime_utc'].max()
+        expected = expected[expected['datetime_utc'] >= newest - window]
+        assert events['insertion_id'].tolist() == expected['insertion_id'].tolist()
+        append(csv_path, row(5000000 + appended, f'2025-01-0{5 + appended} 00:00:00.00+00') + '\n')
+    assert manager.current().appended is not None
+
+
+@pytest.mark.parametrize('name', ['sqlite', 'partitioned'])
+def test_occupancy_from_the_replayed_window(tmp_path, name):
+    csv_path = str(tmp_path / 'parking_export.csv')
+    generate(3000, csv_path, seed=3, days=12)
+    store = open_backend(name, csv_path)
+    manager = DatasetManager(csv_path, persist=False)
+    manager.replay_recent(lambda w: store.current().recent(w), MATCH_TOLERANCE)
+    full = DatasetManager(csv_path, persist=False)
+    assert len(manager.current()) < len(full.current())
+    append(csv_path, row(5000000, '2025-01-13 00:00:00.00+00', plate='MH01AB1234') + '\n')
+    assert occupancy(manager.current()).as_dict() == occupancy(full.current()).as_dict()
+    assert live_counters(manager.current()).summary() == live_counters(full.current()).summary()
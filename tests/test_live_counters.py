@@ -0,0 +1,56 @@
+"""Minute rings and per-day totals, at a fixed now."""
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from live_counters import MINUTE, RING_MINUTES, LiveCounters, MinuteRing
+
+NOW = datetime(2025, 1, 2, 0, 5, 30, tzinfo=timezone.utc)
+
+
+def _events(*rows):
+    stamps, gates = zip(*rows)
+    return pd.DataFrame({'datetime_utc': pd.to_datetime(list(stamps), utc=True, format='ISO8601').as_unit('ns'),
+                         'gate': list(gates)})
+
+
+def _ns(text):
+    return pd.Timestamp(text, tz='UTC').value
+
+
+def test_ring_keeps_the_newest_minutes():
+    ring = MinuteRing().add(np.arange(RING_MINUTES) * MINUTE)
+    assert ring.since(0) == RING_MINUTES
+    # Minute RING_MINUTES + 5 takes over the slot of minute 5; minutes before it are gone
+    ring = ring.add(np.array([(RING_MINUTES + 5) * MINUTE] * 3))
+    assert ring.since(0) == RING_MINUTES - 1 + 3
+    assert ring.since(RING_MINUTES) == 3
+    # A minute older than its slot's is dropped
+    assert ring.add(np.array([5 * MINUTE])).since(0) == ring.since(0)
+
+
+def test_day_totals_across_midnight():
+    counters = LiveCounters.build(_events(('2025-01-01 23:59:30', 'ganajan_car_in'),
+                                          ('2025-01-01 23:59:59.9', 'ganajan_car_out'),
+                                          ('2025-01-02 00:00:00', 'ganajan_car_in'),
+                                          (None, 'ganajan_car_in')))
+    assert counters.today(NOW) == 1
+    assert counters.today(datetime(2025, 1, 1, 12, tzinfo=timezone.utc)) == 2
+    assert counters.extend(_events(('2025-01-02 00:04:00', 'ganajan_bus_in'))).today(NOW) == 2
+
+
+def test_recent_window_counts_its_first_minute_in_full():
+    counters = LiveCounters.build(_events(('2025-01-01 23:54:59', 'ganajan_car_in'),   # 10.5 minutes ago
+                                          ('2025-01-01 23:55:00', 'ganajan_car_in'),   # start minute
+                                          ('2025-01-01 23:55:59', 'ganajan_car_out'),
+                                          ('2025-01-02 00:05:00', 'ganajan_car_out'),
+                                          ('2025-01-02 00:05:10', 'ganajan_bike_lane')))
+    assert counters.summary(NOW) == {'today_count': 2, 'recent_entries': 1, 'recent_exits': 2}
+
+
+def test_extend_leaves_the_previous_counters_alone():
+    counters = LiveCounters.build(_events(('2025-01-02 00:01:00', 'ganajan_car_in')))
+    extended = counters.extend(_events(('2025-01-02 00:02:00', 'ganajan_car_in')))
+    assert (counters.recent_entries(NOW), extended.recent_entries(NOW)) == (1, 2)
+    assert _ns('2025-01-02 00:02:00') // MINUTE in extended.entries.minutes
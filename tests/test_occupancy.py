@@ -0,0 +1,70 @@
+"""Entry, exit and timeout semantics of the occupancy replay."""
+from types import SimpleNamespace
+
+import pandas as pd
+
+from occupancy import Occupancy, OccupancyEngine
+from sessions import MATCH_TOLERANCE
+
+T0 = pd.Timestamp('2025-01-01 08:00', tz='UTC')
+
+
+def _events(*rows):
+    """rows of (minutes after T0, plate, gate, zone)."""
+    minutes, plates, gates, zones = zip(*rows)
+    return pd.DataFrame({
+        # Events frames hold nanoseconds (see dataset.parse_events)
+        'datetime_utc': pd.DatetimeIndex([T0 + pd.Timedelta(minutes=m) for m in minutes]).as_unit('ns'),
+        'license_plate': pd.Categorical(plates),
+        'gate': pd.Categorical(gates),
+        'zone': list(zones),
+        'description': [f'ZONE {z}' for z in zones],
+    })
+
+
+CAPACITIES = {50: 4}
+
+
+def _state(events):
+    return Occupancy(OccupancyEngine.from_events(events)).as_dict(CAPACITIES)
+
+
+def test_entries_and_exits():
+    state = _state(_events((0, 'A', 'car_in', 50), (5, 'B', 'car_in', 50), (6, 'C', 'bus_in', 60),
+                           (10, 'A', 'car_out', 50), (12, 'D', 'car_out', 50)))
+    assert state['occupied'] == 2
+    assert state['as_of'] == (T0 + pd.Timedelta(minutes=12)).isoformat()
+    assert state['gates'] == {'car_in': 1, 'bus_in': 1}
+    assert state['zones'] == [
+        {'zone': 50, 'description': 'ZONE 50', 'occupied': 1, 'capacity': 4, 'fill': 0.25},
+        {'zone': 60, 'description': 'ZONE 60', 'occupied': 1, 'capacity': None, 'fill': None},
+    ]
+
+
+def test_an_exit_closes_every_open_entry_of_its_plate():
+    assert _state(_events((0, 'A', 'car_in', 50), (1, 'A', 'car_in', 50), (2, 'A', 'car_out', 50)))['occupied'] == 0
+    # An entry and an exit at the same time: the entry is matched
+    assert _state(_events((3, 'A', 'car_out', 50), (3, 'A', 'car_in', 50)))['occupied'] == 0
+
+
+def test_entries_expire_after_the_tolerance():
+    limit = int(MATCH_TOLERANCE / pd.Timedelta(minutes=1))
+    events = _events((0, 'A', 'car_in', 50), (1, 'B', 'car_in', 50), (limit, 'C', 'car_in', 50))
+    assert _state(events)['occupied'] == 3
+    assert _state(_events(*[(0, 'A', 'car_in', 50), (1, 'B', 'car_in', 50), (limit + 1, 'C', 'car_in', 50)]))[
+        'occupied'] == 2
+    # An exit after the expiry finds nothing to close
+    assert _state(_events((0, 'A', 'car_in', 50), (limit + 5, 'A', 'car_out', 50)))['occupied'] == 0
+
+
+def test_advance_matches_a_replay_and_rebuilds_on_late_rows():
+    first = _events((0, 'A', 'car_in', 50), (5, 'B', 'car_in', 50))
+    later = _events((10, 'A', 'car_out', 50), (11, 'C', 'car_in', 60))
+    late = _events((7, 'B', 'car_out', 50))
+    occupancy = Occupancy.from_snapshot(SimpleNamespace(events=first))
+    for rows in (later, late):
+        events = pd.concat([first, rows]).sort_values('datetime_utc', kind='mergesort').reset_index(drop=True)
+        occupancy = occupancy.advance(SimpleNamespace(events=events, appended=rows))
+        assert occupancy.as_dict(CAPACITIES) == _state(events)
+        first = events
+    assert occupancy.total == 1
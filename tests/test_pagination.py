@@ -0,0 +1,72 @@
+"""Page numbers, cursor chains and the bounded totals behind them."""
+import pytest
+
+from conftest import append, open_backend, row
+from pagination import Counts, counts
+
+
+def _chain(view, method, page_size, limit=None, **filters):
+    """insertion_ids of every page reached by following next_cursor."""
+    ids, cursor = [], None
+    while True:
+        rows, _, cursor = getattr(view, method)(1, page_size, cursor, False, **filters)
+        ids += rows['insertion_id'].tolist()
+        if cursor is None or (limit is not None and len(ids) >= limit):
+            return ids, cursor
+
+
+def _numbered(view, method, page_size, pages, **filters):
+    ids = []
+    for page in range(1, pages + 1):
+        rows, total, _ = getattr(view, method)(page, page_size, None, True, **filters)
+        ids += rows['insertion_id'].tolist()
+    return ids, total
+
+
+@pytest.mark.parametrize('method, filters', [
+    ('events_page', {}),
+    ('events_page', {'search': 'car_out'}),
+    ('sessions_page', {}),
+    ('sessions_page', {'category': 'car'}),
+])
+def test_cursor_chain_matches_page_numbers(backend, method, filters):
+    view = backend.current()
+    chained, _ = _chain(view, method, 97, **filters)
+    numbered, total = _numbered(view, method, 97, -(-len(chained) // 97), **filters)
+    assert chained == numbered
+    assert len(chained) == total
+    assert len(set(chained)) == len(chained)
+
+
+def test_cursor_chain_survives_appends(csv_path, backend):
+    view = backend.current()
+    before, _ = _chain(view, 'events_page', 50)
+    head, cursor = _chain(view, 'events_page', 50, limit=500)
+
+    # Newer rows do not move the pages after the cursor
+    append(csv_path, ''.join(row(5000000 + i, f'2025-01-05 0{i}:00:00.00+00') + '\n' for i in range(5)))
+    view = backend.current()
+    tail = []
+    while cursor is not None:
+        rows, _, cursor = view.events_page(1, 50, cursor, False)
+        tail += rows['insertion_id'].tolist()
+    assert head + tail == before
+    assert view.events_page(1, 5, None, False)[0]['insertion_id'].tolist() == list(range(5000004, 4999999, -1))
+
+
+def test_counts_are_bounded():
+    totals = Counts(entries=2)
+    for key in 'abc':
+        assert totals.get(key, lambda: len(key)) == 1
+    assert len(totals) == 2
+    assert totals.get('c', lambda: 0) == 1
+    assert totals.get('a', lambda: 7) == 7
+
+
+def test_search_totals_stay_bounded(csv_path):
+    view = open_backend('pandas', csv_path).current()
+    totals = counts(view.snapshot)
+    totals.entries = 10
+    for i in range(30):
+        view.events_page(1, 10, search=f'needle-{i}')
+    assert len(totals) == 10
@@ -0,0 +1,76 @@
+"""Day partitions: pruning by date, appends on day boundaries and monthly compaction."""
+import pandas as pd
+import pytest
+
+from conftest import append, open_backend, row
+from partitions import PartitionedBackend
+
+
+@pytest.fixture
+def store(csv_path):
+    return open_backend('partitioned', csv_path)
+
+
+@pytest.fixture
+def opened(store, monkeypatch):
+    """Names of the partitions whose events are read."""
+    names = []
+    read = PartitionedBackend.events
+
+    def events(self, partition):
+        names.append(partition['name'])
+        return read(self, partition)
+
+    monkeypatch.setattr(PartitionedBackend, 'events', events)
+    return names
+
+
+def _names(view):
+    return [p['name'] for p in view.partitions]
+
+
+def test_a_narrow_range_opens_only_its_days(csv_path, store, opened):
+    view = store.current()
+    assert _names(view) == ['d20250101', 'd20250102', 'd20250103', 'd20250104']
+    del opened[:]
+
+    expected = open_backend('pandas', csv_path).current()
+    cells = view.range_cells('2025-01-02 10:30', '2025-01-02 18:15')
+    assert opened == ['d20250102']
+    assert cells['count'].sum() == expected.range_cells('2025-01-02 10:30', '2025-01-02 18:15')['count'].sum()
+
+    del opened[:]
+    filters = dict(start_date='2025-01-03 00:00', end_date='2025-01-03 23:59:59', categories='car')
+    assert view.export_count(**filters) == expected.export_count(**filters)
+    assert opened == ['d20250103']
+
+
+def test_appends_on_a_day_boundary_land_in_their_day(csv_path, store):
+    store.current()
+    append(csv_path, row(5000000, '2025-01-04 23:59:59.99+00') + '\n' + row(5000001, '2025-01-05 00:00:00+00') + '\n')
+    view = store.current()
+    assert _names(view)[-2:] == ['d20250104', 'd20250105']
+    day4, day5 = view.partitions[-2:]
+    assert day4['rows'] == 733 and day4['max_ts'] == pd.Timestamp('2025-01-04 23:59:59.99', tz='UTC').value
+    assert day5['rows'] == 1 and day5['min_ts'] == pd.Timestamp('2025-01-05', tz='UTC').value
+    assert store.events(day5)['insertion_id'].tolist() == [5000001]
+    assert 5000000 in store.events(day4)['insertion_id'].tolist()
+
+
+def test_compaction_merges_old_months(csv_path, store):
+    store.current()
+    append(csv_path, row(5000000, '2025-02-20 10:00:00+00') + '\n')
+    store.current()
+    assert [p['name'] for p in store.compact(days=7)] == ['m202501', 'd20250220']
+
+    # Later rows of a compacted month go into the month's partition
+    append(csv_path, row(5000001, '2025-01-31 12:00:00+00') + '\n')
+    view = store.current()
+    assert _names(view) == ['m202501', 'd20250220']
+    assert view.partitions[0]['rows'] == 3001
+
+    expected = open_backend('pandas', csv_path).current()
+    rows, total, _ = view.events_page(1, 20)
+    expected_rows, expected_total, _ = expected.events_page(1, 20)
+    assert total == expected_total
+    assert rows['insertion_id'].tolist() == expected_rows['insertion_id'].tolist()
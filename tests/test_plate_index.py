@@ -0,0 +1,31 @@
+"""Plate lookups and prefixes, with readable and unreadable plates mixed."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from plate_index import PlateIndex
+
+PLATES = ['MH01AB1', '-', '--', 'MH02CD2', '-', None, '-MH03', '--', 'KA05EF5', '-']
+
+
+@pytest.fixture
+def index():
+    return PlateIndex(pd.Series(PLATES, dtype='category'))
+
+
+def _expected(match):
+    return [i for i, plate in enumerate(PLATES) if plate is not None and match(plate)]
+
+
+@pytest.mark.parametrize('prefix', ['MH', 'MH01', '-', '--', '-M', 'K', 'X'])
+def test_prefix_matches_plates_individually(index, prefix):
+    assert index.prefix(prefix).tolist() == _expected(lambda plate: plate.startswith(prefix))
+
+
+@pytest.mark.parametrize('plate', ['MH01AB1', '-', '--', '-MH03', '---', 'MH'])
+def test_lookup(index, plate):
+    assert index.lookup(plate).tolist() == _expected(lambda p: p == plate)
+
+
+def test_bucket_holds_every_unreadable_plate(index):
+    assert np.array_equal(index.bucket(), [1, 2, 4, 7, 9])
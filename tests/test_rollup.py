@@ -0,0 +1,44 @@
+"""Rollup range queries: whole hours from the cells, partial edge hours from the raw rows."""
+import pandas as pd
+import pytest
+
+from conftest import open_backend
+from rollup import dimension_counts, hourly_counts
+
+RANGES = [
+    ('2025-01-02 03:17:12', '2025-01-03 15:42:05', True),
+    ('2025-01-02 03:17:12', '2025-01-03 15:42:05', False),
+    # Both edges inside the same hour
+    ('2025-01-02 10:05', '2025-01-02 10:55', True),
+    # Whole hours only
+    ('2025-01-02 00:00', '2025-01-04 00:00', False),
+    (None, '2025-01-02 12:30', True),
+    ('2025-01-03 12:30', None, True),
+]
+
+
+def _raw(events, start, end, end_inclusive):
+    stamps = events['datetime_utc']
+    mask = stamps.notna()
+    if start is not None:
+        mask &= stamps >= pd.Timestamp(start, tz='UTC')
+    if end is not None:
+        end = pd.Timestamp(end, tz='UTC')
+        mask &= (stamps <= end) if end_inclusive else (stamps < end)
+    return events[mask]
+
+
+@pytest.mark.parametrize('start, end, end_inclusive', RANGES)
+def test_range_cells_match_the_raw_rows(csv_path, backend, start, end, end_inclusive):
+    events = open_backend('pandas', csv_path).current().snapshot.events
+    raw = _raw(events, start, end, end_inclusive)
+    # The edges cut through hours that have rows on both sides
+    assert 0 < len(raw) < len(events)
+
+    cells = backend.current().range_cells(start, end, end_inclusive=end_inclusive)
+    for dimension in ['category', 'gate', 'zone', 'color']:
+        assert dimension_counts(cells, dimension) == raw[dimension].astype(object).value_counts().to_dict()
+    expected = raw.set_index('datetime_utc').resample('h').size()
+    got = hourly_counts(cells)
+    assert got.index.equals(expected.index)
+    assert got.tolist() == expected.tolist()
@@ -0,0 +1,36 @@
+"""The search parameter: values and dates, the same on every backend."""
+import pandas as pd
+
+from conftest import open_backend
+from search_index import SearchIndex, search_values
+
+
+def _events(view, needle):
+    rows, total, _ = view.events_page(1, 100, search=needle)
+    return total, sorted(rows['insertion_id'].tolist())
+
+
+def test_date_column_is_the_utc_day():
+    frame = pd.DataFrame({'datetime_utc': pd.to_datetime(
+        ['2025-01-24 23:59:59', '2025-01-25 00:00:00', None], utc=True).as_unit('ns')})
+    dates = search_values(frame, 'date')
+    assert dates.tolist()[:2] == ['2025-01-24', '2025-01-25'] and pd.isna(dates.iloc[2])
+    index = SearchIndex(frame, ['date'])
+    assert index.search('01-25').tolist() == [1]
+    # Missing values read as 'nan', as in the other columns
+    assert index.search('nan').tolist() == [2]
+
+
+def test_search_by_date(backend):
+    view = backend.current()
+    day, _ = _events(view, '2025-01-02')
+    month, _ = _events(view, '2025-01')
+    assert 0 < day < month == 3000 - _events(view, 'nan')[0]
+    assert _events(view, '2025-02-02')[0] == 0
+
+
+def test_backends_agree(csv_path, backend):
+    expected = open_backend('pandas', csv_path).current()
+    view = backend.current()
+    for needle in ['2025-01-03', 'ZONE', 'car_out', 'mh', '-']:
+        assert _events(view, needle) == _events(expected, needle)
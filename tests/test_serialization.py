@@ -0,0 +1,42 @@
+"""Frames become JSON-ready rows column by column."""
+import json
+
+import numpy as np
+import pandas as pd
+
+from serialization import FastJSONResponse, records
+
+
+def test_records_convert_each_kind_of_column():
+    frame = pd.DataFrame({
+        'insertion_id': np.array([2**40, 7], dtype=np.int64),
+        'optional': pd.array([1, None], dtype='Int64'),
+        'duration': [1.5, np.nan],
+        'category': pd.Categorical(['car', None]),
+        'license_plate': ['MH01AB1', None],
+        'datetime_utc': pd.to_datetime(['2025-01-24 04:00:41.52', None], utc=True, format='ISO8601'),
+        'naive': pd.to_datetime(['2025-01-24 04:00:00', '2025-01-24 05:00:00.000001'], format='ISO8601'),
+    })
+    assert records(frame) == [
+        {'insertion_id': 2**40, 'optional': 1, 'duration': 1.5, 'category': 'car',
+         'license_plate': 'MH01AB1', 'datetime_utc': '2025-01-24T04:00:41.520000+00:00',
+         'naive': '2025-01-24T04:00:00'},
+        {'insertion_id': 7, 'optional': None, 'duration': None, 'category': None,
+         'license_plate': None, 'datetime_utc': None, 'naive': '2025-01-24T05:00:00.000001'},
+    ]
+    row = records(frame)[0]
+    assert type(row['insertion_id']) is int and type(row['duration']) is float
+
+
+def test_timestamps_match_isoformat():
+    stamps = pd.Series(pd.to_datetime(['2025-01-24 04:00:00', '2025-01-24 04:00:41.52'], utc=True, format='ISO8601'))
+    assert [r['t'] for r in records(pd.DataFrame({'t': stamps}))] == [ts.isoformat() for ts in stamps]
+
+
+def test_empty_frame():
+    assert records(pd.DataFrame({'datetime_utc': pd.to_datetime([], utc=True), 'n': []})) == []
+
+
+def test_response_encodes_numpy_values():
+    body = FastJSONResponse({'count': np.int64(3), 'values': np.array([1, 2]), 'missing': None}).body
+    assert json.loads(body) == {'count': 3, 'values': [1, 2], 'missing': None}
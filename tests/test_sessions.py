@@ -0,0 +1,66 @@
+"""Sessions kept up to date by appends match the ones built from scratch."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import open_backend, replay
+from dataset import DatasetManager
+from dwell import CELL_KEYS, dwell_rollup
+from sessions import SessionTable
+
+
+def _replay(csv_path, chunks):
+    manager = DatasetManager(csv_path, persist=False)
+    replay(csv_path, chunks, manager.current)
+    return manager
+
+
+def _sessions(snapshot):
+    table = snapshot.derived('sessions', SessionTable.from_snapshot).table
+    return table.astype({c: object for c in table.columns if isinstance(table[c].dtype, pd.CategoricalDtype)})
+
+
+@pytest.mark.parametrize('chunks', [3, 40])
+def test_extend_matches_build(csv_path, chunks):
+    snapshot = _replay(csv_path, chunks).current()
+    assert snapshot.appended is not None
+    expected = SessionTable.build(snapshot.events).table
+    pd.testing.assert_frame_equal(_sessions(snapshot).reset_index(drop=True),
+                                  expected.astype(_sessions(snapshot).dtypes).reset_index(drop=True))
+
+
+def test_dwell_follows_the_changes(csv_path):
+    snapshot = _replay(csv_path, 40).current()
+    full = DatasetManager(csv_path, persist=False).current()
+    cells, expected = (dwell_rollup(s).cells.astype({k: str for k in CELL_KEYS}).sort_values(CELL_KEYS)
+                       for s in (snapshot, full))
+    assert cells[CELL_KEYS].to_numpy().tolist() == expected[CELL_KEYS].to_numpy().tolist()
+    assert cells['count'].tolist() == expected['count'].tolist()
+    assert np.allclose(cells['seconds'], expected['seconds'])
+
+
+def test_unreadable_plates_only_reopen_open_sessions():
+    events = pd.DataFrame({
+        'insertion_id': [1, 2, 3, 4],
+        'license_plate': pd.Categorical(['-', '-', '-', 'MH01AB1']),
+        'gate': ['a_in', 'a_out', 'a_in', 'a_in'],
+        'datetime_utc': pd.to_datetime(['2025-01-01 10:00', '2025-01-01 11:00', '2025-01-01 12:00',
+                                        '2025-01-01 12:30'], utc=True),
+    }).assign(category='car', color='white', zone=50, description='ZONE 2 - Table')
+    sessions = SessionTable.build(events)
+    exit_ = events.iloc[[1]].assign(insertion_id=5, datetime_utc=pd.Timestamp('2025-01-01 13:00', tz='UTC'))
+    removed, added = sessions.extend(exit_).changes
+    # The 10:00 entry was closed at 11:00 and is left alone
+    assert removed['insertion_id'].tolist() == [3]
+    assert added['insertion_id_exit'].tolist() == [5]
+
+
+def test_sqlite_sessions_match_pandas(csv_path):
+    backend = open_backend('sqlite', csv_path)
+    backend.current()
+    manager = _replay(csv_path, 12)
+    expected, total, _ = open_backend('pandas', csv_path).current().sessions_page(1, 500)
+    rows, sqlite_total, _ = backend.current().sessions_page(1, 500)
+    assert sqlite_total == total
+    assert rows['insertion_id_exit'].tolist() == expected['insertion_id_exit'].tolist()
+    assert manager.current().appended is not None
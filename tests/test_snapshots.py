@@ -0,0 +1,90 @@
+"""Published snapshot versions: conversion, the legacy layout and attaching workers."""
+import mmap
+import os
+
+import pytest
+
+import dataset as dataset_module
+import snapshot_store
+from backends import PandasBackend
+from bitmap_index import BitmapIndex
+from conftest import append, published, row
+from dataset import DatasetManager
+from rollup import Rollup, rollup
+from sessions import SessionTable
+
+
+def _mapped(array):
+    """True if array is a view of a memory-mapped file."""
+    while array is not None:
+        if isinstance(array, mmap.mmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def _worker(csv_path):
+    manager = DatasetManager(csv_path, persist=True)
+    PandasBackend(manager)
+    return manager
+
+
+def _fail(*args):
+    raise AssertionError("rebuilt instead of loaded or extended")
+
+
+def test_convert_writes_the_published_tables(csv_path, monkeypatch):
+    snapshot_store.convert(csv_path)
+    meta = snapshot_store.read_meta(snapshot_store.snapshot_dir(csv_path))
+    assert set(meta['tables']) == {'sessions', 'rollup', 'dwell'}
+
+    monkeypatch.setattr(SessionTable, 'from_snapshot', _fail)
+    monkeypatch.setattr(Rollup, 'from_snapshot', _fail)
+    snapshot = _worker(csv_path).current()
+    expected = DatasetManager(csv_path, persist=False).current()
+    assert rollup(snapshot).cells.equals(Rollup.build(expected.events).cells)
+
+
+def test_legacy_layout_keeps_the_lock(csv_path):
+    directory = snapshot_store.snapshot_dir(csv_path)
+    os.makedirs(os.path.join(directory, 'columns'))
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        f.write('{}')
+    lock = snapshot_store.lock_writer(directory)
+    try:
+        snapshot = DatasetManager(csv_path, persist=False).current()
+        snapshot_store.write_snapshot(snapshot.events, snapshot.state, snapshot.cursor, directory)
+        assert sorted(os.listdir(directory)) == ['CURRENT', 'lock', 'v1']
+        assert os.fstat(lock.fileno()).st_ino == os.stat(os.path.join(directory, 'lock')).st_ino
+        # Still held: nobody else can become the writer
+        assert snapshot_store.lock_writer(directory) is None
+    finally:
+        lock.close()
+
+
+@pytest.mark.parametrize('role', ['writer', 'worker'])
+def test_attach_after_appends_shares_and_extends(csv_path, monkeypatch, role):
+    monkeypatch.setattr(dataset_module, 'PUBLISH_SECONDS', 0)
+    writer = _worker(csv_path)
+    published(writer)
+    worker = _worker(csv_path)
+    manager = writer if role == 'writer' else worker
+    before = manager.current()
+    assert worker._writer is None
+
+    append(csv_path, ''.join(row(5000000 + i, f'2025-01-05 0{i}:00:00.00+00') + '\n' for i in range(3)))
+    # Parsed privately until the next version is published ...
+    private = manager.current()
+    assert not _mapped(private.events['insertion_id'].to_numpy())
+    published(writer)
+
+    # ... then mapped again, with the indexes extended rather than rebuilt
+    monkeypatch.setattr(BitmapIndex, 'from_snapshot', _fail)
+    after = manager.current()
+    assert _mapped(after.events['insertion_id'].to_numpy())
+    assert after.events['insertion_id'].tolist() == DatasetManager(csv_path, persist=False).current().events[
+        'insertion_id'].tolist()
+    assert after.derived('bitmaps', _fail).size == len(after) == len(before) + 3
+    # The same rows as before the attach: the same version for caches and the live feed
+    assert after.version == private.version
+    assert manager.current() is after
@@ -0,0 +1,50 @@
+"""Row bounds of time ranges, with inclusive and exclusive ends and undated rows."""
+import pandas as pd
+import pytest
+
+from time_index import TimeIndex, day_bounds
+
+STAMPS = ['2025-01-01 10:00', '2025-01-01 11:00', '2025-01-01 11:00', '2025-01-02 09:30', None, None]
+
+
+@pytest.fixture
+def index():
+    return TimeIndex(pd.Series(pd.to_datetime(STAMPS, utc=True)))
+
+
+def test_no_bounds_include_undated_rows(index):
+    assert index.bounds() == (0, 6)
+    assert len(index) == 4
+
+
+@pytest.mark.parametrize('start, end, inclusive, expected', [
+    ('2025-01-01 11:00', '2025-01-01 11:00', True, (1, 3)),
+    ('2025-01-01 11:00', '2025-01-01 11:00', False, (1, 1)),
+    ('2025-01-01 10:00', '2025-01-02 09:30', True, (0, 4)),
+    ('2025-01-01 10:00', '2025-01-02 09:30', False, (0, 3)),
+    (None, '2025-01-01 10:59', True, (0, 1)),
+    # A start alone stops before the undated rows
+    ('2025-01-01 10:30', None, True, (1, 4)),
+    ('2025-01-03', None, True, (4, 4)),
+    # An end before the start is empty
+    ('2025-01-02', '2025-01-01', True, (3, 3)),
+])
+def test_bounds(index, start, end, inclusive, expected):
+    assert index.bounds(start, end, end_inclusive=inclusive) == expected
+
+
+def test_offsets_and_naive_bounds(index):
+    # Naive values are UTC; aware ones are converted
+    assert index.bounds('2025-01-01 12:00+01:00', '2025-01-01T11:00:00Z') == (1, 3)
+
+
+def test_day_bounds_cover_whole_days(index):
+    start, end = day_bounds('2025-01-01 13:00', '2025-01-01 08:00')
+    assert index.bounds(start, end, end_inclusive=False) == (0, 3)
+
+
+def test_all_undated():
+    index = TimeIndex(pd.Series(pd.to_datetime([None, None], utc=True)))
+    assert index.bounds() == (0, 2)
+    assert index.bounds('2025-01-01') == (0, 0)
+    assert index.first() is None and index.last() is None
@@ -0,0 +1,24 @@
+"""Timestamps in every ISO 8601 variant the gates write are parsed."""
+import io
+import os
+
+from dataset import parse_events
+
+EXPORT = os.path.join(os.path.dirname(__file__), os.pardir, 'parking_export.csv')
+HEADER = "insertion_id,license_plate,category,color,timestamp,gate,zone,description\n"
+
+
+def test_mixed_variants_parse():
+    lines = ["1,MH01AB1,car,white,2025-01-24 04:00:41.52+00,ganajan_car_in,50,ZONE 2",
+             "2,MH01AB1,car,white,2025-01-24 05:10:28+00,ganajan_car_out,50,ZONE 2",
+             "3,KA05EF5,bus,white,2025-01-24T06:00:00.123456+00:00,ganajan_bus_in,80,ZONE 6",
+             "4,KA05EF5,bus,white,not a time,ganajan_bus_out,80,ZONE 6"]
+    events = parse_events(io.BytesIO((HEADER + "\n".join(lines) + "\n").encode()))
+    assert [ts.isoformat() if ts == ts else None for ts in events['datetime_utc']] == [
+        '2025-01-24T04:00:41.520000+00:00', '2025-01-24T05:10:28+00:00',
+        '2025-01-24T06:00:00.123456+00:00', None]
+
+
+def test_the_export_has_no_unparsed_timestamps():
+    events = parse_events(EXPORT)
+    assert len(events) and not events['datetime_utc'].isna().any()
@@ -0,0 +1,97 @@
+"""
+Binary-search time ranges over frames kept sorted by timestamp.
+
+The events frame is kept sorted by datetime_utc (rows with an unparseable
+timestamp last) and the session table by entry_timestamp, so any time
+range is a contiguous block of rows. TimeIndex finds that block with
+np.searchsorted, and a one-day query over a year of data only touches one
+day's rows.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def to_utc(value):
+    """Parse a date/datetime (string or object) as a UTC Timestamp; naive values are taken as UTC."""
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+
+def day_bounds(start_date=None, end_date=None):
+    """Half-open UTC range covering the whole calendar days of start_date..end_date."""
+    start = end = None
+    if start_date is not None:
+        start = pd.Timestamp(pd.Timestamp(start_date).date()).tz_localize('UTC')
+    if end_date is not None:
+        end = pd.Timestamp(pd.Timestamp(end_date).date()).tz_localize('UTC') + timedelta(days=1)
+    return start, end
+
+
+def time_range_bounds(time_range, now=None):
+    """Start of the 'today', 'week' or 'month' range relative to now (UTC)."""
+    now = now or pd.Timestamp(datetime.utcnow()).tz_localize('UTC')
+    midnight = now.normalize()
+    if time_range == 'today':
+        return midnight, now
+    if time_range == 'week':
+        return midnight - timedelta(days=now.weekday()), now
+    if time_range == 'month':
+        return midnight.replace(day=1), now
+    raise ValueError(f"Unknown time_range: {time_range}")
+
+
+class TimeIndex:
+    """Row bounds for time ranges over one sorted timestamp column."""
+
+    def __init__(self, timestamps):
+        # Compared with Timestamp.value, which is in nanoseconds whatever the column's unit
+        values = timestamps.dt.as_unit('ns').array.asi8 if len(timestamps) else np.empty(0, dtype=np.int64)
+        self.size = len(timestamps)
+        # NaT is stored as the minimum int64 and sorted to the end; only
+        # the valid prefix takes part in the search.
+        self.valid = int(timestamps.notna().sum())
+        self.values = values[:self.valid]
+
+    def __len__(self):
+        return self.valid
+
+    def bounds(self, start=None, end=None, end_inclusive=True):
+        """
+        (lo, hi) row positions with start <= ts <= end (or < end).
+
+        With neither bound every row is in range, including those without a
+        timestamp; with any bound those rows never match, as with a
+        comparison against NaT.
+        """
+        if start is None and end is None:
+            return 0, self.size
+        lo = 0 if start is None else int(np.searchsorted(self.values, to_utc(start).value, side='left'))
+        if end is None:
+            hi = self.valid
+        else:
+            side = 'right' if end_inclusive else 'left'
+            hi = int(np.searchsorted(self.values, to_utc(end).value, side=side))
+        return lo, max(lo, hi)
+
+    def first(self):
+        return pd.Timestamp(self.values[0], tz='UTC') if self.valid else None
+
+    def last(self):
+        return pd.Timestamp(self.values[-1], tz='UTC') if self.valid else None
+
+
+def event_time_index(snapshot):
+    return snapshot.derived('time:events', lambda s: TimeIndex(s.events['datetime_utc']))
+
+
+def session_time_index(snapshot, sessions):
+    return snapshot.derived('time:sessions', lambda s: TimeIndex(sessions.table['entry_timestamp']))
+
+
+def restrict(positions, lo, hi):
+    """Keep the sorted positions that fall inside [lo, hi)."""
+    return positions[np.searchsorted(positions, lo):np.searchsorted(positions, hi)]